@@ -0,0 +1,843 @@
+# benchmark.py
+"""
+Micro-benchmarks for the cost calculators.
+
+Run all benchmarks with `python benchmark.py`, or a subset by name,
+e.g. `python benchmark.py dbx_tier`.
+"""
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+import tempfile
+import threading
+import tracemalloc
+import io
+import numpy as np
+import openpyxl
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+import state as s
+import rate_card_store
+import calculations
+import cli
+import lookups
+from lookups import LazySpotRates, load_rate_frames, RATE_SHARD_CACHE_SIZE
+from calculations import calculate_databricks_costs_for_tier
+from rate_index import RateIndex
+from simulation import simulate_estimate, triangular_factors, DEFAULT_SPREADS
+from cost_engine import right_size_jobs, sweep_tier, sweep_candidates, price_databricks_tier, price_sql_warehouses, price_dev_costs, price_s3, s3_table_frame, project_s3_volumes, tiered_s3_cost, s3_period_costs
+from file_exportor import assemble_export_sheets, write_sheet, EXPORT_FORMATS
+from query_logs import load_query_log, billed_hours_per_day
+from job_import import import_jobs, merge_imported_jobs
+import scenario_store
+import repricing
+from rate_card_store import RATE_SOURCES
+from rate_card_watcher import RateCardWatcher
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Registers a benchmark under its name without the 'bench_' prefix."""
+    BENCHMARKS[func.__name__.removeprefix('bench_')] = func
+    return func
+
+
+def best_of(func, repeat=5):
+    """Returns the best wall-clock time in seconds over `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def load_global_data():
+    """Returns the process-wide lookup structures built from the rate cards."""
+    return s.get_global_data()
+
+
+def make_jobs(global_data, n_jobs, seed=0):
+    """Builds a synthetic tier of `n_jobs` jobs over the Jobs Compute instance lists."""
+    rng = np.random.default_rng(seed)
+    choices = [
+        (compute_type, label)
+        for compute_type, labels in global_data['INSTANCE_PRICES_L2_L1'].items()
+        for label in labels
+    ]
+    picks = rng.integers(0, len(choices), n_jobs)
+    return pd.DataFrame({
+        "Job Name": [f"Job {i + 1}" for i in range(n_jobs)],
+        "Runtime (hrs)": rng.uniform(0.1, 8.0, n_jobs).round(2),
+        "Runs/Month": rng.integers(1, 720, n_jobs).astype(float),
+        "Compute type": [choices[i][0] for i in picks],
+        "Instance Type": [choices[i][1] for i in picks],
+        "Nodes": rng.integers(1, 32, n_jobs),
+    })
+
+
+@benchmark
+def bench_dbx_tier():
+    """Per-tier Databricks cost calculation for 10k and 100k jobs."""
+    global_data = load_global_data()
+    for n_jobs in (10_000, 100_000):
+        jobs_df = make_jobs(global_data, n_jobs)
+        elapsed = best_of(lambda: calculate_databricks_costs_for_tier(jobs_df, global_data))
+        print(f"dbx_tier  jobs={n_jobs:>7,}  {elapsed * 1000:9.2f} ms")
+
+
+def make_sql_warehouses(global_data, n_warehouses, seed=0):
+    """Builds `n_warehouses` synthetic SQL warehouses over every catalog size, half of them by dropdown label."""
+    rng = np.random.default_rng(seed)
+    catalog = global_data['SQL_SIZE_CATALOG']
+    rows = rng.integers(0, len(catalog), n_warehouses)
+    return [
+        {"name": f"Warehouse {i}", "type": catalog.compute_types[row], "size": catalog.labels[row] if i % 2 else catalog.sizes[row],
+         "SQL_nodes": int(rng.integers(1, catalog.max_workers[row] + 1)), "hours_per_day": float(rng.uniform(0, 24)),
+         "days_per_month": int(rng.integers(0, 31)), "spot_percent": 0}
+        for i, row in enumerate(rows)
+    ]
+
+
+@benchmark
+def bench_sql():
+    """SQL warehouse pricing over the size catalog for 10k warehouses, against a per-warehouse label-parsing loop."""
+    global_data = load_global_data()
+    catalog = global_data['SQL_SIZE_CATALOG']
+    warehouses = make_sql_warehouses(global_data, 10_000)
+    rows_by_label = {label: (ct, size) for ct, size, label in zip(catalog.compute_types, catalog.sizes, catalog.labels)}
+    rates_by_key = {(ct, size): (rate, dbu, ec2) for ct, size, rate, dbu, ec2 in
+                    zip(catalog.compute_types, catalog.sizes, catalog.rate_per_hour, catalog.dbu_per_hour, catalog.ec2_per_hour)}
+
+    def per_warehouse_loop():
+        totals = [0.0, 0.0, 0.0]
+        for warehouse in warehouses:
+            size = rows_by_label.get(warehouse["size"], (None, warehouse["size"]))[1]
+            rate, dbu, ec2 = rates_by_key.get((warehouse["type"], size), (0, 0, 0))
+            if warehouse["hours_per_day"] > 0 and warehouse["days_per_month"] > 0 and warehouse["SQL_nodes"] > 0:
+                hours = warehouse["hours_per_day"] * warehouse["days_per_month"]
+                totals[0] += rate * hours * warehouse["SQL_nodes"]
+                totals[1] += rate + ec2 * warehouse["SQL_nodes"]
+                totals[2] += dbu * hours * warehouse["SQL_nodes"]
+        return totals
+
+    assert np.allclose(per_warehouse_loop(), price_sql_warehouses(warehouses, global_data))
+    vectorized_time = best_of(lambda: price_sql_warehouses(warehouses, global_data))
+    loop_time = best_of(per_warehouse_loop)
+    print(f"sql  warehouses=10,000  catalog={vectorized_time * 1000:8.2f} ms  per-warehouse loop={loop_time * 1000:8.2f} ms")
+
+
+def make_job_inventory(global_data, n_jobs, seed=0):
+    """A synthetic job inventory in export form: snake_case columns, tier names, bare instance names, some blanks."""
+    rng = np.random.default_rng(seed)
+    tiers = np.array(s.TIERS, dtype=object)[rng.integers(0, len(s.TIERS), n_jobs)]
+    inventory = pd.DataFrame({"tier": tiers, "job_name": [f"job_{i}" for i in range(n_jobs)],
+                              "runtime_hours": rng.uniform(0.1, 8.0, n_jobs).round(2), "runs_per_month": rng.integers(1, 720, n_jobs),
+                              "compute_type": None, "node_type_id": None, "num_workers": rng.integers(1, 32, n_jobs).astype(float)})
+    for tier in s.TIERS:
+        rows = np.flatnonzero(tiers == tier)
+        choices = [(ct, name) for ct, prices in s.tier_job_options(tier, global_data)[1].items() for name in prices.values()]
+        picks = rng.integers(0, len(choices), len(rows))
+        inventory.loc[rows, "compute_type"] = [choices[i][0] for i in picks]
+        inventory.loc[rows, "node_type_id"] = [choices[i][1] for i in picks]
+    inventory.loc[rng.random(n_jobs) < 0.05, "num_workers"] = np.nan
+    return inventory
+
+
+@benchmark
+def bench_job_import():
+    """Importing a 100k-job inventory from CSV, JSON Lines and Parquet, against a per-row iterrows import of the CSV."""
+    global_data = load_global_data()
+    empty_jobs = {tier: pd.DataFrame(columns=s.JOB_COLUMNS) for tier in s.TIERS}
+    inventory = make_job_inventory(global_data, 100_000)
+    label_by_name = {tier: {(ct, name): label for ct, prices in s.tier_job_options(tier, global_data)[1].items() for label, name in prices.items()}
+                     for tier in s.TIERS}
+
+    def per_row_import(path):
+        rows = {tier: [] for tier in s.TIERS}
+        for _, row in pd.read_csv(path).iterrows():
+            tier = row["tier"] if row["tier"] in rows else s.TIERS[-1]
+            rows[tier].append({
+                "Job Name": row["job_name"], "Runtime (hrs)": float(row["runtime_hours"]), "Runs/Month": float(row["runs_per_month"]),
+                "Compute type": row["compute_type"], "Instance Type": label_by_name[tier].get((row["compute_type"], row["node_type_id"])),
+                "Nodes": 1 if pd.isna(row["num_workers"]) else int(row["num_workers"]), "Spot %": 0.0,
+            })
+        return {tier: pd.DataFrame(jobs, columns=s.JOB_COLUMNS) for tier, jobs in rows.items()}
+
+    with tempfile.TemporaryDirectory() as import_dir:
+        paths = {"csv": os.path.join(import_dir, "jobs.csv"), "jsonl": os.path.join(import_dir, "jobs.jsonl"), "parquet": os.path.join(import_dir, "jobs.parquet")}
+        inventory.to_csv(paths["csv"], index=False)
+        inventory.to_json(paths["jsonl"], orient='records', lines=True)
+        inventory.to_parquet(paths["parquet"])
+        for file_format, path in paths.items():
+            start = time.perf_counter()
+            imported, report = import_jobs(path, file_format, global_data)
+            merged = merge_imported_jobs(empty_jobs, imported, global_data)
+            elapsed = time.perf_counter() - start
+            assert sum(map(len, merged.values())) == len(inventory) and report.rejected == 0
+            print(f"job_import  jobs=100,000  {file_format:<8} {elapsed:6.2f} s  {len(inventory) / elapsed:9,.0f} jobs/s")
+        start = time.perf_counter()
+        per_row_import(paths["csv"])
+        elapsed = time.perf_counter() - start
+        print(f"job_import  jobs=100,000  iterrows {elapsed:6.2f} s  {len(inventory) / elapsed:9,.0f} jobs/s")
+
+
+def make_dev_clusters(global_data, n_clusters, seed=0):
+    """Builds `n_clusters` synthetic development clusters, half of the instances given by dropdown label."""
+    rng = np.random.default_rng(seed)
+    labels = list(global_data['FLAT_INSTANCE_LIST_DEV'])
+    names = [global_data['FLAT_INSTANCE_LIST_DEV'][label] for label in labels]
+    choices = labels + names
+    return pd.DataFrame({
+        "Compute_type": "All-Purpose Compute",
+        "Driver type": [choices[i] for i in rng.integers(0, len(choices), n_clusters)],
+        "Worker Type": [choices[i] for i in rng.integers(0, len(choices), n_clusters)],
+        "Nodes": rng.integers(0, 16, n_clusters),
+        "hr_per_month": rng.uniform(0, 200, n_clusters).round(1),
+        "no_of_Month": rng.integers(1, 12, n_clusters),
+        "Spot %": rng.choice([0.0, 50.0], n_clusters),
+    })
+
+
+@benchmark
+def bench_dev():
+    """Development cluster pricing for 1k and 10k clusters, against per-row rate lookups."""
+    global_data = load_global_data()
+    rate_index, dev_labels = global_data['RATE_INDEX'], global_data['FLAT_INSTANCE_LIST_DEV']
+
+    def per_row_rates(dev_df):
+        def get_rates(instance_key):
+            rate = rate_index.get('All-Purpose Compute', dev_labels.get(instance_key, instance_key))
+            return (0.0, 0.0) if rate is None else (rate.rate_per_hour, rate.ec2_per_hour)
+        driver_rates = dev_df['Driver type'].apply(get_rates)
+        worker_rates = dev_df['Worker Type'].apply(get_rates)
+        return [rates.apply(lambda x, i=i: x[i]) for rates in (driver_rates, worker_rates) for i in (0, 1)]
+
+    for n_clusters in (1_000, 10_000):
+        dev_df = make_dev_clusters(global_data, n_clusters)
+        elapsed = best_of(lambda: price_dev_costs(dev_df, global_data))
+        lookup_time = best_of(lambda: per_row_rates(dev_df))
+        print(f"dev  clusters={n_clusters:>6,}  priced={elapsed * 1000:8.2f} ms  per-row rate lookups alone={lookup_time * 1000:8.2f} ms")
+
+
+def write_query_log(path, n_queries, n_warehouses=20, days=30, seed=0):
+    """Writes a synthetic Parquet query history of `n_queries` queries of up to 10 minutes, spread over business hours."""
+    rng = np.random.default_rng(seed)
+    day_ns = rng.integers(0, days, n_queries) * 86_400 * 10**9
+    starts = 1_704_067_200 * 10**9 + day_ns + rng.integers(8 * 3600, 18 * 3600, n_queries) * 10**9
+    pd.DataFrame({
+        "warehouse_id": pd.Categorical.from_codes(rng.integers(0, n_warehouses, n_queries), [f"warehouse_{i}" for i in range(n_warehouses)]),
+        "start_time": pd.to_datetime(starts, utc=True),
+        "end_time": pd.to_datetime(starts + rng.integers(1, 600, n_queries) * 10**9, utc=True),
+    }).to_parquet(path)
+
+
+@benchmark
+def bench_query_log():
+    """Streaming a 10M-query history into busy intervals, and billed hours/day against a per-query loop over 1M queries."""
+    with tempfile.TemporaryDirectory() as log_dir:
+        path = os.path.join(log_dir, "query_history.parquet")
+        write_query_log(path, 10_000_000)
+        start = time.perf_counter()
+        query_log = load_query_log(path)
+        elapsed = time.perf_counter() - start
+        print(f"query_log  queries={query_log.rows:,}  {elapsed:6.2f} s  {query_log.rows / elapsed / 1e6:5.2f}M queries/s  intervals={len(query_log.starts):,}")
+
+        suspend_after = np.full(len(query_log.warehouses), 10)
+        merge_time = best_of(lambda: billed_hours_per_day(query_log, suspend_after))
+        print(f"query_log  billed hours/day at 10 min suspend  {merge_time * 1000:8.2f} ms")
+
+        path = os.path.join(log_dir, "query_history_1m.parquet")
+        write_query_log(path, 1_000_000)
+        query_log = load_query_log(path)
+        history = pd.read_parquet(path)
+
+        def per_query_loop():
+            uptime, last_end = {}, {}
+            suspend = pd.Timedelta(minutes=10)
+            for warehouse, query_start, query_end in sorted(zip(history["warehouse_id"], history["start_time"], history["end_time"])):
+                end = query_end + suspend
+                if warehouse in last_end and query_start <= last_end[warehouse]:
+                    if end > last_end[warehouse]:
+                        uptime[warehouse] += end - last_end[warehouse]
+                        last_end[warehouse] = end
+                else:
+                    uptime[warehouse] = uptime.get(warehouse, pd.Timedelta(0)) + (end - query_start)
+                    last_end[warehouse] = end
+            return uptime
+
+        start = time.perf_counter()
+        uptime = per_query_loop()
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        load_query_log(path)
+        hours = billed_hours_per_day(query_log, np.full(len(query_log.warehouses), 10)) * query_log.active_days
+        streamed_time = time.perf_counter() - start
+        assert np.allclose(hours, [uptime[w].total_seconds() / 3600 for w in query_log.warehouses])
+        print(f"query_log  queries=1,000,000  streamed merge={streamed_time:6.2f} s  per-query loop={loop_time:6.2f} s")
+
+
+def traced_size(build):
+    """Returns (object, bytes still allocated) for the object built by `build`."""
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+@benchmark
+def bench_rate_index():
+    """Memory and lookup latency of RateIndex against the Instance-keyed row dicts it replaced."""
+    df, _, df_dev, _ = load_rate_frames()
+    card = pd.concat([df, df_dev], ignore_index=True)
+    flat_rate_card, dict_bytes = traced_size(lambda: {row['Instance']: row for _, row in card.iterrows()})
+    rate_index, index_bytes = traced_size(lambda: RateIndex(card))
+    print(f"rate_index  memory  dict-of-rows={dict_bytes / 1024:9.1f} KiB  RateIndex={index_bytes / 1024:9.1f} KiB")
+
+    keys = list(zip(card['Compute type'], card['Instance']))
+    lookups = [keys[i] for i in np.random.default_rng(0).integers(0, len(keys), 100_000)]
+    dict_time = best_of(lambda: [flat_rate_card[inst]['Rate/hour'] for _, inst in lookups])
+    index_time = best_of(lambda: [rate_index.get(ct, inst).rate_per_hour for ct, inst in lookups])
+    compute_types, instances = zip(*lookups)
+    batch_time = best_of(lambda: rate_index.take('rate_per_hour', rate_index.positions(compute_types, instances)))
+    print(f"rate_index  100k lookups  dict-of-rows={dict_time * 1000:8.2f} ms  "
+          f"RateIndex.get={index_time * 1000:8.2f} ms  RateIndex.positions={batch_time * 1000:8.2f} ms")
+
+
+@benchmark
+def bench_rate_card_load():
+    """Cold rate card load (CSV/XLSX vs compiled file) and per-rerun cache hit cost."""
+    usecols = {'rates': ['Compute type', 'Instance', 'vCPU', 'Memory (GB)', 'DBU/hour', 'Rate/hour', 'onDemandLinuxHr']}
+    rate_card_store.compile_rate_cards()
+
+    def parse_sources():
+        pd.read_csv('final_out.csv', usecols=usecols['rates'])
+        pd.read_csv('SQL_warehouse - Sheet1.csv')
+        pd.read_excel('S3_Storage_cost.xlsx')
+
+    print(f"rate_card_load  cold  csv/xlsx={best_of(parse_sources) * 1000:8.2f} ms  "
+          f"compiled={best_of(lambda: rate_card_store.load_rate_sources(usecols)) * 1000:8.2f} ms")
+
+    frames = rate_card_store.load_rate_sources(usecols)
+    as_data = st.cache_data(lambda: tuple(frames.values()))
+    as_resource = st.cache_resource(lambda: tuple(frames.values()))
+    as_data(), as_resource()
+    print(f"rate_card_load  cache hit  cache_data={best_of(as_data, repeat=50) * 1000:8.3f} ms  "
+          f"cache_resource={best_of(as_resource, repeat=50) * 1000:8.3f} ms")
+
+
+@benchmark
+def bench_rate_shards():
+    """Loading one region of a 20-region rate card from the compiled file vs loading every region."""
+    rates = pd.read_csv(rate_card_store.RATE_SOURCES['rates'])
+    regions = [f"region-{i}" for i in range(20)]
+    multi_region = pd.concat([rates.assign(location=region) for region in regions], ignore_index=True)
+    usecols = {'rates': lookups.RATE_COLUMNS}
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = dict(rate_card_store.RATE_SOURCES, rates=os.path.join(tmp, 'final_out.csv'))
+        multi_region.to_csv(sources['rates'], index=False)
+        rate_card_store.compile_rate_cards(sources, tmp)
+        shard = ('AWS', regions[7], 'Enterprise')
+        one_time = best_of(lambda: rate_card_store.load_rate_sources(usecols, sources, tmp, shard=shard))
+        all_time = best_of(lambda: rate_card_store.load_rate_sources(usecols, sources, tmp))
+    print(f"rate_shards  regions=20  rows={len(multi_region):,}  one shard={one_time * 1000:8.2f} ms  all shards={all_time * 1000:8.2f} ms")
+
+
+@benchmark
+def bench_global_data():
+    """Building the derived lookup structures vs fetching the shared per-process copy."""
+    df, df_sql, df_dev, s3_df = load_rate_frames()
+    s.get_global_data()
+    print(f"global_data  build={best_of(lambda: lookups.populate_global_data(df, df_sql, df_dev, s3_df)) * 1000:8.2f} ms  "
+          f"shared hit={best_of(s.get_global_data, repeat=50) * 1000:8.3f} ms")
+
+
+@benchmark
+def bench_spot():
+    """Spot prices: cold load of the projected columns on first use, and blended vs on-demand tier pricing."""
+    global_data = load_global_data()
+    jobs_df = make_jobs(global_data, 100_000)
+    spot_jobs = jobs_df.assign(**{"Spot %": np.resize([0, 50, 100], len(jobs_df))})
+
+    def cold_load():
+        LazySpotRates().per_hour(["m5d.xlarge"])
+
+    def all_columns():
+        rate_card_store.load_rate_sources(names=['rates'])['rates']
+
+    print(f"spot  cold load  projected={best_of(cold_load) * 1000:8.2f} ms  all rate columns={best_of(all_columns) * 1000:8.2f} ms")
+    on_demand_time = best_of(lambda: price_databricks_tier(jobs_df, global_data))
+    blended_time = best_of(lambda: price_databricks_tier(spot_jobs, global_data))
+    print(f"spot  jobs=100,000  on-demand={on_demand_time * 1000:8.1f} ms  blended={blended_time * 1000:8.1f} ms")
+
+
+def app_test():
+    return AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'), default_timeout=300)
+
+
+@benchmark
+def bench_rerun():
+    """Wall time of one full script rerun with 5,000 jobs in every tier."""
+    at = app_test().run()
+    for tier in s.TIERS:
+        at.session_state.dbx_jobs[tier] = make_jobs(at.session_state.global_data, 5_000, seed=len(tier))
+    at.run()
+    print(f"rerun  jobs/tier=5,000  {best_of(at.run, repeat=3) * 1000:8.1f} ms")
+
+
+@benchmark
+def bench_job_pages():
+    """Job editor payload and rerun time for a 50k-job tier, one 100-row page against every row."""
+    tier = "L1 / Curated"
+    at = app_test().run()
+    global_data = at.session_state.global_data
+    at.session_state.dbx_jobs[tier] = s.fill_job_defaults(make_jobs(global_data, 50_000), tier, global_data)
+    at.run()
+    for page_size in (100, "All"):
+        at.selectbox(key=f"job_page_size_{tier}").set_value(page_size).run()
+        editor = next(df for df in at.get('dataframe') if df.proto.id.endswith(f"data_editor_{tier}"))
+        elapsed = best_of(at.run, repeat=3)
+        print(f"job_pages  jobs=50,000  page={page_size!s:>4}  editor payload={editor.proto.ByteSize() / 1e6:7.2f} MB  rerun={elapsed * 1000:8.1f} ms")
+
+
+@benchmark
+def bench_editor_edit():
+    """Script runs, tier calculations and latency for one cell edit in a 500-job tier."""
+    counts = {'runs': 0, 'tier_calcs': 0}
+    initialize_state, calculate = s.initialize_state, calculations.calculate_databricks_costs_for_tier
+
+    def counting_initialize_state():
+        counts['runs'] += 1
+        return initialize_state()
+
+    def counting_calculate(*args, **kwargs):
+        counts['tier_calcs'] += 1
+        return calculate(*args, **kwargs)
+
+    s.initialize_state, calculations.calculate_databricks_costs_for_tier = counting_initialize_state, counting_calculate
+    try:
+        tier = "L1 / Curated"
+        at = app_test().run()
+        at.session_state.dbx_jobs[tier] = make_jobs(at.session_state.global_data, 500)
+        at.run()
+
+        # Send the same widget state the browser sends after one cell edit
+        editor = next(df for df in at.get('dataframe') if df.proto.id.endswith(f"data_editor_{tier}"))
+        widget_states = at._tree.get_widget_states()
+        edit = widget_states.widgets.add()
+        edit.id = editor.proto.id
+        edit.string_value = json.dumps({"edited_rows": {"0": {"Runtime (hrs)": 5.0}}, "added_rows": [], "deleted_rows": []})
+        counts.update(runs=0, tier_calcs=0)
+        start = time.perf_counter()
+        at._run(widget_states)
+        elapsed = time.perf_counter() - start
+    finally:
+        s.initialize_state, calculations.calculate_databricks_costs_for_tier = initialize_state, calculate
+    print(f"editor_edit  jobs=500  script runs={counts['runs']}  tier calculations={counts['tier_calcs']}  {elapsed * 1000:8.1f} ms")
+    assert counts['runs'] == 1 and counts['tier_calcs'] == 1, counts
+
+
+def make_s3_tables(n_tables, zones=("Source System Table", "L0 / Raw", "L1 / Curated", "L2 / Data Product"), seed=0):
+    """Synthetic table-based storage: `n_tables` tables spread evenly over `zones`."""
+    rng = np.random.default_rng(seed)
+    per_zone = n_tables // len(zones)
+    return {
+        zone: s3_table_frame({
+            "Table Name": [f"{zone}_table_{i}" for i in range(per_zone)],
+            "Records": rng.integers(0, 10**9, per_zone),
+            "Columns": rng.integers(1, 400, per_zone),
+            "Table": rng.integers(1, 5, per_zone),
+            "Avg_Column_length": rng.integers(1, 64, per_zone),
+        })
+        for zone in zones
+    }
+
+
+@benchmark
+def bench_s3_table():
+    """Table-based S3 sizing of 100k tables: columnar per-zone frames vs the per-table dict loop it replaced."""
+    s3_table_based = make_s3_tables(100_000)
+    as_records = {zone: df.to_dict(orient='records') for zone, df in s3_table_based.items()}
+
+    def per_table_loop():
+        zone_costs = {}
+        for zone, table_configs in as_records.items():
+            zone_gb = 0
+            for table_config in table_configs:
+                records = float(table_config.get("Records", 0) or 0)
+                num_columns = float(table_config.get("Columns", 0) or 0)
+                num_tables = float(table_config.get("Table", 0) or 0)
+                num_length = float(table_config.get("Avg_Column_length", 0) or 0)
+                zone_gb += records * num_columns * num_length * 1 * 0.5 / (1024 ** 3) * num_tables
+            zone_costs[zone] = zone_gb * 0.023
+        return zone_costs
+
+    vectorized = lambda: price_s3("Table-Based", {}, s3_table_based, {})
+    expected, actual = per_table_loop(), vectorized()[0]
+    assert all(np.isclose(expected[zone], actual[zone]) for zone in expected)
+    print(f"s3_table  tables=100,000  per-table loop={best_of(per_table_loop) * 1000:8.1f} ms  "
+          f"vectorized={best_of(vectorized) * 1000:8.1f} ms")
+
+
+@benchmark
+def bench_s3_projection():
+    """Month-by-month tiered S3 projection for 500 zones over 60 months, against a per-zone, per-month loop."""
+    rng = np.random.default_rng(0)
+    n_zones, months = 500, 60
+    storage_gb = rng.uniform(0, 800 * 1024, n_zones)
+    growth_percent = rng.uniform(0, 5, n_zones)
+    tier_rates = np.tile([0.023, 0.022, 0.021], (n_zones, 1))
+
+    def per_month_loop():
+        costs = np.empty((n_zones, months))
+        for z in range(n_zones):
+            for m in range(months):
+                volume = storage_gb[z] * (1 + growth_percent[z] / 100) ** m
+                first, second = min(volume, 50 * 1024), min(max(volume - 50 * 1024, 0), 450 * 1024)
+                costs[z, m] = first * tier_rates[z, 0] + second * tier_rates[z, 1] + max(volume - 500 * 1024, 0) * tier_rates[z, 2]
+        return costs
+
+    def vectorized():
+        monthly_costs = tiered_s3_cost(project_s3_volumes(storage_gb, growth_percent, months), tier_rates)
+        return s3_period_costs(pd.DataFrame(monthly_costs)), monthly_costs
+
+    assert np.allclose(per_month_loop(), vectorized()[1])
+    print(f"s3_projection  zones={n_zones}  months={months}  per-month loop={best_of(per_month_loop) * 1000:8.1f} ms  "
+          f"vectorized={best_of(vectorized) * 1000:8.2f} ms")
+
+
+@benchmark
+def bench_monte_carlo():
+    """100k-sample Monte Carlo of a 1,000-job estimate, against calling the tier calculator once per sample."""
+    global_data = load_global_data()
+    jobs_df = make_jobs(global_data, 1_000)
+    s3_direct = {"Landing Zone": {"class": "Standard", "amount": 45, "unit": "TB", "monthly_growth_percent": 3.0}}
+    sql_warehouses = [{"type": "SQL Pro Compute", "size": "Small", "SQL_nodes": 1, "hours_per_day": 8, "days_per_month": 20}]
+    dev_costs = pd.DataFrame([{"Driver type": "m4.large", "Worker Type": "m4.2xlarge", "Nodes": 2, "hr_per_month": 80, "no_of_Month": 1}])
+
+    rng = np.random.default_rng(0)
+    loop_samples = 200
+
+    def per_sample_loop():
+        for _ in range(loop_samples):
+            sample = jobs_df.copy()
+            sample["Runtime (hrs)"] *= triangular_factors(rng, len(sample), DEFAULT_SPREADS["runtime"])
+            sample["Runs/Month"] *= triangular_factors(rng, len(sample), DEFAULT_SPREADS["runs"])
+            calculate_databricks_costs_for_tier(sample, global_data)
+
+    for spreads in (None, {"nodes": 0.3}):
+        start = time.perf_counter()
+        simulate_estimate(jobs_df, "Direct Storage[Recommended]", s3_direct, {}, sql_warehouses, dev_costs, global_data, spreads)
+        elapsed = time.perf_counter() - start
+        print(f"monte_carlo  jobs=1,000  samples=100,000  nodes spread={(spreads or {}).get('nodes', 0):.1f}  {elapsed:7.2f} s")
+    loop_time = best_of(per_sample_loop, repeat=1)
+    print(f"monte_carlo  per-sample calculator loop  {loop_time / loop_samples * 100_000:7.1f} s for 100,000 samples "
+          f"(extrapolated from {loop_samples})")
+
+
+@benchmark
+def bench_right_size():
+    """Cheapest-instance search for 100k jobs in one batch, against scanning the rate card per job."""
+    global_data = load_global_data()
+    jobs_df = make_jobs(global_data, 100_000)
+    rate_index = global_data['RATE_INDEX']
+    hourly_cost = rate_index.rate_per_hour + rate_index.ec2_per_hour
+
+    def per_job_scan(jobs):
+        for compute_type, label in zip(jobs['Compute type'], jobs['Instance Type']):
+            current = rate_index.get(compute_type, global_data['FLAT_INSTANCE_LIST'][label])
+            fits = (rate_index.compute_types == compute_type) & (rate_index.vcpu >= current.vcpu) & (rate_index.memory_gb >= current.memory_gb)
+            np.flatnonzero(fits)[np.argmin(hourly_cost[fits])]
+
+    batch_time = best_of(lambda: right_size_jobs(jobs_df, global_data))
+    scan_time = best_of(lambda: per_job_scan(jobs_df.head(1_000)), repeat=1) * 100
+    print(f"right_size  jobs=100,000  batch={batch_time * 1000:8.1f} ms  per-job scan={scan_time:8.1f} s (extrapolated from 1,000)")
+
+
+@benchmark
+def bench_sweep():
+    """What-if grid of 50 node counts x 200 instances x 2 compute types over 1,000 jobs, against repricing the tier per cell."""
+    global_data = load_global_data()
+    jobs_df = make_jobs(global_data, 1_000)
+    compute_types = global_data['COMPUTE_TYPES_L2_L1']
+    instances = sweep_candidates(global_data, compute_types)[:200]
+    node_counts = range(1, 51)
+
+    def per_cell_reprice(cells):
+        for compute_type, nodes, instance in itertools.islice(itertools.product(compute_types, node_counts, instances), cells):
+            price_databricks_tier(jobs_df.assign(**{"Compute type": compute_type, "Instance Type": instance, "Nodes": nodes}), global_data)
+
+    sweep_time = best_of(lambda: sweep_tier(jobs_df, global_data, node_counts, compute_types, instances))
+    cells = len(compute_types) * len(node_counts) * len(instances)
+    loop_time = best_of(lambda: per_cell_reprice(200), repeat=1) * cells / 200
+    print(f"sweep  cells={cells:,}  jobs=1,000  broadcast={sweep_time * 1000:8.2f} ms  per-cell reprice={loop_time:8.1f} s (extrapolated from 200)")
+
+
+def make_export_args(global_data, jobs_per_tier):
+    """Positional arguments for assemble_export_sheets over synthetic tiers."""
+    calculated_dbx_data = {}
+    for i, tier in enumerate(s.TIERS):
+        df, dbx_cost, ec2_cost, _ = calculate_databricks_costs_for_tier(make_jobs(global_data, jobs_per_tier, seed=i), global_data)
+        calculated_dbx_data[tier] = {"df": df, "dbu_cost": dbx_cost, "ec2_cost": ec2_cost}
+    s3_direct = {"Landing Zone": {"class": "Standard", "amount": 10, "unit": "TB", "monthly_growth_percent": 2.0}}
+    sql_warehouses = [{"name": f"Warehouse {i}", "type": "SQL Pro Compute", "size": None, "SQL_nodes": 1, "hours_per_day": 8, "days_per_month": 20} for i in range(100)]
+    dev_costs = pd.DataFrame([{"Compute_type": "All-Purpose Compute", "Driver type": None, "Worker Type": None, "Nodes": 1,
+                               "hr_per_month": 0, "no_of_Month": 0, "DBX": 0.0, "EC2": 0.0, "Total": 0.0}])
+    return (calculated_dbx_data, "Direct Storage[Recommended]", s3_direct, {}, sql_warehouses, dev_costs,
+            0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+
+def timed_and_traced(func):
+    """Returns (elapsed seconds, peak traced bytes): timed untraced, then run again under tracemalloc."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+@benchmark
+def bench_excel_export():
+    """Per-sheet time and peak memory of the streaming export, against the pandas ExcelWriter path."""
+    sheets = assemble_export_sheets(*make_export_args(load_global_data(), 5_000))
+
+    for name, df in sheets.items():
+        elapsed, peak = timed_and_traced(lambda: write_sheet(openpyxl.Workbook(write_only=True), name, df))
+        print(f"excel_export  streaming  {name:<22} rows={len(df):>7,}  {elapsed * 1000:9.1f} ms  peak={peak / 2**20:7.1f} MiB")
+
+    def streaming():
+        workbook = openpyxl.Workbook(write_only=True)
+        for name, df in sheets.items():
+            write_sheet(workbook, name, df)
+        workbook.save(io.BytesIO())
+
+    def excel_writer():
+        with pd.ExcelWriter(io.BytesIO(), engine='openpyxl') as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, sheet_name=name, index=False)
+
+    for label, func in (("streaming", streaming), ("ExcelWriter", excel_writer)):
+        elapsed, peak = timed_and_traced(func)
+        print(f"excel_export  {label:<11}  whole workbook  {elapsed * 1000:9.1f} ms  peak={peak / 2**20:7.1f} MiB")
+
+
+@benchmark
+def bench_export_formats():
+    """Assembly once, then each export format, for a 100k-job estimate."""
+    export_args = make_export_args(load_global_data(), 25_000)
+    start = time.perf_counter()
+    sheets = assemble_export_sheets(*export_args)
+    print(f"export_formats  assemble  {(time.perf_counter() - start) * 1000:9.1f} ms")
+    for name, (writer, _, _) in EXPORT_FORMATS.items():
+        start = time.perf_counter()
+        size = len(writer(sheets))
+        print(f"export_formats  {name:<14} {(time.perf_counter() - start) * 1000:9.1f} ms  {size / 2**20:7.1f} MiB")
+
+
+@benchmark
+def bench_cli_batch():
+    """Headless throughput of the batch CLI over 200 scenarios of 50 jobs per tier."""
+    global_data = load_global_data()
+    with tempfile.TemporaryDirectory() as scenario_dir:
+        paths = []
+        for i in range(200):
+            scenario = {
+                "name": f"Scenario {i}",
+                "dbx_jobs": {tier: make_jobs(global_data, 50, seed=i * 10 + t).to_dict(orient='records') for t, tier in enumerate(s.TIERS)},
+                "s3_direct": {"Landing Zone": {"class": "Standard", "amount": i, "unit": "TB", "monthly_growth_percent": 2.0}},
+            }
+            paths.append(os.path.join(scenario_dir, f"scenario_{i}.json"))
+            with open(paths[-1], 'w') as f:
+                json.dump(scenario, f, default=int)
+        for workers in sorted({1, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            cli.estimate(paths, workers)
+            elapsed = time.perf_counter() - start
+            print(f"cli_batch  scenarios=200  workers={workers:>2}  {elapsed:7.2f} s  {200 / elapsed:7.1f} scenarios/s")
+
+
+@benchmark
+def bench_scenario_store():
+    """Saving and loading a 10k-job scenario, and finding the scenarios using an instance among 500, against JSON scenario files."""
+    global_data = load_global_data()
+    big = {"dbx_jobs": {tier: make_jobs(global_data, 2_500, seed=t) for t, tier in enumerate(s.TIERS)}}
+    with tempfile.TemporaryDirectory() as store_dir:
+        with scenario_store.open_store(os.path.join(store_dir, "scenarios.db")) as conn:
+            save = best_of(lambda: scenario_store.save_scenario(conn, "bench", "big", big), repeat=3)
+            load = best_of(lambda: scenario_store.load_scenario(conn, "bench", "big"), repeat=3)
+            print(f"scenario_store  jobs=10,000  save {save * 1000:7.1f} ms  load {load * 1000:7.1f} ms")
+
+            paths = []
+            for i in range(500):
+                scenario = {"dbx_jobs": {tier: make_jobs(global_data, 20, seed=i * 10 + t) for t, tier in enumerate(s.TIERS)}}
+                scenario_store.save_scenario(conn, f"project {i % 10}", f"scenario {i}", scenario)
+                paths.append(os.path.join(store_dir, f"scenario_{i}.json"))
+                with open(paths[-1], 'w') as f:
+                    json.dump({tier: jobs.to_dict(orient='records') for tier, jobs in scenario["dbx_jobs"].items()}, f, default=int)
+            instance = scenario_store.bare_instances([big["dbx_jobs"][s.TIERS[0]]["Instance Type"].iloc[0]]).iloc[0]
+
+            def scan_files():
+                found = []
+                for path in paths:
+                    with open(path) as f:
+                        jobs = pd.concat(pd.DataFrame(rows) for rows in json.load(f).values())
+                    if (scenario_store.bare_instances(jobs["Instance Type"]) == instance).any():
+                        found.append(path)
+                return found
+
+            indexed = best_of(lambda: scenario_store.scenarios_using_instance(conn, instance))
+            scanned = best_of(scan_files, repeat=1)
+            print(f"scenario_store  scenarios=500  instance query {indexed * 1000:7.1f} ms  json scan {scanned * 1000:7.1f} ms")
+
+
+@benchmark
+def bench_reprice():
+    """Repricing 1,000 saved scenarios after one instance's rate changes, against pricing every scenario with both cards."""
+    global_data = load_global_data()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # The new card: 5% on the Rate/hour of one Jobs Compute instance
+        new_sources = repricing.sources_in(work_dir)
+        for path in RATE_SOURCES.values():
+            shutil.copy(path, work_dir)
+        rates = pd.read_csv(RATE_SOURCES['rates'])
+        changed = (rates['Compute type'] == 'Jobs Compute') & (rates['Instance'] == 'm5d.xlarge')
+        rates.loc[changed, 'Rate/hour'] *= 1.05
+        rates.to_csv(new_sources['rates'], index=False)
+
+        store_path = os.path.join(work_dir, "scenarios.db")
+        with scenario_store.open_store(store_path) as conn:
+            for i in range(1_000):
+                scenario_store.save_scenario(conn, f"project {i % 20}", f"scenario {i}", {
+                    "dbx_jobs": {tier: make_jobs(global_data, 20, seed=i * 10 + t) for t, tier in enumerate(s.TIERS)},
+                    "sql_warehouses": make_sql_warehouses(global_data, 2, seed=i),
+                    "dev_costs": make_dev_clusters(global_data, 4, seed=i),
+                })
+            total_rows = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in repricing.SECTION_TABLES.values())
+
+        def full_reprice():
+            deltas = {}
+            with scenario_store.open_store(store_path) as conn:
+                for project, name in conn.execute("SELECT project, name FROM scenarios").fetchall():
+                    scenario = scenario_store.load_scenario(conn, project, name)
+                    scenario = dict(scenario, dbx_jobs={tier: jobs.to_dict(orient='records') for tier, jobs in scenario["dbx_jobs"].items()},
+                                    dev_costs=scenario["dev_costs"].to_dict(orient='records'))
+                    old, new = (cli.price_scenario(scenario, repricing.card_global_data(tuple(sources.items()), s.DEFAULT_SHARD))
+                                for sources in (RATE_SOURCES, new_sources))
+                    deltas[project, name] = new["total_monthly_cost"] - old["total_monthly_cost"]
+            return pd.Series(deltas)
+
+        reports = []
+        for workers in sorted({1, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            report = repricing.reprice_store(store_path, RATE_SOURCES, new_sources, workers)
+            elapsed = time.perf_counter() - start
+            touched = int(report[list(repricing.COUNT_COLUMNS.values())].to_numpy().sum())
+            print(f"reprice  scenarios=1,000  workers={workers:>2}  {elapsed:6.2f} s  affected scenarios={len(report):,}  "
+                  f"rows repriced={touched:,} of {total_rows:,}")
+            reports.append(report)
+        start = time.perf_counter()
+        full_deltas = full_reprice()
+        print(f"reprice  scenarios=1,000  full reprice {time.perf_counter() - start:6.2f} s")
+
+        for report in reports:
+            # Scenarios missing from the report must not change
+            deltas = report.set_index(["project", "name"])["delta"].reindex(full_deltas.index, fill_value=0.0)
+            assert np.allclose(deltas, full_deltas), (deltas - full_deltas).abs().max()
+
+
+@benchmark
+def bench_hot_reload():
+    """Reader latency while the watcher rebuilds after a rate card update, against rebuilding on the request path."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        sources = repricing.sources_in(work_dir)
+        for path in RATE_SOURCES.values():
+            shutil.copy(path, work_dir)
+        rates = pd.read_csv(sources['rates'])
+        key = ('Jobs Compute', 'm5d.xlarge')
+        watcher = RateCardWatcher(sources, poll_seconds=0.05).start()
+        expected = {watcher.snapshot.fingerprint: watcher.global_data()['RATE_INDEX'].get(*key).rate_per_hour}
+
+        # Readers fetch the lookups the way a rerun does and check each read against its version
+        latencies, torn, stop = [], [], threading.Event()
+
+        def read():
+            while not stop.is_set():
+                start = time.perf_counter()
+                global_data = watcher.global_data()
+                rate = global_data['RATE_INDEX'].get(*key).rate_per_hour
+                latencies.append(time.perf_counter() - start)
+                fingerprint = global_data['VERSION'][0]
+                if fingerprint in expected and not np.isclose(expected[fingerprint], rate):
+                    torn.append(fingerprint)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        changed = (rates['Compute type'] == key[0]) & (rates['Instance'] == key[1])
+        rates.loc[changed, 'Rate/hour'] *= 1.05
+        rates.to_csv(f"{sources['rates']}.tmp", index=False)
+        os.replace(f"{sources['rates']}.tmp", sources['rates'])
+        expected[rate_card_store.source_fingerprint(sources)] = rates.loc[changed, 'Rate/hour'].iloc[0]
+        updated = time.perf_counter()
+        while watcher.reloads == 0 and time.perf_counter() - updated < 60:
+            time.sleep(0.01)
+        published = time.perf_counter() - updated
+        time.sleep(0.2)
+        stop.set()
+        for reader in readers:
+            reader.join()
+        watcher.stop()
+        assert watcher.reloads == 1 and not torn
+
+        # What the first rerun after an update used to wait for: compiling the new card and rebuilding
+        rates.loc[changed, 'Rate/hour'] *= 1.05
+        rates.to_csv(sources['rates'], index=False)
+        start = time.perf_counter()
+        lookups.build_global_data(sources=sources)
+        rebuild = time.perf_counter() - start
+        print(f"hot_reload  published after {published:6.2f} s  reads={len(latencies):,}  torn reads={len(torn)}  "
+              f"p99 read={np.percentile(latencies, 99) * 1000:7.3f} ms  worst read={max(latencies) * 1000:7.2f} ms  "
+              f"request-path rebuild={rebuild * 1000:7.2f} ms")
+
+        # A shard every session keeps using survives other regions filling the shard cache
+        regions = [f"region-{i}" for i in range(RATE_SHARD_CACHE_SIZE + 1)]
+        pd.concat([rates] + [rates.assign(location=region) for region in regions], ignore_index=True).to_csv(sources['rates'], index=False)
+        watcher = RateCardWatcher(sources, poll_seconds=3600).start()
+        default = watcher.global_data()
+        for region in regions:
+            watcher.global_data(('AWS', region, 'Enterprise'))
+            watcher.global_data()
+        watcher.stop()
+        loaded = watcher.snapshot.global_data
+        assert loaded.get(rate_card_store.DEFAULT_SHARD) is default and len(loaded) == RATE_SHARD_CACHE_SIZE, list(loaded)
+
+        # Spot prices first used after the files change come from the snapshot's version, even a malformed update
+        rates.to_csv(sources['rates'], index=False)
+        watcher = RateCardWatcher(sources, poll_seconds=3600).start()
+        before = watcher.global_data()
+        spot = LazySpotRates(sources=sources).per_hour([key[1]])[0]
+        rates['spotLinuxHr'] *= 2
+        rates.to_csv(sources['rates'], index=False)
+        assert watcher.reload()
+        after = watcher.global_data()
+        with open(sources['rates'], 'w') as f:
+            f.write('Plan,Cloud\n"unterminated')
+        assert not watcher.reload() and watcher.global_data() is after
+        watcher.stop()
+        assert np.isclose(before['SPOT_RATES'].per_hour([key[1]])[0], spot)
+        assert np.isclose(after['SPOT_RATES'].per_hour([key[1]])[0], spot * 2)
+
+
+if __name__ == '__main__':
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
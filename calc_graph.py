@@ -0,0 +1,74 @@
+# calc_graph.py
+import hashlib
+from collections import Counter
+from collections.abc import Mapping
+import pandas as pd
+
+
+def _update_hash(digest, obj):
+    """Feeds a stable byte representation of `obj` into `digest`."""
+    if isinstance(obj, pd.DataFrame):
+        digest.update(b'DF')
+        digest.update(repr(list(obj.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        digest.update(b'S')
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, Mapping):
+        digest.update(b'{')
+        for key in obj:
+            _update_hash(digest, key)
+            _update_hash(digest, obj[key])
+        digest.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b'[')
+        for item in obj:
+            _update_hash(digest, item)
+        digest.update(b']')
+    else:
+        digest.update(f"{type(obj).__name__}:{obj!r};".encode())
+
+
+def content_hash(obj):
+    """Returns a hex digest of the content of DataFrames, dicts, lists and scalars."""
+    digest = hashlib.blake2b(digest_size=16)
+    _update_hash(digest, obj)
+    return digest.hexdigest()
+
+
+class CalcGraph:
+    """
+    Memoizes named calculation nodes on a content hash of their inputs.
+    A node is recomputed only when its inputs change; downstream nodes depend
+    on upstream ones by passing `graph.digest(name)` as part of their key.
+    """
+
+    def __init__(self):
+        self._nodes = {}
+        self.recompute_counts = Counter()
+
+    def node(self, name, func, *args, key=None):
+        """
+        Returns func(*args), reusing the previous result while the key is unchanged.
+        The key defaults to `args`; pass a narrower key when args carry derived fields.
+        """
+        digest = content_hash(args if key is None else key)
+        cached = self._nodes.get(name)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        result = func(*args)
+        self._nodes[name] = (digest, result)
+        self.recompute_counts[name] += 1
+        return result
+
+    def digest(self, name):
+        """Input digest of a node, or None if it has not been computed yet."""
+        cached = self._nodes.get(name)
+        return cached[0] if cached is not None else None
+
+    def invalidate(self, name=None):
+        """Drops one node, or every node when `name` is None."""
+        if name is None:
+            self._nodes.clear()
+        else:
+            self._nodes.pop(name, None)
@@ -0,0 +1,211 @@
+# cli.py
+"""
+Headless batch estimation.
+
+Prices scenario files with the same cost logic as the app, without Streamlit:
+
+    python cli.py estimate scenarios/*.yaml --out summary.csv --workers 8
+
+A scenario is a YAML or JSON file with the same sections as the app's
+session state (see scenarios/example.yaml). Instance types, warehouse sizes
+and development driver/worker types may be given either as the app's
+dropdown labels or as bare instance names such as "m5d.xlarge".
+Optional top-level `cloud`, `region` and `plan` keys select the rate card
+shard to price with (default: AWS, us-east-1, Enterprise), and an optional
+`sql_query_log` path to a query history (CSV or Parquet) bills auto-suspending
+SQL warehouses for their uptime in that history.
+
+After a rate card update, the scenarios saved in the app's scenario store
+can be repriced against a copy of the previous rate card files:
+
+    python cli.py reprice --old-rates previous_rates/ --out deltas.csv
+"""
+import argparse
+import functools
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import yaml
+from lookups import build_global_data, RATE_SHARD_CACHE_SIZE
+from rate_card_store import RATE_SOURCES, DEFAULT_SHARD
+from cost_engine import price_databricks_tier, price_s3, price_sql_warehouses, price_dev_costs, SPOT_COLUMN
+from query_logs import load_query_log, apply_query_log
+from scenario_store import DEFAULT_STORE
+from repricing import reprice_store, sources_in
+
+JOB_COLUMNS = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", SPOT_COLUMN]
+DEV_COLUMNS = ["Compute_type", "Driver type", "Worker Type", "Nodes", "hr_per_month", "no_of_Month", SPOT_COLUMN]
+SUMMARY_COLUMNS = [
+    "scenario", "file", "region", "databricks_dbx_cost", "databricks_ec2_cost", "s3_cost", "s3_table_cost",
+    "s3_yearly_projected_cost", "sql_dbu_cost", "sql_ec2_cost", "dev_cost", "total_monthly_cost",
+    "total_yearly_cost", "error",
+]
+
+
+def load_scenario(path):
+    """Reads one scenario file (.yaml, .yml or .json) into a dict."""
+    with open(path, encoding='utf-8') as f:
+        scenario = json.load(f) if path.endswith('.json') else yaml.safe_load(f)
+    if not isinstance(scenario, dict):
+        raise ValueError(f"{path}: a scenario must be a mapping")
+    return scenario
+
+
+def _jobs_frame(rows):
+    jobs_df = pd.DataFrame(rows).reindex(columns=JOB_COLUMNS)
+    jobs_df["Nodes"] = jobs_df["Nodes"].fillna(1)
+    jobs_df[["Runtime (hrs)", "Runs/Month", SPOT_COLUMN]] = jobs_df[["Runtime (hrs)", "Runs/Month", SPOT_COLUMN]].fillna(0.0)
+    return jobs_df
+
+
+def price_scenario(scenario, global_data):
+    """Returns the monthly cost of each section and the totals for one scenario."""
+    # Only the totals are reported, so every tier is priced in one call
+    job_rows = [row for rows in (scenario.get("dbx_jobs") or {}).values() for row in rows or []]
+    _, dbx_cost, ec2_cost, _ = price_databricks_tier(_jobs_frame(job_rows), global_data)
+
+    _, s3_cost, _, _, s3_yearly_cost, s3_table_cost, _ = price_s3(
+        scenario.get("s3_calc_method", "Direct Storage[Recommended]"),
+        scenario.get("s3_direct") or {},
+        scenario.get("s3_table_based") or {},
+        global_data,
+        scenario.get("enable_s3_stage", True),
+    )
+    sql_warehouses = scenario.get("sql_warehouses") or []
+    if scenario.get("sql_query_log"):
+        sql_warehouses = apply_query_log(sql_warehouses, load_query_log(scenario["sql_query_log"]))
+    sql_dbu_cost, sql_ec2_cost, _ = price_sql_warehouses(sql_warehouses, global_data)
+
+    dev_rows = scenario.get("dev_costs") or []
+    dev_df = pd.DataFrame(dev_rows).reindex(columns=DEV_COLUMNS).fillna({"Nodes": 0, "hr_per_month": 0, "no_of_Month": 0, SPOT_COLUMN: 0})
+    dev_dbx_cost, dev_ec2_cost, _ = price_dev_costs(dev_df, global_data)
+    dev_cost = dev_dbx_cost + dev_ec2_cost
+
+    # Same total as the app's summary column
+    total_cost = dbx_cost + ec2_cost + s3_cost + sql_dbu_cost + sql_ec2_cost + dev_cost + s3_table_cost
+    return {
+        "databricks_dbx_cost": dbx_cost,
+        "databricks_ec2_cost": ec2_cost,
+        "s3_cost": s3_cost,
+        "s3_table_cost": s3_table_cost,
+        "s3_yearly_projected_cost": s3_yearly_cost,
+        "sql_dbu_cost": sql_dbu_cost,
+        "sql_ec2_cost": sql_ec2_cost,
+        "dev_cost": dev_cost,
+        "total_monthly_cost": total_cost,
+        "total_yearly_cost": total_cost * 12,
+    }
+
+
+def scenario_shard(scenario):
+    """The (cloud, region, plan) rate card shard a scenario is priced with."""
+    return tuple(scenario.get(key) or default for key, default in zip(("cloud", "region", "plan"), DEFAULT_SHARD))
+
+
+@functools.lru_cache(maxsize=RATE_SHARD_CACHE_SIZE)
+def shard_global_data(shard):
+    """Lookups of one rate card shard, built on first use and kept per worker process."""
+    return build_global_data(shard=shard)
+
+
+def _init_worker():
+    shard_global_data(DEFAULT_SHARD)
+
+
+def _estimate_file(path):
+    """Summary row for one scenario file; failures are reported in the row instead of raised."""
+    row = {"scenario": os.path.splitext(os.path.basename(path))[0], "file": path, "error": None}
+    try:
+        scenario = load_scenario(path)
+        row["scenario"] = scenario.get("name", row["scenario"])
+        shard = scenario_shard(scenario)
+        row["region"] = shard[1]
+        row.update(price_scenario(scenario, shard_global_data(shard)))
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def expand_paths(patterns):
+    """Expands glob patterns (for shells that do not) and keeps plain paths as given."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def estimate(paths, workers=None):
+    """Prices every scenario file in a process pool and returns one summary DataFrame."""
+    if workers == 1:
+        _init_worker()
+        rows = [_estimate_file(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            chunksize = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+            rows = list(pool.map(_estimate_file, paths, chunksize=chunksize))
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+def write_summary(summary, out):
+    """Writes the summary as CSV (or Parquet for a .parquet path); '-' writes CSV to stdout."""
+    if out == '-':
+        summary.to_csv(sys.stdout, index=False)
+    elif out.endswith('.parquet'):
+        summary.to_parquet(out, index=False)
+    else:
+        summary.to_csv(out, index=False)
+
+
+def reprice(args):
+    """Runs the reprice command: writes the delta report of the scenarios affected by the rate card change."""
+    if not os.path.exists(args.store):
+        print(f"{args.store}: no scenario store", file=sys.stderr)
+        return 1
+    new_sources = sources_in(args.new_rates) if args.new_rates else RATE_SOURCES
+    start = time.perf_counter()
+    report = reprice_store(args.store, sources_in(args.old_rates), new_sources, args.workers)
+    elapsed = time.perf_counter() - start
+    write_summary(report, args.out)
+    print(f"Repriced {len(report)} affected scenarios in {elapsed:.2f} s; net monthly change {report['delta'].sum():+,.2f}",
+          file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Headless Databricks & AWS cost estimation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    estimate_parser = commands.add_parser("estimate", help="price scenario files and write one summary table")
+    estimate_parser.add_argument("scenarios", nargs="+", help="scenario files or glob patterns (.yaml, .yml, .json)")
+    estimate_parser.add_argument("--out", default="-", help="summary file (.csv or .parquet); default: CSV on stdout")
+    estimate_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    reprice_parser = commands.add_parser("reprice", help="reprice the saved scenarios affected by a rate card change")
+    reprice_parser.add_argument("--old-rates", required=True, help="directory with the previous rate card files")
+    reprice_parser.add_argument("--new-rates", default=None, help="directory with the updated rate card files (default: the app's)")
+    reprice_parser.add_argument("--store", default=DEFAULT_STORE, help=f"scenario store (default: {DEFAULT_STORE})")
+    reprice_parser.add_argument("--out", default="-", help="delta report file (.csv or .parquet); default: CSV on stdout")
+    reprice_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    if args.command == "reprice":
+        return reprice(args)
+
+    paths = expand_paths(args.scenarios)
+    start = time.perf_counter()
+    summary = estimate(paths, args.workers)
+    elapsed = time.perf_counter() - start
+    write_summary(summary, args.out)
+
+    failed = summary["error"].notna().sum()
+    for _, row in summary[summary["error"].notna()].iterrows():
+        print(f"{row['file']}: {row['error']}", file=sys.stderr)
+    print(f"Priced {len(summary) - failed} of {len(summary)} scenarios in {elapsed:.2f} s "
+          f"({len(summary) / elapsed:.1f} scenarios/s)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
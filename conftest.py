@@ -0,0 +1,2 @@
+# conftest.py
+# Puts the app's modules on sys.path for the tests under tests/
@@ -0,0 +1,401 @@
+# cost_engine.py
+"""
+Cost calculators with no Streamlit dependency.
+Every function takes its inputs and the global_data lookups explicitly, so the
+same logic prices the app's session state and scenario files from the CLI.
+"""
+import numpy as np
+import pandas as pd
+from rate_index import PHOTON_SUFFIX
+
+S3_TABLE_COLUMNS = ["Table Name", "Records", "Columns", "Table", "Avg_Column_length"]
+S3_TABLE_NUMERIC_COLUMNS = ["Records", "Columns", "Table", "Avg_Column_length"]
+# Optional share of EC2 hours on spot instances, in percent, per job or development cluster
+SPOT_COLUMN = "Spot %"
+
+
+def s3_table_frame(tables):
+    """
+    Returns one zone's tables as a DataFrame with the S3_TABLE_COLUMNS.
+    `tables` may be a DataFrame, a list of row dicts or a dict of columns;
+    missing or non-numeric counts become 0 and missing names "".
+    """
+    df = pd.DataFrame(tables).reindex(columns=S3_TABLE_COLUMNS)
+    df[S3_TABLE_NUMERIC_COLUMNS] = df[S3_TABLE_NUMERIC_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int64')
+    df["Table Name"] = df["Table Name"].fillna('').astype(object)
+    return df.reset_index(drop=True)
+
+
+def _s3_table_counts(tables):
+    """One zone's numeric table columns as an (n, 4) float array, with 0 for missing values."""
+    counts = pd.DataFrame(tables).reindex(columns=S3_TABLE_NUMERIC_COLUMNS)
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in counts.dtypes):
+        counts = counts.apply(pd.to_numeric, errors='coerce')
+    return np.nan_to_num(counts.to_numpy(dtype=float))
+
+
+def size_s3_tables(s3_table_based, bpc=1, cr=0.5):
+    """
+    Returns the estimated GB of each zone as a Series indexed by zone.
+    Every table is sized in one vectorized expression over all zones and
+    summed per zone with a single np.bincount.
+    """
+    zones = list(s3_table_based)
+    counts = [_s3_table_counts(s3_table_based[zone]) for zone in zones]
+    zone_codes = np.repeat(np.arange(len(zones)), [len(c) for c in counts])
+    if not len(zone_codes):
+        return pd.Series(0.0, index=zones)
+    records, num_columns, num_tables, num_length = np.concatenate(counts).T
+
+    # Size_bytes ≈ R × C × L × bpc × cr, converted to GB for every copy of the table
+    estimated_gb = records * num_columns * num_length * bpc * cr / (1024 ** 3) * num_tables
+    zone_gb = np.bincount(zone_codes, weights=estimated_gb, minlength=len(zones))
+    return pd.Series(zone_gb, index=zones)
+
+
+# S3 Standard-style tiers: the first 50 TB, the next 450 TB, and everything over 500 TB
+S3_TIER_LIMITS_GB = (50 * 1024, 500 * 1024)
+S3_TIER_RATE_KEYS = ('Rate/GB_50TB', 'Rate/GB_500TB', 'Rate/GB_over500TB')
+S3_PROJECTION_PERIODS = {'quarterly_cost': 3, 'half_yearly_cost': 6, 'yearly_cost': 12}
+
+
+def s3_direct_zones(enable_s3_stage=True):
+    """The direct storage zones priced by the app, in display order."""
+    zones = ["Landing Zone", "L0 / Raw", "L1 / Curated", "L2 / Data Product"]
+    if enable_s3_stage:
+        zones.insert(1, "Stage")
+    return zones
+
+
+def s3_direct_arrays(s3_direct, zones, s3_pricing):
+    """Returns (stored GB, monthly growth %, (zone x 3) tier rates) arrays for the given zones."""
+    configs = [s3_direct.get(zone, {}) for zone in zones]
+    storage_gb = np.array([c.get("amount", 0) * 1024 if c.get("unit") == "TB" else c.get("amount", 0) for c in configs], dtype=float)
+    growth_percent = np.array([c.get("monthly_growth_percent", 0.0) for c in configs], dtype=float)
+    tier_rates = np.array([[s3_pricing.get(c.get("class"), {}).get(key, 0) for key in S3_TIER_RATE_KEYS] for c in configs], dtype=float).reshape(len(zones), 3)
+    return storage_gb, growth_percent, tier_rates
+
+
+def project_s3_volumes(storage_gb, growth_percent, months):
+    """
+    Returns a (zone x month) array of stored GB, starting from `storage_gb` in
+    month 1 and compounding each zone's monthly growth percentage. Inputs with
+    a leading sample axis give a (sample x zone x month) array.
+    """
+    growth_factor = 1 + np.asarray(growth_percent, dtype=float) / 100
+    return np.asarray(storage_gb, dtype=float)[..., None] * growth_factor[..., None] ** np.arange(months)
+
+
+def tiered_s3_cost(volume_gb, tier_rates):
+    """
+    Returns the monthly cost of each cell of a (zone x month) or
+    (sample x zone x month) volume array.
+    Tier rates, one row of three per zone, apply marginally: each GB is
+    charged at the rate of the tier it falls in, not at the rate of the
+    tier that holds the whole volume.
+    """
+    low, high = S3_TIER_LIMITS_GB
+    first = np.minimum(volume_gb, low)
+    second = np.clip(volume_gb - low, 0, high - low)
+    third = np.maximum(volume_gb - high, 0)
+    return first * tier_rates[:, 0:1] + second * tier_rates[:, 1:2] + third * tier_rates[:, 2:3]
+
+
+def s3_period_costs(projection):
+    """Cumulative quarterly, half-yearly and yearly cost of each zone in a month-by-month projection."""
+    return pd.DataFrame(
+        {name: projection.iloc[:, :months].sum(axis=1) for name, months in S3_PROJECTION_PERIODS.items()},
+        index=projection.index,
+    )
+
+
+def job_instances(jobs_df, global_data):
+    """Bare instance name of each job; Instance Type may be a dropdown label or already a name."""
+    return jobs_df['Instance Type'].map(global_data['FLAT_INSTANCE_LIST']).fillna(jobs_df['Instance Type'])
+
+
+def job_rate_positions(jobs_df, global_data):
+    """RATE_INDEX position of each job's (compute type, instance), -1 where unknown."""
+    return global_data['RATE_INDEX'].positions(jobs_df['Compute type'], job_instances(jobs_df, global_data))
+
+
+def spot_shares(frame, column=SPOT_COLUMN):
+    """
+    Spot share (0-1) of each row from an optional percentage column of a
+    DataFrame (or dict of arrays); 0 where missing or blank.
+    """
+    if column not in frame:
+        return np.zeros(len(frame))
+    percent = pd.to_numeric(np.asarray(frame[column], dtype=object), errors='coerce').astype(float)
+    return np.clip(np.nan_to_num(percent), 0, 100) / 100
+
+
+def blended_ec2_rates(on_demand_per_hour, instances, spot_share, global_data):
+    """
+    EC2 $/hour with `spot_share` of the hours at the instance's spot price and
+    the rest on demand. The spot prices are only loaded once some share is
+    non-zero; instances without a spot price (or without an on-demand price)
+    stay on demand.
+    """
+    on_demand_per_hour = np.asarray(on_demand_per_hour, dtype=float)
+    spot_share = np.broadcast_to(np.asarray(spot_share, dtype=float), on_demand_per_hour.shape)
+    if not spot_share.any():
+        return on_demand_per_hour
+    spot_per_hour = global_data['SPOT_RATES'].per_hour(instances)
+    spot_per_hour = np.where(np.isnan(spot_per_hour) | (on_demand_per_hour <= 0), on_demand_per_hour, spot_per_hour)
+    return on_demand_per_hour + spot_share * (spot_per_hour - on_demand_per_hour)
+
+
+def job_hourly_rates(jobs_df, global_data):
+    """
+    Returns (DBU/hour, Rate/hour, EC2 $/hour) arrays for each job, resolved in
+    one indexed lookup on (compute type, instance); unknown pairs get 0.0.
+    EC2 is blended with spot prices by the optional "Spot %" column.
+    """
+    rate_index = global_data['RATE_INDEX']
+    instances = job_instances(jobs_df, global_data)
+    positions = rate_index.positions(jobs_df['Compute type'], instances)
+    ec2_per_hour = blended_ec2_rates(rate_index.take('ec2_per_hour', positions), instances, spot_shares(jobs_df), global_data)
+    return (
+        rate_index.take('dbu_per_hour', positions),
+        rate_index.take('rate_per_hour', positions),
+        ec2_per_hour,
+    )
+
+
+def right_size_jobs(jobs_df, global_data):
+    """
+    Suggests the cheapest instance (Rate/hour + EC2/hour) of each job's compute
+    type that has at least the job's required vCPU and memory. Requirements
+    come from optional "Min vCPU" / "Min Memory (GB)" columns and default to
+    the job's current instance. All jobs are resolved in one batch query.
+    Returns one row per job with the current and suggested instance label and
+    monthly cost; the suggestion is the current instance when nothing cheaper fits.
+    """
+    rate_index = global_data['RATE_INDEX']
+    current = job_rate_positions(jobs_df, global_data)
+    current_vcpu = np.where(current >= 0, rate_index.vcpu[current], np.nan)
+    current_memory = np.where(current >= 0, rate_index.memory_gb[current], np.nan)
+    min_vcpu = jobs_df['Min vCPU'].fillna(pd.Series(current_vcpu, index=jobs_df.index)) if 'Min vCPU' in jobs_df else current_vcpu
+    min_memory = jobs_df['Min Memory (GB)'].fillna(pd.Series(current_memory, index=jobs_df.index)) if 'Min Memory (GB)' in jobs_df else current_memory
+
+    suggested = global_data['CHEAPEST_INSTANCE_INDEX'].cheapest(jobs_df['Compute type'], min_vcpu, min_memory)
+    hourly_cost = rate_index.take('rate_per_hour', current) + rate_index.take('ec2_per_hour', current)
+    suggested_hourly_cost = rate_index.take('rate_per_hour', suggested) + rate_index.take('ec2_per_hour', suggested)
+    # Keep the current instance when nothing fits, or when it meets the requirements and nothing cheaper does
+    current_fits = (current >= 0) & (current_vcpu >= np.asarray(min_vcpu, dtype=float)) & (current_memory >= np.asarray(min_memory, dtype=float))
+    keep = (suggested < 0) | (current_fits & (suggested_hourly_cost >= hourly_cost))
+    suggested = np.where(keep, current, suggested)
+    suggested_hourly_cost = np.where(keep, hourly_cost, suggested_hourly_cost)
+
+    # Offer suggestions as dropdown labels, resolved once per rate card row and gathered per job
+    instance_labels = {instance: label for label, instance in global_data['FLAT_INSTANCE_LIST'].items()}
+    row_labels = np.array([instance_labels.get(instance, instance) for instance in rate_index.instances] + [None], dtype=object)
+    suggested_labels = row_labels[suggested]
+
+    node_hours = (jobs_df["Nodes"] + 1).to_numpy(dtype=float) * jobs_df["Runtime (hrs)"].to_numpy(dtype=float) * jobs_df["Runs/Month"].to_numpy(dtype=float)
+    return pd.DataFrame({
+        "Job Name": jobs_df["Job Name"],
+        "Compute type": jobs_df["Compute type"],
+        "Instance Type": jobs_df["Instance Type"],
+        "Suggested Instance": suggested_labels,
+        "Current Cost": hourly_cost * node_hours,
+        "Suggested Cost": suggested_hourly_cost * node_hours,
+        "Savings": (hourly_cost - suggested_hourly_cost) * node_hours,
+    }, index=jobs_df.index)
+
+
+def sweep_candidates(global_data, compute_types):
+    """Sorted base instance names (without the Photon suffix) offered for any of `compute_types`."""
+    rate_index = global_data['RATE_INDEX']
+    offered = pd.Series(rate_index.instances[np.isin(rate_index.compute_types, list(compute_types))], dtype=object)
+    return sorted(offered.str.removesuffix(PHOTON_SUFFIX).unique())
+
+
+def sweep_tier(jobs_df, global_data, node_counts, compute_types, instances):
+    """
+    Prices a tier as if every job ran on n workers of one instance and compute
+    type, for every (compute type, n, instance) combination.
+    `instances` are base names; a compute type without that exact instance uses
+    its "<name> (Photon)" variant. Returns a (compute type x node count x instance)
+    array of monthly DBX + EC2 cost, NaN where the rate card has no such pair.
+    """
+    rate_index = global_data['RATE_INDEX']
+    instances = np.asarray(instances, dtype=object)
+    type_grid = np.repeat(np.asarray(compute_types, dtype=object), len(instances))
+    instance_grid = np.tile(instances, len(compute_types))
+    positions = rate_index.positions(type_grid, instance_grid)
+    positions = np.where(positions >= 0, positions, rate_index.positions(type_grid, instance_grid + PHOTON_SUFFIX))
+    hourly_cost = np.where(
+        positions >= 0, rate_index.rate_per_hour[positions] + rate_index.ec2_per_hour[positions], np.nan
+    ).reshape(len(compute_types), len(instances))
+
+    # Cost is linear in node hours, so the jobs reduce to their total runtime x runs
+    job_hours = (jobs_df["Runtime (hrs)"].to_numpy(dtype=float) * jobs_df["Runs/Month"].to_numpy(dtype=float)).sum()
+    nodes = np.asarray(node_counts, dtype=float)
+    return (nodes[None, :, None] + 1) * hourly_cost[:, None, :] * job_hours
+
+
+def price_databricks_tier(jobs_df, global_data):
+    """
+    Calculates the costs for a tier of jobs.
+    Instance Type may be a dropdown label or a bare instance name.
+    Returns (jobs with DBU/DBX/EC2 columns, total DBX cost, total EC2 cost, total DBUs).
+    """
+    if jobs_df.empty:
+        cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", "DBU", "DBX", "EC2"]
+        return pd.DataFrame(columns=cols), 0, 0, 0
+
+    df = jobs_df.copy()
+    dbu_per_hour, rate_per_hour, ec2_hr_rate = job_hourly_rates(df, global_data)
+
+    # Node hours per month, driver included
+    node_hours = (df["Nodes"] + 1).to_numpy(dtype=float) * df["Runtime (hrs)"].to_numpy(dtype=float) * df["Runs/Month"].to_numpy(dtype=float)
+
+    # Calculate costs
+    df['DBU'] = dbu_per_hour * node_hours
+    df['EC2'] = ec2_hr_rate * node_hours
+    df['DBX'] = rate_per_hour * node_hours
+
+    total_dbx_cost = df['DBX'].sum()
+    total_ec2_cost = df['EC2'].sum()
+    total_dbus = df['DBU'].sum()
+
+    return df, total_dbx_cost, total_ec2_cost,total_dbus 
+
+def price_s3(s3_calc_method, s3_direct, s3_table_based, global_data, enable_s3_stage=True, horizon_months=12):
+    """
+    Calculates S3 cost for each individual zone, the total current cost,
+    and the cumulative quarterly, half-yearly and yearly cost of the
+    projection. Every month is priced on that month's projected volume, each
+    GB at the rate of the tier it falls in (see tiered_s3_cost).
+    Returns (costs per zone, total S3 cost, quarterly, half-yearly and yearly
+    projected cost, total table-based cost, projection), where projection is
+    the month-by-month cost of each direct storage zone over
+    max(horizon_months, 12) months (empty for table-based storage).
+    """
+    current_costs_per_zone = {}
+    total_s3_cost = 0
+    total_table_cost = 0
+    total_quarterly_cost = 0
+    total_half_yearly_cost = 0
+    total_yearly_cost = 0
+    projection = pd.DataFrame()
+
+    S3_PRICING = global_data.get('S3_PRICING', {})
+    bpc = 1
+    cr = 0.5
+
+    if s3_calc_method == "Direct Storage[Recommended]":
+        s3_direct_tiers = s3_direct_zones(enable_s3_stage)
+        storage_gb, growth_percent, tier_rates = s3_direct_arrays(s3_direct, s3_direct_tiers, S3_PRICING)
+        monthly_costs = tiered_s3_cost(project_s3_volumes(storage_gb, growth_percent, max(horizon_months, 12)), tier_rates)
+        projection = pd.DataFrame(monthly_costs, index=s3_direct_tiers, columns=[f"Month {m + 1}" for m in range(monthly_costs.shape[1])])
+        period_costs = s3_period_costs(projection)
+
+        current_costs_per_zone = projection["Month 1"].to_dict()
+        total_s3_cost = projection["Month 1"].sum()
+        total_quarterly_cost, total_half_yearly_cost, total_yearly_cost = period_costs.sum()
+
+    else:
+        standard_pricing = 0.023
+
+        zone_costs = size_s3_tables(s3_table_based, bpc, cr) * standard_pricing
+        current_costs_per_zone = zone_costs.to_dict()
+        total_table_cost = zone_costs.sum()
+
+
+    return current_costs_per_zone, total_s3_cost, total_quarterly_cost, total_half_yearly_cost, total_yearly_cost, total_table_cost, projection
+
+def sql_warehouse_costs(sql_warehouses, global_data):
+    """
+    Returns (DBU cost, EC2 cost, DBUs) arrays with one entry per warehouse,
+    priced in one vectorized pass over the SQL size catalog. Both costs are
+    monthly and scale with the warehouse's hours per month, so billed uptime
+    from a query history lowers the EC2 cost as well as the DBUs. A warehouse size
+    may be a size name or a dropdown label; warehouses with no hours, days or
+    nodes, or an unknown type/size, cost 0.
+    """
+    if not sql_warehouses:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    catalog = global_data['SQL_SIZE_CATALOG']
+    # Gathered a field at a time; building a DataFrame from the dicts costs more than the pricing
+    warehouses = {
+        field: np.array([warehouse.get(field) for warehouse in sql_warehouses], dtype=object)
+        for field in ("type", "size", "SQL_nodes", "hours_per_day", "days_per_month", "spot_percent")
+    }
+
+    def numeric(field, default):
+        values = pd.to_numeric(warehouses[field], errors='coerce').astype(float)
+        return np.where(np.isnan(values), default, values)
+
+    sql_nodes = numeric("SQL_nodes", 1)
+    hours_per_day = numeric("hours_per_day", 0)
+    days_per_month = numeric("days_per_month", 0)
+    positions = catalog.positions(warehouses["type"], warehouses["size"])
+    priced = (positions >= 0) & (hours_per_day > 0) & (days_per_month > 0) & (sql_nodes > 0)
+
+    def take(values):
+        return np.where(priced, values[positions], 0.0)
+
+    rate_per_hour = take(catalog.rate_per_hour)
+    ec2_per_hour = blended_ec2_rates(
+        take(catalog.ec2_per_hour), catalog.worker_instances[positions], spot_shares(warehouses, "spot_percent"), global_data
+    )
+    hours_per_month = hours_per_day * days_per_month
+
+    dbu_cost = rate_per_hour * hours_per_month * sql_nodes
+    ec2_cost = (rate_per_hour + ec2_per_hour * sql_nodes) * hours_per_month
+    dbus_used = take(catalog.dbu_per_hour) * hours_per_month * sql_nodes
+    return dbu_cost, ec2_cost, dbus_used
+
+
+def price_sql_warehouses(sql_warehouses, global_data):
+    """
+    Calculates total DBU and EC2 cost and total DBUs for a list of warehouses.
+    A warehouse size may be a size name or a dropdown label.
+    """
+    dbu_cost, ec2_cost, dbus_used = sql_warehouse_costs(sql_warehouses, global_data)
+    return dbu_cost.sum(), ec2_cost.sum(), dbus_used.sum()
+
+def price_dev_costs(dev_df, global_data):
+    """
+    Calculates DBX, EC2 and Total for each development cluster.
+    Driver and worker types may be dropdown labels or bare instance names.
+    Returns (total DBX cost, total EC2 cost, priced clusters).
+    """
+    if dev_df is None or dev_df.empty:
+        # Return a DataFrame with all columns, initialized to handle the empty state
+        dev_df = pd.DataFrame(columns=[
+            "Compute_type", "Driver type", "Worker Type", "Nodes", "hr_per_month", 
+            "no_of_Month", "DBX", "EC2", "Total"
+        ])
+        return 0.0, 0.0, dev_df
+
+    dev_df = dev_df.copy()
+    n_clusters = len(dev_df)
+
+    # Drivers and workers are resolved together: one join of every distinct
+    # instance against the All-Purpose Compute rows of the rate index
+    labels = np.concatenate([dev_df['Driver type'].to_numpy(dtype=object), dev_df['Worker Type'].to_numpy(dtype=object)])
+    codes, uniques = pd.factorize(labels)
+    unique_instances = pd.Series(uniques, dtype=object).map(global_data['FLAT_INSTANCE_LIST_DEV']).fillna(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    rate_index = global_data['RATE_INDEX']
+    positions = rate_index.positions(np.full(len(uniques), 'All-Purpose Compute', dtype=object), unique_instances)
+    dbu_rates = np.where(codes >= 0, rate_index.take('rate_per_hour', positions)[codes], 0.0)
+    ec2_rates = np.where(codes >= 0, rate_index.take('ec2_per_hour', positions)[codes], 0.0)
+    instances = np.where(codes >= 0, unique_instances[codes], None)
+
+    spot_share = spot_shares(dev_df)
+    ec2_rates = blended_ec2_rates(ec2_rates, instances, np.tile(spot_share, 2), global_data)
+
+    nodes, hours, months = (pd.to_numeric(dev_df[column], errors='coerce').fillna(0).to_numpy(dtype=float)
+                            for column in ('Nodes', 'hr_per_month', 'no_of_Month'))
+    dev_df['DBX'] = (dbu_rates[:n_clusters] + dbu_rates[n_clusters:] * nodes) * hours * months
+    dev_df['EC2'] = (ec2_rates[:n_clusters] + ec2_rates[n_clusters:] * nodes) * hours * months
+    dev_df['Total'] = dev_df['DBX'] + dev_df['EC2']
+
+    total_dbx_cost = dev_df['DBX'].sum()
+    total_ec2_cost = dev_df['EC2'].sum()
+    
+    return total_dbx_cost, total_ec2_cost, dev_df
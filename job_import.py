@@ -0,0 +1,245 @@
+# job_import.py
+"""
+Bulk import of job inventories.
+
+Reads CSV, JSON / JSON Lines or Parquet job lists in chunks, maps their
+columns onto the job schema (see JOB_COLUMN_ALIASES), validates and routes
+each chunk to its tier with column-wide operations, and fills defaults once
+per tier with state.fill_job_defaults. Databricks Jobs API exports
+({"jobs": [{"settings": {...}}]}) are flattened with pd.json_normalize, so
+their nested fields can be matched by dotted name.
+"""
+import json
+import time
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from state import TIERS, JOB_COLUMNS, tier_job_options, fill_job_defaults
+from rate_index import PHOTON_SUFFIX
+from cost_engine import SPOT_COLUMN
+
+IMPORT_CHUNK_ROWS = 50_000
+IMPORT_FORMATS = ("csv", "json", "jsonl", "parquet")
+# Source column names accepted for each job column (and the tier), compared case-insensitively
+JOB_COLUMN_ALIASES = {
+    "Tier": ["tier", "layer", "zone", "settings.tags.tier"],
+    "Job Name": ["job name", "job_name", "name", "settings.name"],
+    "Runtime (hrs)": ["runtime (hrs)", "runtime_hours", "runtime_hrs", "runtime", "duration_hours"],
+    "Runs/Month": ["runs/month", "runs_per_month", "runs", "monthly_runs"],
+    "Compute type": ["compute type", "compute_type", "sku"],
+    "Instance Type": ["instance type", "instance_type", "instance", "node_type_id", "settings.new_cluster.node_type_id"],
+    "Nodes": ["nodes", "workers", "num_workers", "worker_nodes", "settings.new_cluster.num_workers"],
+    SPOT_COLUMN: ["spot %", "spot_percent", "spot"],
+}
+# Tier names accepted in the tier column besides the tiers themselves
+TIER_ALIASES = {
+    "stage": "Stage", "staging": "Stage",
+    "l0": "L0 / Raw", "raw": "L0 / Raw", "bronze": "L0 / Raw",
+    "l1": "L1 / Curated", "curated": "L1 / Curated", "silver": "L1 / Curated",
+    "l2": "L2 / Data Product", "data product": "L2 / Data Product", "gold": "L2 / Data Product",
+}
+
+
+class JobImport(NamedTuple):
+    """Outcome of one import."""
+    rows: int          # rows read from the file
+    imported: dict     # {tier: rows imported}
+    rejected: int      # rows dropped by validation, including rows with an unknown tier
+    unknown_tiers: tuple  # tier values that match no tier or TIER_ALIASES
+    seconds: float
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float('inf')
+
+
+def import_format(file_name):
+    """The import format of a file from its extension ('csv', 'json', 'jsonl' or 'parquet')."""
+    extension = file_name.rsplit('.', 1)[-1].lower()
+    extension = {"ndjson": "jsonl", "pq": "parquet"}.get(extension, extension)
+    if extension not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported job inventory format '.{extension}' (expected one of: {', '.join(IMPORT_FORMATS)}).")
+    return extension
+
+
+def _json_records(data):
+    """The job records of a parsed JSON document: a list, or the list under "jobs" of a Jobs API export."""
+    if isinstance(data, dict):
+        data = data.get("jobs", [data])
+    if not isinstance(data, list):
+        raise ValueError("A JSON job inventory must be a list of jobs or an object with a \"jobs\" list.")
+    return data
+
+
+def read_job_chunks(source, file_format, chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    Yields DataFrames of at most `chunk_rows` source rows from a path or file
+    object. CSV, JSON Lines and Parquet are streamed; a plain JSON document
+    is parsed whole and then chunked.
+    """
+    if file_format == "csv":
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+    elif file_format == "jsonl":
+        for chunk in pd.read_json(source, lines=True, chunksize=chunk_rows):
+            yield _flatten_nested(chunk)
+    elif file_format == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        if hasattr(source, 'read'):
+            records = _json_records(json.load(source))
+        else:
+            with open(source, encoding='utf-8') as f:
+                records = _json_records(json.load(f))
+        for start in range(0, len(records), chunk_rows):
+            yield pd.json_normalize(records[start:start + chunk_rows])
+
+
+def _flatten_nested(chunk):
+    """Flattens the chunk with pd.json_normalize only if a column holds nested objects."""
+    for column in chunk.columns:
+        first = chunk[column].first_valid_index()
+        if first is not None and isinstance(chunk[column].at[first], dict):
+            return pd.json_normalize(chunk.to_dict(orient='records'))
+    return chunk
+
+
+def map_job_columns(columns):
+    """{source column: job column} for the source columns that match an alias; the first match wins."""
+    by_name = {}
+    for column in columns:
+        by_name.setdefault(str(column).strip().lower(), column)
+    mapping = {}
+    for target, aliases in JOB_COLUMN_ALIASES.items():
+        source = next((by_name[alias] for alias in aliases if alias in by_name), None)
+        if source is not None:
+            mapping[source] = target
+    return mapping
+
+
+def route_tiers(values, default_tier):
+    """
+    The tier of each row from a tier column of tier names or TIER_ALIASES;
+    blank values get `default_tier` and values matching no tier get None.
+    """
+    names = {tier.lower(): tier for tier in TIERS}
+    names.update(TIER_ALIASES)
+    values = pd.Series(values, dtype=object)
+    keys = values.astype(str).str.strip().str.lower()
+    blank = values.isna() | (keys == "")
+    tiers = keys.map(names).astype(object)
+    tiers[blank] = default_tier
+    return tiers.where(tiers.notna(), None).to_numpy(dtype=object)
+
+
+def instance_labels(tier, global_data):
+    """
+    Series of instance dropdown labels indexed by (compute type, instance
+    name or label) for one tier; Photon labels are also indexed by the
+    bare name.
+    """
+    _, instance_prices_for_tier = tier_job_options(tier, global_data)
+    keys, labels = [], []
+    for compute_type, prices in instance_prices_for_tier.items():
+        for label, name in prices.items():
+            keys.extend([(compute_type, name), (compute_type, label)])
+            labels.extend([label, label])
+            if name.endswith(PHOTON_SUFFIX):
+                keys.append((compute_type, name.removesuffix(PHOTON_SUFFIX)))
+                labels.append(label)
+    index = pd.MultiIndex.from_tuples(keys, names=["Compute type", "Instance Type"]) if keys \
+        else pd.MultiIndex.from_arrays([[], []], names=["Compute type", "Instance Type"])
+    series = pd.Series(labels, index=index, dtype=object)
+    return series[~series.index.duplicated()]
+
+
+def validate_jobs(jobs_df, tier, global_data, labels=None):
+    """
+    Returns (valid jobs, rejected count) for one tier's imported rows. Bare
+    instance names are replaced by their dropdown label, and a blank compute
+    type becomes the first of the tier's types that offers the instance; rows with a
+    negative or non-numeric runtime, runs or node count, a compute type
+    the tier does not offer, an instance the compute type does not offer,
+    or no job field at all, are rejected. Blank cells are left for
+    fill_job_defaults.
+    """
+    compute_options, _ = tier_job_options(tier, global_data)
+    labels = instance_labels(tier, global_data) if labels is None else labels
+    df = jobs_df.reindex(columns=JOB_COLUMNS)
+
+    # A row with no job field would import as a blank default job
+    valid = df.notna().any(axis=1).to_numpy(copy=True)
+    for column in ("Runtime (hrs)", "Runs/Month", "Nodes", SPOT_COLUMN):
+        values = df[column]
+        numbers = pd.to_numeric(values, errors='coerce')
+        # Blank is fine (defaulted later); text or negative numbers are not
+        valid &= (values.isna() | (numbers >= 0)).to_numpy()
+        df[column] = numbers
+    compute_types = df["Compute type"].astype(object).to_numpy(dtype=object).copy()
+    instances = df["Instance Type"].to_numpy(dtype=object).copy()
+    valid &= pd.isna(compute_types) | np.isin(compute_types, compute_options)
+
+    for compute_type in compute_options:
+        blank = pd.isna(compute_types)
+        if not blank.any():
+            break
+        offered = labels.index.get_indexer(pd.MultiIndex.from_arrays([np.full(blank.sum(), compute_type, dtype=object), instances[blank]])) >= 0
+        compute_types[np.flatnonzero(blank)[offered]] = compute_type
+    df["Compute type"] = compute_types
+
+    positions = labels.index.get_indexer(pd.MultiIndex.from_arrays([compute_types, instances]))
+    found = positions >= 0
+    # A blank instance is defaulted later; a named one must be offered for the row's compute type
+    valid &= found | pd.isna(instances)
+    instances[found] = labels.to_numpy()[positions[found]]
+    df["Instance Type"] = instances
+    return df[valid], int((~valid).sum())
+
+
+def import_jobs(source, file_format, global_data, default_tier=TIERS[-1], chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    Reads a job inventory and returns ({tier: validated jobs}, JobImport).
+    Rows are routed by their tier column, or to `default_tier` when the
+    file has none or the row's tier is blank; rows whose tier matches no
+    tier are rejected. Defaults are not filled yet; see merge_imported_jobs.
+    """
+    start = time.perf_counter()
+    labels = {tier: instance_labels(tier, global_data) for tier in TIERS}
+    frames = {tier: [] for tier in TIERS}
+    rows = rejected = 0
+    unknown_tiers = set()
+
+    for chunk in read_job_chunks(source, file_format, chunk_rows):
+        rows += len(chunk)
+        mapping = map_job_columns(chunk.columns)
+        chunk = chunk[list(mapping)].rename(columns=mapping)
+        tiers = route_tiers(chunk["Tier"], default_tier) if "Tier" in chunk else np.full(len(chunk), default_tier, dtype=object)
+        unknown = pd.isna(tiers)
+        if unknown.any():
+            unknown_tiers.update(chunk["Tier"][unknown].astype(str).str.strip())
+            rejected += int(unknown.sum())
+        for tier in pd.unique(tiers[~unknown]):
+            valid, n_rejected = validate_jobs(chunk[tiers == tier], tier, global_data, labels[tier])
+            frames[tier].append(valid)
+            rejected += n_rejected
+
+    imported = {tier: pd.concat(parts, ignore_index=True) for tier, parts in frames.items() if parts and sum(map(len, parts))}
+    report = JobImport(
+        rows, {tier: len(jobs) for tier, jobs in imported.items()}, rejected, tuple(sorted(unknown_tiers)), time.perf_counter() - start
+    )
+    return imported, report
+
+
+def merge_imported_jobs(dbx_jobs, imported, global_data, replace=False):
+    """
+    Returns a copy of `dbx_jobs` with each tier's imported jobs appended to
+    (or, with `replace`, replacing) its current jobs, defaults filled.
+    """
+    merged = dict(dbx_jobs)
+    for tier, jobs_df in imported.items():
+        current = dbx_jobs.get(tier)
+        if not replace and current is not None and not current.empty:
+            jobs_df = pd.concat([current.reindex(columns=JOB_COLUMNS), jobs_df], ignore_index=True)
+        merged[tier] = fill_job_defaults(jobs_df, tier, global_data)
+    return merged
@@ -0,0 +1,172 @@
+# lookups.py
+"""
+Rate card frames and the lookup structures derived from them (global_data).
+Nothing here depends on Streamlit, so the app, the batch CLI and the
+benchmarks all build their lookups the same way.
+"""
+import threading
+from types import MappingProxyType
+import pandas as pd
+from rate_index import RateIndex, CheapestInstanceIndex, InstancePriceIndex, SqlSizeCatalog
+from rate_card_store import load_rate_sources, compiled_rate_card, RATE_SOURCES, DEFAULT_SHARD
+
+RATE_COLUMNS = ['Compute type', 'Instance', 'vCPU', 'Memory (GB)', 'DBU/hour', 'Rate/hour', 'onDemandLinuxHr']
+JOB_COMPUTE_TYPES = ['DLT Advanced Compute Photon', 'Jobs Compute', 'Jobs Compute Photon', 'DLT Advanced Compute']
+SQL_COMPUTE_TYPES = ['SQL Pro Compute', 'SQL Compute']
+DEV_COMPUTE_TYPES = ['All-Purpose Compute']
+SPOT_RATE_COLUMNS = ['Instance', 'spotLinuxHr']
+# Indexed rate card shards kept per process; least recently used ones are dropped
+RATE_SHARD_CACHE_SIZE = 4
+
+
+def load_rate_frames(shard=DEFAULT_SHARD, sources=RATE_SOURCES, compiled=None):
+    """
+    Returns (jobs df, SQL df, development df, S3 df) from the rate card sources,
+    or from the `compiled` file of one version of them, with the jobs and
+    development rates of one (cloud, region, plan) shard.
+    Raises ValueError if any of them is empty.
+    """
+    frames = load_rate_sources(usecols={'rates': RATE_COLUMNS}, sources=sources, shard=shard, compiled=compiled)
+    data, sql_data, s3_data = frames['rates'], frames['sql'], frames['s3']
+    if data.empty:
+        cloud, region, plan = shard
+        raise ValueError(f"The rate card has no {cloud} rates for region {region} ({plan} plan).")
+
+    # data for Databricks Jobs/Pipelines
+    df = data[data['Compute type'].isin(JOB_COMPUTE_TYPES)]
+    # data for SQL Warehouses
+    df_sql = sql_data[sql_data['Compute type'].isin(SQL_COMPUTE_TYPES)]
+    # data for develoment cost
+    df_dev = data[data['Compute type'].isin(DEV_COMPUTE_TYPES)]
+    # s3 df
+    s3_df = s3_data.copy()
+    if df.empty or df_sql.empty or df_dev.empty or s3_df.empty:
+        raise ValueError("The data is empty or invalid.")
+    return df, df_sql, df_dev, s3_df
+
+
+class LazySpotRates:
+    """
+    Spot EC2 $/hour per instance, read from the rate card on first use.
+    Only the Instance and spotLinuxHr columns of the shard's rates are loaded,
+    so estimates without spot usage never pay for them; the index is shared
+    by every session that holds the same global_data. Given the `compiled`
+    file the on-demand rates came from, the spot prices are read from that
+    same version of the rate card even after the sources change.
+    """
+
+    def __init__(self, load=None, shard=DEFAULT_SHARD, sources=RATE_SOURCES, compiled=None):
+        self._load = load or (lambda: load_rate_sources(
+            usecols={'rates': SPOT_RATE_COLUMNS}, sources=sources, names=['rates'], shard=shard, compiled=compiled
+        )['rates'])
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._index is not None
+
+    def per_hour(self, instances):
+        """Spot $/hour of each instance, NaN where the rate card has no spot price."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    spot = self._load()
+                    self._index = InstancePriceIndex(spot['Instance'], spot['spotLinuxHr'])
+        return self._index.per_hour(instances)
+
+
+def populate_global_data(df, df_sql, df_dev, s3_df, shard=DEFAULT_SHARD, sources=RATE_SOURCES, spot_rates=None):
+    """
+    Builds the lookup dictionaries and lists from the loaded DataFrames.
+    This includes grouping instances by their compute type.
+    `shard` is the (cloud, region, plan) the jobs and development rates belong to,
+    and `sources` the rate card files the spot prices are read from, unless
+    `spot_rates` gives the LazySpotRates to use.
+    """
+    # Jobs/Pipelines and All-Purpose rates share one index keyed by (compute type, instance)
+    RATE_INDEX = RateIndex(pd.concat([df, df_dev], ignore_index=True))
+    CHEAPEST_INSTANCE_INDEX = CheapestInstanceIndex(RATE_INDEX)
+
+    instance_labels = df['Instance'] + ' | ' + df['vCPU'].astype(str) + ' CPUs | ' + df['Memory (GB)'].astype(str) + 'GB'
+    FLAT_INSTANCE_LIST = dict(zip(instance_labels, df['Instance']))
+
+    COMPUTE_TYPE_LIST = df['Compute type'].unique().tolist()
+
+    INSTANCE_PRICES = {
+        compute_type: dict(zip(instance_labels[group.index], group['Instance']))
+        for compute_type, group in df.groupby('Compute type')
+    }
+    # Create a mapping 
+    type_name_map = {
+        'SQL Compute': 'SQL Compute',
+        'SQL Pro Compute': 'SQL Pro Compute'
+    }
+    sql_compute_types = df_sql['Compute type'].map(lambda t: type_name_map.get(t, t))
+    SQL_WAREHOUSE_TYPES_FROM_DATA = sql_compute_types.unique().tolist()
+
+    # New dictionary to map driver instance to max worker nodes
+    SQL_WORKER_COUNTS_BY_DRIVER = {
+        '2X-Small': 1, 'X-Small': 2, 'Small': 4, 'Medium': 8, 'Large': 16,
+        'X-Large': 32, '2X-Large': 64, '3X-Large': 128, '4X-Large': 128
+    }
+    # Rates, worker limits and worker instance of every (warehouse type, size)
+    SQL_SIZE_CATALOG = SqlSizeCatalog(df_sql.assign(**{'Compute type': sql_compute_types}), SQL_WORKER_COUNTS_BY_DRIVER)
+
+        #==> Deveplopment Cost Data
+    dev_labels = df_dev['Instance'] + ' | ' + df_dev['DBU/hour'].astype(str) + ' DBUs | ' + df_dev['Rate/hour'].astype(str) + '/hr'
+    FLAT_INSTANCE_LIST_DEV = dict(zip(dev_labels, df_dev['Instance']))
+
+    s3_pricing = s3_df.set_index('S3_storage')[['Rate/GB_50TB', 'Rate/GB_500TB', 'Rate/GB_over500TB']].to_dict('index')
+
+    compute_types_l0_stage = [ct for ct in COMPUTE_TYPE_LIST if ct in ('DLT Advanced Compute Photon', 'DLT Advanced Compute')]
+    compute_types_l2_l1 = [ct for ct in COMPUTE_TYPE_LIST if ct in ('Jobs Compute', 'Jobs Compute Photon')]
+
+    return {
+        'RATE_INDEX': RATE_INDEX,
+        'CHEAPEST_INSTANCE_INDEX': CHEAPEST_INSTANCE_INDEX,
+        'FLAT_INSTANCE_LIST': FLAT_INSTANCE_LIST,
+        'INSTANCE_PRICES': INSTANCE_PRICES,
+        'COMPUTE_TYPE_LIST': COMPUTE_TYPE_LIST,
+        
+        # Store the new tier-specific data for Jobs/Pipelines
+        'COMPUTE_TYPES_L0_Stage': compute_types_l0_stage,
+        'INSTANCE_PRICES_L0_Stage': {ct: prices for ct, prices in INSTANCE_PRICES.items() if ct in compute_types_l0_stage},
+        'COMPUTE_TYPES_L2_L1': compute_types_l2_l1,
+        'INSTANCE_PRICES_L2_L1': {ct: prices for ct, prices in INSTANCE_PRICES.items() if ct in compute_types_l2_l1},
+
+
+        # sql values ...
+        'SQL_SIZE_CATALOG': SQL_SIZE_CATALOG,
+        'SQL_WAREHOUSE_TYPES_FROM_DATA': SQL_WAREHOUSE_TYPES_FROM_DATA,
+        'SQL_WORKER_COUNTS_BY_DRIVER': SQL_WORKER_COUNTS_BY_DRIVER
+
+        # DEVELOPMENT COST DATA
+        ,'FLAT_INSTANCE_LIST_DEV': FLAT_INSTANCE_LIST_DEV,
+
+        #S3 data
+        'S3_PRICING': s3_pricing,
+
+        # Spot prices, loaded on first use
+        'SPOT_RATES': spot_rates or LazySpotRates(shard=shard, sources=sources),
+        'RATE_SHARD': shard
+    }
+
+
+def build_global_data(frames=None, version=None, shard=DEFAULT_SHARD, sources=RATE_SOURCES):
+    """
+    Builds the read-only global_data mapping from (df, df_sql, df_dev, s3_df),
+    loading the frames of `shard` from the rate card `sources` when none are given.
+    Frames loaded here come from one compiled version of the sources, and the
+    spot prices are read from that version too; sources that cannot be
+    compiled are parsed directly and their spot prices loaded at once.
+    """
+    spot_rates = None
+    if frames is None:
+        compiled = compiled_rate_card(sources)
+        frames = load_rate_frames(shard, sources, compiled)
+        spot_rates = LazySpotRates(shard=shard, sources=sources, compiled=compiled)
+        if compiled is None:
+            spot_rates.per_hour([])
+    df, df_sql, df_dev, s3_df = frames
+    return MappingProxyType(dict(populate_global_data(df, df_sql, df_dev, s3_df, shard, sources, spot_rates), VERSION=version))
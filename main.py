@@ -1,8 +1,8 @@
 # main.py
 import streamlit as st
 import state as s
-from calculations import calculate_databricks_costs_for_tier, calculate_s3_cost_per_zone, calculate_sql_warehouse_cost, calculate_dev_costs
-from ui_components import render_summary_column, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_configuration_guide, render_export_button , render_devepoment_tools, render_calcu_explain 
+from calculations import cached_tier_costs, cached_s3_costs, cached_sql_costs, cached_dev_costs, cached_cost_ranges
+from ui_components import render_region_selector, render_scenario_store, render_summary_column, render_databricks_tab, render_s3_tab, render_sql_warehouse_tab, render_configuration_guide, render_export_button , render_devepoment_tools, render_calcu_explain 
 from file_exportor import generate_consolidated_excel_export 
 import io 
 import pandas as pd
@@ -17,15 +17,11 @@ st.set_page_config(
 
 # --- 1. Initialize Session State ---
 s.initialize_state()
-df_rate_card, df_sql_rate_card, df_dev, s3_data = s.load_rate_card_data()
 
-# Check if data loaded successfully (either df could be None)
-if df_rate_card is None or df_sql_rate_card is None or df_dev is None:
+# Check if the shared rate card data loaded successfully
+if 'global_data' not in st.session_state:
     st.stop()
 
-# Now, pass both dataframes to populate_global_data()
-s.populate_global_data(df_rate_card, df_sql_rate_card, df_dev, s3_data)
-
 # This is for Databricks overall growth, not S3 per-zone growth
 if 'monthly_growth_percent' not in st.session_state:
     st.session_state.monthly_growth_percent = 0.0
@@ -45,11 +41,15 @@ active_tiers = s.TIERS.copy()
 if not st.session_state.enable_bronze:
     active_tiers.remove("L0 / RAW")
 
+# Each section is memoized in the session's calculation graph and is only
+# recomputed when its inputs (or the rate card version) change.
+graph = st.session_state.calc_graph
+
 for tier in active_tiers:
     # Use .get() to safely retrieve the DataFrame, defaulting to an empty DataFrame if the key doesn't exist.
     jobs_df = st.session_state.dbx_jobs.get(tier, pd.DataFrame())
     if not jobs_df.empty:
-        df_with_costs, dbu_cost, ec2_cost, _ = calculate_databricks_costs_for_tier(jobs_df)
+        df_with_costs, dbu_cost, ec2_cost, _ = cached_tier_costs(tier, jobs_df)
         calculated_dbx_data[tier] = {
             "df": df_with_costs,
             "dbu_cost": dbu_cost,
@@ -64,21 +64,28 @@ for tier in active_tiers:
         }
 
 # This line unpacks the return values, which are now correctly handled
-s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_yearly_cost, projected_s3_cost_12_months, total_table_cost = calculate_s3_cost_per_zone()
-sql_dbu_cost, sql_ec2_cost, sql_dbu = calculate_sql_warehouse_cost()
-dev_dbx_cost, dev_ec2_cost, _ = calculate_dev_costs()
+s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_yearly_cost, projected_s3_cost_12_months, total_table_cost, s3_projection = cached_s3_costs()
+sql_dbu_cost, sql_ec2_cost, sql_dbu = cached_sql_costs()
+dev_dbx_cost, dev_ec2_cost, dev_priced = cached_dev_costs()
 dev_cost = dev_dbx_cost + dev_ec2_cost
-databricks_total_cost = sum(data['dbu_cost'] + data['ec2_cost'] for data in calculated_dbx_data.values())
+databricks_total_cost = graph.node(
+    "dbx_total", lambda: sum(data['dbu_cost'] + data['ec2_cost'] for data in calculated_dbx_data.values()),
+    key=[(tier, graph.digest(f"dbx:{tier}") if not data["df"].empty else None) for tier, data in calculated_dbx_data.items()]
+)
 total_cost = databricks_total_cost + s3_cost + sql_dbu_cost + sql_ec2_cost + dev_cost + total_table_cost
 quarterly_total_cost = total_cost * 3
 half_yearly_total_cost = total_cost * 6
 yearly_total_cost = total_cost * 12
+# Optional Monte Carlo P10/P50/P90 ranges for the whole estimate
+cost_ranges = cached_cost_ranges(active_tiers) if st.session_state.simulate_costs else None
 # --- 3. Render Main Layout ---
 title_col, controls_col = st.columns([4, 1])
 
 with title_col:
     st.title("☁️ Cloud Cost Calculator")
     st.caption("Databricks & AWS Cost Estimation")
+    render_region_selector()
+    render_scenario_store()
 
 with controls_col:
     # Arrange theme toggle and export button horizontally
@@ -92,7 +99,7 @@ with controls_col:
             st.session_state.s3_direct,
             st.session_state.s3_table_based,
             st.session_state.sql_warehouses, 
-            st.session_state.dev_costs,
+            dev_priced,
             s3_cost,  
             sql_dbu_cost,
             sql_ec2_cost, 
@@ -101,7 +108,8 @@ with controls_col:
             total_monthly_summarized_cost=total_cost,
             total_quarterly_cost = quarterly_total_cost,
             total_half_yearly_cost = half_yearly_total_cost,
-            total_yearly_cost_summarized=yearly_total_cost
+            total_yearly_cost_summarized=yearly_total_cost,
+            s3_projection=s3_projection
         )
     with theme_col:
         # Custom theme toggle using a button
@@ -132,7 +140,7 @@ with main_col:
         render_configuration_guide()
     with tab2:
         # Pass the projected_s3_cost_12_months to render_s3_tab
-        render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_yearly_cost, projected_s3_cost_12_months, total_table_cost)
+        render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_yearly_cost, projected_s3_cost_12_months, total_table_cost, s3_projection)
     with tab3:
         render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, sql_dbu)
     with tab4:
@@ -143,4 +151,4 @@ with main_col:
 
 with summary_col:
     # Pass the projected_s3_cost_12_months to render_summary_column
-    render_summary_column(total_cost, databricks_total_cost, s3_cost, sql_dbu, projected_s3_cost_12_months, quarterly_total_cost, half_yearly_total_cost, yearly_total_cost, dev_cost,total_table_cost)
+    render_summary_column(total_cost, databricks_total_cost, s3_cost, sql_dbu, projected_s3_cost_12_months, quarterly_total_cost, half_yearly_total_cost, yearly_total_cost, dev_cost,total_table_cost, cost_ranges)
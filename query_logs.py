@@ -0,0 +1,165 @@
+# query_logs.py
+"""
+SQL warehouse uptime from query history.
+
+A query history file (CSV or Parquet) holds one row per query with the
+warehouse it ran on and its start and end timestamps. The file is streamed
+in chunks; each chunk's queries are merged per warehouse into busy intervals
+(sorted interval merge) and merged again with the intervals kept so far, so
+memory grows with the number of busy intervals rather than with the number
+of queries.
+
+A warehouse with auto-suspend keeps running for `suspend_after` minutes
+after its last query, so its billed uptime is the union of
+[query start, query end + suspend_after] over all queries. Busy intervals
+are merged across gaps of up to MIN_SUSPEND_MINUTES, which gives the exact
+same union for any suspend window of at least that length.
+"""
+import os
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+QUERY_LOG_CHUNK_ROWS = 1_000_000
+# Shortest auto-suspend window the intervals stay exact for
+MIN_SUSPEND_MINUTES = 1
+# Accepted names for the warehouse, start and end columns, in order of preference
+WAREHOUSE_COLUMNS = ("warehouse_id", "warehouse_name", "warehouse")
+START_COLUMNS = ("start_time", "start")
+END_COLUMNS = ("end_time", "end")
+
+NS_PER_MINUTE = 60 * 10**9
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+
+
+class QueryLog(NamedTuple):
+    """Busy intervals per warehouse from a query history file."""
+    source: tuple            # (path, size, mtime) of the file, identifies the log
+    warehouses: np.ndarray   # warehouse key of each code
+    codes: np.ndarray        # warehouse code of each busy interval
+    starts: np.ndarray       # int64 ns, sorted by (code, start)
+    ends: np.ndarray         # int64 ns
+    active_days: np.ndarray  # days with at least one query, per warehouse code
+    rows: int                # queries read
+
+
+def merge_intervals(codes, starts, ends, gap=0):
+    """
+    Merges intervals per code that overlap or are at most `gap` apart
+    (a scalar or one gap per interval, in the units of the times).
+    Returns (codes, starts, ends) of the merged intervals sorted by (code, start).
+    """
+    if len(starts) == 0:
+        return codes, starts, ends
+    order = np.lexsort((starts, codes))
+    codes, starts, ends = codes[order], starts[order], ends[order]
+    gap = gap[order] if np.ndim(gap) else gap
+    # Furthest point each code's intervals reach so far, gap included
+    reach = pd.Series(ends + gap).groupby(codes).cummax().to_numpy()
+    new_interval = np.ones(len(starts), dtype=bool)
+    new_interval[1:] = (codes[1:] != codes[:-1]) | (starts[1:] > reach[:-1])
+    first = np.flatnonzero(new_interval)
+    return codes[first], starts[first], np.maximum.reduceat(ends, first)
+
+
+def _find_column(columns, candidates, what):
+    for name in candidates:
+        if name in columns:
+            return name
+    raise ValueError(f"The query log has no {what} column (expected one of: {', '.join(candidates)}).")
+
+
+def _log_columns(columns):
+    return (
+        _find_column(columns, WAREHOUSE_COLUMNS, "warehouse"),
+        _find_column(columns, START_COLUMNS, "start time"),
+        _find_column(columns, END_COLUMNS, "end time"),
+    )
+
+
+def read_query_log_chunks(path, chunk_rows=QUERY_LOG_CHUNK_ROWS):
+    """Yields DataFrames of (warehouse, start, end) with at most `chunk_rows` rows, reading only those columns."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        columns = _log_columns(parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=list(columns)):
+            yield batch.to_pandas().set_axis(["warehouse", "start", "end"], axis=1)
+    else:
+        columns = _log_columns(pd.read_csv(path, nrows=0).columns)
+        for chunk in pd.read_csv(path, usecols=list(columns), chunksize=chunk_rows):
+            yield chunk[list(columns)].set_axis(["warehouse", "start", "end"], axis=1)
+
+
+def _to_ns(values):
+    return pd.to_datetime(values, utc=True, errors='coerce').to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def load_query_log(path, chunk_rows=QUERY_LOG_CHUNK_ROWS):
+    """
+    Streams a query history file into a QueryLog. Rows with an unparseable
+    timestamp or an end before their start are skipped.
+    """
+    stat = os.stat(path)
+    gap = MIN_SUSPEND_MINUTES * NS_PER_MINUTE
+    warehouse_codes = {}
+    codes, starts, ends = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    days = np.zeros(0, dtype=np.int64)
+    rows = 0
+
+    for chunk in read_query_log_chunks(path, chunk_rows):
+        rows += len(chunk)
+        chunk_codes, uniques = pd.factorize(chunk["warehouse"].astype(str))
+        for key in uniques:
+            warehouse_codes.setdefault(key, len(warehouse_codes))
+        chunk_codes = np.array([warehouse_codes[key] for key in uniques], dtype=np.int64)[chunk_codes]
+        chunk_starts, chunk_ends = _to_ns(chunk["start"]), _to_ns(chunk["end"])
+        valid = (chunk_starts != np.iinfo(np.int64).min) & (chunk_ends != np.iinfo(np.int64).min) & (chunk_ends >= chunk_starts)
+        chunk_codes, chunk_starts, chunk_ends = chunk_codes[valid], chunk_starts[valid], chunk_ends[valid]
+
+        # (warehouse, day) pairs with queries, as one int64 per pair
+        days = np.union1d(days, chunk_codes * 1_000_000 + chunk_starts // NS_PER_DAY)
+        codes, starts, ends = merge_intervals(
+            np.concatenate([codes, chunk_codes]), np.concatenate([starts, chunk_starts]), np.concatenate([ends, chunk_ends]), gap
+        )
+
+    warehouses = np.array(list(warehouse_codes), dtype=object)
+    active_days = np.bincount(days // 1_000_000, minlength=len(warehouses))
+    return QueryLog((path, stat.st_size, stat.st_mtime_ns), warehouses, codes, starts, ends, active_days, rows)
+
+
+def billed_hours_per_day(query_log, suspend_after_minutes):
+    """
+    Billed uptime per active day of each warehouse in the log, given the
+    auto-suspend window of each warehouse code (minutes, at least MIN_SUSPEND_MINUTES).
+    """
+    suspend_ns = np.maximum(np.asarray(suspend_after_minutes, dtype=float), MIN_SUSPEND_MINUTES) * NS_PER_MINUTE
+    suspend_ns = suspend_ns.astype(np.int64)
+    codes, starts, ends = merge_intervals(query_log.codes, query_log.starts, query_log.ends, suspend_ns[query_log.codes])
+    uptime_ns = np.bincount(codes, weights=(ends + suspend_ns[codes] - starts).astype(float), minlength=len(query_log.warehouses))
+    return uptime_ns / 3.6e12 / np.maximum(query_log.active_days, 1)
+
+
+def apply_query_log(sql_warehouses, query_log):
+    """
+    Returns the warehouses with hours_per_day replaced by the billed uptime
+    per active day from the query log, for warehouses with auto-suspend on
+    that appear in the log (matched on id, then name). Other warehouses keep
+    their flat hours; the input list is not modified.
+    """
+    if query_log is None or not sql_warehouses:
+        return sql_warehouses
+    codes = {key: code for code, key in enumerate(query_log.warehouses)}
+    matched = [codes.get(str(w.get("id")), codes.get(str(w.get("name")))) if w.get("auto_suspend") else None for w in sql_warehouses]
+    if all(code is None for code in matched):
+        return sql_warehouses
+
+    suspend_after = np.full(len(query_log.warehouses), MIN_SUSPEND_MINUTES, dtype=float)
+    for warehouse, code in zip(sql_warehouses, matched):
+        if code is not None:
+            suspend_after[code] = warehouse.get("suspend_after") or MIN_SUSPEND_MINUTES
+    hours_per_day = np.minimum(billed_hours_per_day(query_log, suspend_after), 24)
+    return [
+        warehouse if code is None else {**warehouse, "hours_per_day": float(hours_per_day[code])}
+        for warehouse, code in zip(sql_warehouses, matched)
+    ]
@@ -0,0 +1,216 @@
+# rate_card_store.py
+"""
+Compiled rate card cache.
+
+Parses final_out.csv, SQL_warehouse - Sheet1.csv and S3_Storage_cost.xlsx once
+and stores every column in a single uncompressed NumPy .npz file named after
+the hash of the source files. Later loads read only the requested columns
+from that file and fall back to parsing the CSV/XLSX sources when the
+compiled file is missing or stale.
+
+The rates source is stored as one shard per (cloud, region, plan), so a
+region can be loaded without reading the rows of every other region.
+
+Run `python rate_card_store.py` to build the compiled file ahead of time.
+"""
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+
+RATE_SOURCES = {
+    'rates': 'final_out.csv',
+    'sql': 'SQL_warehouse - Sheet1.csv',
+    's3': 'S3_Storage_cost.xlsx',
+}
+CACHE_DIR = '.rate_card_cache'
+# Bumped whenever the layout of the compiled file changes
+COMPILED_FORMAT = 2
+# Rate card shards: rows of the rates source are partitioned by these columns;
+# rows that leave one blank belong to the default shard's value
+SHARDED_SOURCE = 'rates'
+SHARD_COLUMNS = ['Cloud', 'location', 'Plan']
+DEFAULT_SHARD = ('AWS', 'us-east-1', 'Enterprise')
+
+
+def read_source(name, path):
+    """Parses one rate source from its CSV/XLSX file."""
+    if path.endswith('.xlsx'):
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def source_fingerprint(sources=RATE_SOURCES):
+    """Cheap change detector built from the size and mtime of each source file."""
+    stats = [os.stat(path) for path in sources.values()]
+    return tuple((st.st_size, st.st_mtime_ns) for st in stats)
+
+
+def source_hash(sources=RATE_SOURCES):
+    """SHA-256 over the contents of all source files, used to name the compiled file."""
+    digest = hashlib.sha256()
+    for name, path in sources.items():
+        digest.update(name.encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def compiled_path(sources=RATE_SOURCES, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"rate_cards-v{COMPILED_FORMAT}-{source_hash(sources)}.npz")
+
+
+def _encode_frame(name, df):
+    """Flattens a DataFrame into npz arrays; text columns become fixed-width unicode."""
+    arrays = {f"{name}/__columns__": np.array(df.columns, dtype=str)}
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            arrays[f"{name}/{i}"] = values.to_numpy()
+        else:
+            arrays[f"{name}/{i}"] = values.fillna('').astype(str).to_numpy(dtype=str)
+            if values.isna().any():
+                arrays[f"{name}/{i}/na"] = values.isna().to_numpy()
+    return arrays
+
+
+def _decode_frame(npz, name, usecols=None):
+    columns = list(npz[f"{name}/__columns__"])
+    wanted = columns if usecols is None else [c for c in columns if c in usecols]
+    data = {}
+    for column in wanted:
+        key = f"{name}/{columns.index(column)}"
+        values = npz[key]
+        if values.dtype.kind == 'U':
+            values = values.astype(object)
+            if f"{key}/na" in npz.files:
+                values[npz[f"{key}/na"]] = np.nan
+        data[column] = values
+    return pd.DataFrame(data, columns=wanted)
+
+
+def shard_keys(df):
+    """The (cloud, region, plan) shard of each row, as a DataFrame of SHARD_COLUMNS with blanks filled."""
+    return pd.DataFrame({
+        column: df[column].astype(object).fillna(default) if column in df else default
+        for column, default in zip(SHARD_COLUMNS, DEFAULT_SHARD)
+    }, index=df.index)
+
+
+def split_shards(df):
+    """Returns [(shard, display name, rows)] for every shard of the rates source, in first-seen order."""
+    keys = shard_keys(df)
+    names = df['locationName'] if 'locationName' in df else keys['location']
+    shards = []
+    for shard, rows in df.groupby([keys[column] for column in SHARD_COLUMNS], sort=False):
+        shard_names = names.loc[rows.index].dropna()
+        shards.append((shard, shard_names.iloc[0] if len(shard_names) else shard[1], rows))
+    return shards
+
+
+def _shard_frame_name(i):
+    return f"{SHARDED_SOURCE}@{i}"
+
+
+def compile_rate_cards(sources=RATE_SOURCES, cache_dir=CACHE_DIR):
+    """Parses every source and writes the compiled .npz file; returns its path."""
+    path = compiled_path(sources, cache_dir)
+    arrays = {}
+    for name, source in sources.items():
+        df = read_source(name, source)
+        if name != SHARDED_SOURCE:
+            arrays.update(_encode_frame(name, df))
+            continue
+        shards = split_shards(df)
+        arrays[f"{name}/__shards__"] = np.array([shard for shard, _, _ in shards], dtype=str).reshape(-1, len(SHARD_COLUMNS))
+        arrays[f"{name}/__shard_names__"] = np.array([shard_name for _, shard_name, _ in shards], dtype=str)
+        for i, (_, _, rows) in enumerate(shards):
+            arrays.update(_encode_frame(_shard_frame_name(i), rows.reset_index(drop=True)))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def compiled_rate_card(sources=RATE_SOURCES, cache_dir=CACHE_DIR):
+    """
+    Path of the compiled file of the sources as they are now, compiling it on
+    first use, or None if they cannot be compiled. Loads from that path all
+    read the same version of the rate card, however the sources change later.
+    """
+    try:
+        path = compiled_path(sources, cache_dir)
+        if not os.path.exists(path):
+            compile_rate_cards(sources, cache_dir)
+        return path
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _open_compiled(sources, cache_dir):
+    path = compiled_path(sources, cache_dir)
+    if not os.path.exists(path):
+        compile_rate_cards(sources, cache_dir)
+    return np.load(path, allow_pickle=False)
+
+
+def _decode_rates(npz, usecols, shard):
+    """The rates frame of one shard, or of every shard when `shard` is None."""
+    shards = [tuple(key) for key in npz[f"{SHARDED_SOURCE}/__shards__"]]
+    wanted = range(len(shards)) if shard is None else [i for i, key in enumerate(shards) if key == tuple(shard)]
+    frames = [_decode_frame(npz, _shard_frame_name(i), usecols) for i in wanted]
+    if not frames:
+        return _decode_frame(npz, _shard_frame_name(0), usecols).iloc[:0]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def _decode_sources(npz, usecols, names, shard):
+    return {
+        name: _decode_rates(npz, usecols.get(name), shard) if name == SHARDED_SOURCE else _decode_frame(npz, name, usecols.get(name))
+        for name in names
+    }
+
+
+def load_rate_sources(usecols=None, sources=RATE_SOURCES, cache_dir=CACHE_DIR, names=None, shard=None, compiled=None):
+    """
+    Returns {source name: DataFrame} for all rate sources, or only `names`.
+    `usecols` optionally maps a source name to the columns to load, and
+    `shard` restricts the rates source to one (cloud, region, plan).
+    Reads the compiled file when it matches the current sources, compiling it
+    on first use, and parses the CSV/XLSX files directly if that fails.
+    A `compiled` path (see compiled_rate_card) is read instead, whatever the
+    sources hold now, and is never bypassed.
+    """
+    usecols = usecols or {}
+    names = list(sources) if names is None else names
+    if compiled is not None:
+        with np.load(compiled, allow_pickle=False) as npz:
+            return _decode_sources(npz, usecols, names, shard)
+    try:
+        with _open_compiled(sources, cache_dir) as npz:
+            return _decode_sources(npz, usecols, names, shard)
+    except (OSError, ValueError, KeyError):
+        frames = {}
+        for name in names:
+            df = read_source(name, sources[name])
+            if name == SHARDED_SOURCE and shard is not None:
+                df = df[(shard_keys(df) == list(shard)).all(axis=1)].reset_index(drop=True)
+            frames[name] = df[[c for c in df.columns if c in usecols[name]]] if name in usecols else df
+        return frames
+
+
+def list_rate_shards(sources=RATE_SOURCES, cache_dir=CACHE_DIR):
+    """Returns {(cloud, region, plan): display name} for every shard of the rates source."""
+    try:
+        with _open_compiled(sources, cache_dir) as npz:
+            keys = npz[f"{SHARDED_SOURCE}/__shards__"]
+            shard_names = npz[f"{SHARDED_SOURCE}/__shard_names__"]
+            return {tuple(map(str, key)): str(shard_name) for key, shard_name in zip(keys, shard_names)}
+    except (OSError, ValueError, KeyError):
+        df = read_source(SHARDED_SOURCE, sources[SHARDED_SOURCE])
+        return {shard: shard_name for shard, shard_name, _ in split_shards(df)}
+
+
+if __name__ == '__main__':
+    print(compile_rate_cards())
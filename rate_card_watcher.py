@@ -0,0 +1,154 @@
+# rate_card_watcher.py
+"""
+Hot reload of the rate cards.
+
+A RateCardWatcher owns the published RateCardSnapshot: the fingerprint of
+the source files, their rate card shards and the global_data of every
+shard in use. A daemon thread polls the size and mtime of the source files
+(rate_card_store.source_fingerprint); once a change has held for one poll,
+so that a file still being copied is not read, it rebuilds the global_data
+of every shard in use from the new files and publishes the new snapshot
+with a single reference assignment. Files are best updated by writing a
+copy and renaming it over the old one, so no poll sees half a file.
+
+Readers take `watcher.snapshot` (or call global_data) and get either the
+old version or the new one in full, never a mix of both, and never wait
+for a rebuild. A published snapshot is never modified: adding a shard
+publishes a copy. Spot prices, read on first use, come from the compiled
+file of the snapshot's version too (see lookups.build_global_data), so a
+session that turns on spot after an update never mixes versions. A rebuild
+that fails, e.g. on a malformed file, keeps the previous snapshot serving
+and is reported in `last_error` until the files change again. Nothing here
+depends on Streamlit.
+"""
+import itertools
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+from lookups import build_global_data, RATE_SHARD_CACHE_SIZE
+from rate_card_store import source_fingerprint, list_rate_shards, RATE_SOURCES, DEFAULT_SHARD
+
+POLL_SECONDS = 2.0
+
+
+class RateCardSnapshot(NamedTuple):
+    """One published version of the rate cards."""
+    fingerprint: tuple    # source_fingerprint() the version was built from
+    rate_shards: dict     # {(cloud, region, plan): display name}
+    global_data: dict     # {(cloud, region, plan): global_data}, read-only
+    loaded_at: float
+
+
+class RateCardWatcher:
+    """Keeps the rate card lookups of a process current with the source files."""
+
+    def __init__(self, sources=RATE_SOURCES, poll_seconds=POLL_SECONDS, max_shards=RATE_SHARD_CACHE_SIZE):
+        self.sources = sources
+        self.poll_seconds = poll_seconds
+        self.max_shards = max_shards
+        self.snapshot = None
+        self.last_error = None
+        self.reloads = 0
+        self._failed_fingerprint = None
+        # Last use of each loaded shard, for dropping the least recently used one
+        self._uses = itertools.count()
+        self._last_used = {}
+        # Serializes builds (reloads and first use of a shard); readers never take it
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Publishes the first snapshot on the calling thread, raising if the
+        rate cards cannot be loaded, and starts polling. Returns the watcher.
+        """
+        if self.snapshot is None:
+            with self._build_lock:
+                self.snapshot = self._build(source_fingerprint(self.sources), [DEFAULT_SHARD])
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="rate-card-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def global_data(self, shard=DEFAULT_SHARD):
+        """
+        global_data of one (cloud, region, plan) shard from the current
+        snapshot. A shard not loaded yet is built on the calling thread and
+        published in a copy of the snapshot, dropping the least recently used
+        shards beyond `max_shards`. Raises ValueError for a shard the rate
+        card lacks.
+        """
+        shard = tuple(shard)
+        self._last_used[shard] = next(self._uses)
+        data = self.snapshot.global_data.get(shard)
+        if data is not None:
+            return data
+        with self._build_lock:
+            snapshot = self.snapshot
+            if shard in snapshot.global_data:
+                return snapshot.global_data[shard]
+            data = build_global_data(version=(snapshot.fingerprint, shard), shard=shard, sources=self.sources)
+            shards = dict(snapshot.global_data)
+            shards[shard] = data
+            by_use = sorted(shards, key=lambda loaded: self._last_used.get(loaded, -1))
+            for stale in by_use[:max(0, len(shards) - self.max_shards)]:
+                del shards[stale]
+                self._last_used.pop(stale, None)
+            self.snapshot = snapshot._replace(global_data=MappingProxyType(shards))
+        return data
+
+    def reload(self, fingerprint=None):
+        """
+        Rebuilds every loaded shard from the current files and publishes the
+        new snapshot. Returns False, keeping the current snapshot, if that fails.
+        """
+        fingerprint = fingerprint or source_fingerprint(self.sources)
+        with self._build_lock:
+            try:
+                snapshot = self._build(fingerprint, list(self.snapshot.global_data), self.snapshot)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._failed_fingerprint = fingerprint
+                return False
+            self.snapshot = snapshot
+            self.last_error = None
+            self.reloads += 1
+        return True
+
+    def _build(self, fingerprint, shards, previous=None):
+        rate_shards = list_rate_shards(self.sources)
+        # Shards dropped from the card are rebuilt on their next use, which reports the error
+        shards = [shard for shard in shards if shard in rate_shards] or [DEFAULT_SHARD]
+        global_data = {
+            shard: build_global_data(version=(fingerprint, shard), shard=shard, sources=self.sources) for shard in shards
+        }
+        # Spot prices the old version had loaded are loaded now rather than on a session's rerun
+        for shard, data in global_data.items():
+            old = previous.global_data.get(shard) if previous is not None else None
+            if old is not None and old['SPOT_RATES'].loaded:
+                data['SPOT_RATES'].per_hour([])
+        return RateCardSnapshot(fingerprint, MappingProxyType(rate_shards), MappingProxyType(global_data), time.time())
+
+    def _poll(self):
+        pending = None
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                fingerprint = source_fingerprint(self.sources)
+            except OSError:
+                # A file is being replaced; look again on the next poll
+                continue
+            if fingerprint in (self.snapshot.fingerprint, self._failed_fingerprint):
+                pending = None
+            elif fingerprint != pending:
+                pending = fingerprint
+            else:
+                self.reload(fingerprint)
+                pending = None
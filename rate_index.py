@@ -0,0 +1,217 @@
+# rate_index.py
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+PHOTON_SUFFIX = " (Photon)"
+
+
+class Rate(NamedTuple):
+    """Rates for a single (compute type, instance) pair."""
+    dbu_per_hour: float
+    rate_per_hour: float
+    ec2_per_hour: float
+    vcpu: float
+    memory_gb: float
+
+
+class RateIndex:
+    """
+    Immutable rate lookup keyed by (compute type, instance).
+    Rates are held in read-only NumPy arrays; a dict and a MultiIndex map each
+    pair to its row position for scalar and vectorized lookups respectively.
+    """
+    __slots__ = ('compute_types', 'instances', 'dbu_per_hour', 'rate_per_hour', 'ec2_per_hour', 'vcpu', 'memory_gb', '_positions', '_keys')
+
+    def __init__(self, df):
+        df = df.drop_duplicates(['Compute type', 'Instance'])
+        columns = {
+            'compute_types': df['Compute type'].to_numpy(dtype=object),
+            'instances': df['Instance'].to_numpy(dtype=object),
+            'dbu_per_hour': df['DBU/hour'].to_numpy(dtype=float),
+            'rate_per_hour': df['Rate/hour'].to_numpy(dtype=float),
+            'ec2_per_hour': df['onDemandLinuxHr'].to_numpy(dtype=float),
+            'vcpu': df['vCPU'].to_numpy(dtype=float) if 'vCPU' in df else np.full(len(df), np.nan),
+            'memory_gb': df['Memory (GB)'].to_numpy(dtype=float) if 'Memory (GB)' in df else np.full(len(df), np.nan),
+        }
+        for name, values in columns.items():
+            values.flags.writeable = False
+            object.__setattr__(self, name, values)
+        object.__setattr__(self, '_positions', {key: pos for pos, key in enumerate(zip(columns['compute_types'], columns['instances']))})
+        object.__setattr__(self, '_keys', pd.MultiIndex.from_arrays([columns['compute_types'], columns['instances']]))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RateIndex is immutable")
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def get(self, compute_type, instance):
+        """Returns the Rate for one pair, or None if it is not on the card."""
+        pos = self._positions.get((compute_type, instance))
+        if pos is None:
+            return None
+        return Rate(self.dbu_per_hour[pos], self.rate_per_hour[pos], self.ec2_per_hour[pos], self.vcpu[pos], self.memory_gb[pos])
+
+    def positions(self, compute_types, instances):
+        """Returns the row position for each pair, -1 where the pair is unknown."""
+        return self._keys.get_indexer(pd.MultiIndex.from_arrays([np.asarray(compute_types, dtype=object), np.asarray(instances, dtype=object)]))
+
+    def take(self, column, positions):
+        """Gathers `column` at `positions`, with 0.0 for unknown (-1) positions."""
+        values = getattr(self, column)
+        return np.where(positions >= 0, values[positions], 0.0)
+
+
+class InstancePriceIndex:
+    """
+    Immutable $/hour keyed by EC2 instance name alone, for prices that do not
+    depend on the compute type (such as spot prices). Photon variants share
+    the price of their base instance.
+    """
+    __slots__ = ('_instances', 'per_hour_values')
+
+    def __init__(self, instances, per_hour):
+        prices = pd.Series(np.asarray(per_hour, dtype=float), index=pd.Index(instances, dtype=object).str.removesuffix(PHOTON_SUFFIX))
+        prices = prices[prices.notna()]
+        prices = prices[~prices.index.duplicated()]
+        values = prices.to_numpy()
+        values.flags.writeable = False
+        object.__setattr__(self, '_instances', prices.index)
+        object.__setattr__(self, 'per_hour_values', values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("InstancePriceIndex is immutable")
+
+    def __len__(self):
+        return len(self._instances)
+
+    def per_hour(self, instances):
+        """Returns the price of each instance (label suffix " (Photon)" ignored), NaN where unknown."""
+        # Resolve each distinct name once; job lists repeat a few instances many times
+        codes, uniques = pd.factorize(np.asarray(instances, dtype=object))
+        positions = self._instances.get_indexer(pd.Index(uniques, dtype=object).str.removesuffix(PHOTON_SUFFIX))
+        prices = np.where(positions >= 0, self.per_hour_values[positions], np.nan)
+        return np.where(codes >= 0, prices[codes], np.nan)
+
+
+class SqlSizeCatalog:
+    """
+    Immutable catalog of SQL warehouse sizes. Each row is one (warehouse type,
+    size) with its DBU/hour, Rate/hour, EC2 $/hour, maximum workers and
+    worker instance in read-only arrays. Warehouses refer to a size by its
+    name (e.g. "Small"), which is resolved to a row together with the type;
+    the legacy dropdown labels ("Small - 12 DBUs - $6.6/hr") are accepted too.
+    """
+    __slots__ = ('compute_types', 'sizes', 'labels', 'dbu_per_hour', 'rate_per_hour', 'ec2_per_hour',
+                 'max_workers', 'worker_instances', '_positions')
+
+    def __init__(self, df, max_workers_by_size):
+        df = df.drop_duplicates(['Compute type', 'Instance'])
+        sizes = df['Instance'].to_numpy(dtype=object)
+        columns = {
+            'compute_types': df['Compute type'].to_numpy(dtype=object),
+            'sizes': sizes,
+            'labels': (df['Instance'] + ' - ' + df['DBU/hour'].astype(str) + ' DBUs - $' + df['Rate/hour'].astype(str) + '/hr').to_numpy(dtype=object),
+            'dbu_per_hour': df['DBU/hour'].to_numpy(dtype=float),
+            'rate_per_hour': df['Rate/hour'].to_numpy(dtype=float),
+            'ec2_per_hour': df['onDemandLinuxHr'].to_numpy(dtype=float),
+            'max_workers': np.array([max_workers_by_size.get(size, 1) for size in sizes], dtype=int),
+            'worker_instances': df['worker instance type'].to_numpy(dtype=object) if 'worker instance type' in df else np.full(len(df), None, dtype=object),
+        }
+        for name, values in columns.items():
+            values.flags.writeable = False
+            object.__setattr__(self, name, values)
+        positions = {key: pos for pos, key in enumerate(zip(columns['compute_types'], columns['labels']))}
+        positions.update({key: pos for pos, key in enumerate(zip(columns['compute_types'], sizes))})
+        object.__setattr__(self, '_positions', positions)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SqlSizeCatalog is immutable")
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def sizes_for(self, compute_type):
+        """Size names offered for one warehouse type, in rate card order."""
+        return [size for ct, size in zip(self.compute_types, self.sizes) if ct == compute_type]
+
+    def positions(self, compute_types, sizes):
+        """Returns the catalog row of each (type, size name or label) pair, -1 where unknown."""
+        # Resolve each distinct type and size once, then gather from the small (type x size) grid
+        type_codes, unique_types = pd.factorize(np.asarray(compute_types, dtype=object))
+        size_codes, unique_sizes = pd.factorize(np.asarray(sizes, dtype=object))
+        grid = np.array([[self._positions.get((ct, size), -1) for size in unique_sizes] + [-1] for ct in unique_types] + [[-1] * (len(unique_sizes) + 1)], dtype=int)
+        return grid[type_codes, size_codes]
+
+    def position(self, compute_type, size):
+        return self._positions.get((compute_type, size), -1)
+
+    def size_name(self, compute_type, size):
+        """The size name of a size name or label, or None when it is not offered for the type."""
+        pos = self.position(compute_type, size)
+        return self.sizes[pos] if pos >= 0 else None
+
+    def label(self, compute_type, size):
+        pos = self.position(compute_type, size)
+        return self.labels[pos] if pos >= 0 else str(size)
+
+
+class CheapestInstanceIndex:
+    """
+    Finds the cheapest instance (Rate/hour + EC2/hour) of a compute type with
+    at least a given vCPU count and memory, for many queries at once.
+    For each compute type a table over the sorted distinct vCPU and memory
+    values holds the cheapest row at or above each (vCPU, memory) pair
+    (a 2-D suffix minimum over cost ranks), so a query is two binary
+    searches and one gather instead of a scan of the rate card.
+    """
+    __slots__ = ('compute_types', 'vcpu_steps', 'memory_steps', '_table', '_rows')
+
+    def __init__(self, rate_index):
+        hourly_cost = rate_index.rate_per_hour + rate_index.ec2_per_hour
+        valid = ~(np.isnan(rate_index.vcpu) | np.isnan(rate_index.memory_gb) | np.isnan(hourly_cost))
+        rows = np.flatnonzero(valid)
+        # Cheapest first; ties keep rate card order
+        rows = rows[np.argsort(hourly_cost[rows], kind='stable')]
+
+        compute_types, ct_codes = np.unique(rate_index.compute_types[rows].astype(str), return_inverse=True)
+        vcpu_steps, vcpu_codes = np.unique(rate_index.vcpu[rows], return_inverse=True)
+        memory_steps, memory_codes = np.unique(rate_index.memory_gb[rows], return_inverse=True)
+
+        # Rank of the cheapest row at each exact (type, vCPU, memory); len(rows) means none
+        table = np.full((len(compute_types), len(vcpu_steps), len(memory_steps)), len(rows))
+        np.minimum.at(table, (ct_codes, vcpu_codes, memory_codes), np.arange(len(rows)))
+        # Suffix minimum: cheapest row with at least this vCPU and memory
+        table = np.minimum.accumulate(table[:, ::-1, :], axis=1)[:, ::-1, :]
+        table = np.minimum.accumulate(table[:, :, ::-1], axis=2)[:, :, ::-1]
+
+        for name, value in (('compute_types', pd.Index(compute_types)), ('vcpu_steps', vcpu_steps),
+                            ('memory_steps', memory_steps), ('_table', table), ('_rows', np.append(rows, -1))):
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CheapestInstanceIndex is immutable")
+
+    def cheapest(self, compute_types, min_vcpu, min_memory_gb):
+        """
+        Returns the RateIndex position of the cheapest qualifying instance for
+        each query, or -1 where the compute type is unknown, a requirement is
+        NaN, or no instance is large enough.
+        """
+        ct_codes = self.compute_types.get_indexer(np.asarray(compute_types, dtype=object))
+        min_vcpu = np.asarray(min_vcpu, dtype=float)
+        min_memory_gb = np.asarray(min_memory_gb, dtype=float)
+        vcpu_codes = np.searchsorted(self.vcpu_steps, min_vcpu, side='left')
+        memory_codes = np.searchsorted(self.memory_steps, min_memory_gb, side='left')
+
+        found = (ct_codes >= 0) & ~np.isnan(min_vcpu) & ~np.isnan(min_memory_gb) \
+            & (vcpu_codes < len(self.vcpu_steps)) & (memory_codes < len(self.memory_steps))
+        ranks = np.full(len(ct_codes), len(self._rows) - 1)
+        ranks[found] = self._table[ct_codes[found], vcpu_codes[found], memory_codes[found]]
+        return self._rows[ranks]
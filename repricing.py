@@ -0,0 +1,332 @@
+# repricing.py
+"""
+Bulk repricing of saved scenarios after a rate card update.
+
+diff_rate_cards compares two versions of the rate card files and returns
+the keys whose prices changed: (shard, compute type, instance) rows of
+final_out.csv, instances whose spot price changed, (warehouse type, size)
+rows of the SQL warehouse sheet and S3 storage classes. Rows added to or
+removed from a file count as changed.
+
+reprice_store selects, through the scenario store's indexes, only the
+jobs, development clusters, SQL warehouses and direct-storage S3 zones that
+use a changed key, prices them with both rate cards in a process pool (one
+chunk of scenarios per task) and reports the monthly cost of those rows
+before and after for each affected scenario. Every other row prices the
+same under both cards, so a scenario's delta is its total monthly change.
+Warehouses are priced on their saved hours (query history billing is not
+replayed).
+"""
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+import scenario_store
+from cost_engine import price_databricks_tier, price_dev_costs, sql_warehouse_costs, s3_direct_arrays, s3_direct_zones, project_s3_volumes, tiered_s3_cost
+from lookups import build_global_data, RATE_SHARD_CACHE_SIZE
+from rate_card_store import load_rate_sources, shard_keys, RATE_SOURCES, SHARD_COLUMNS, DEFAULT_SHARD
+from rate_index import PHOTON_SUFFIX
+
+RATE_VALUE_COLUMNS = ['DBU/hour', 'Rate/hour', 'onDemandLinuxHr']
+SPOT_VALUE_COLUMN = 'spotLinuxHr'
+SQL_VALUE_COLUMNS = ['DBU/hour', 'Rate/hour', 'onDemandLinuxHr', 'worker instance type']
+S3_VALUE_COLUMNS = ['Rate/GB_50TB', 'Rate/GB_500TB', 'Rate/GB_over500TB']
+# Development clusters are priced on the All-Purpose Compute rates whatever their compute type
+DEV_COMPUTE_TYPE = 'All-Purpose Compute'
+DIRECT_STORAGE = "Direct Storage[Recommended]"
+SECTIONS = ("jobs", "sql", "dev", "s3")
+SECTION_TABLES = {"jobs": "jobs", "sql": "sql_warehouses", "dev": "dev_clusters", "s3": "s3_zones"}
+COUNT_COLUMNS = {"jobs": "repriced_jobs", "sql": "repriced_warehouses", "dev": "repriced_clusters", "s3": "repriced_zones"}
+REPORT_COLUMNS = [
+    "project", "name", "region", "repriced_jobs", "repriced_warehouses", "repriced_clusters", "repriced_zones",
+    "jobs_before", "jobs_after", "sql_before", "sql_after", "dev_before", "dev_after", "s3_before", "s3_after",
+    "repriced_before", "repriced_after", "delta",
+]
+
+
+class RateCardDiff(NamedTuple):
+    """Keys whose prices differ between two rate cards; instances are bare names (Photon suffix dropped)."""
+    instances: tuple       # (cloud, region, plan, compute type, instance)
+    spot_instances: tuple  # (cloud, region, plan, instance)
+    sql_sizes: tuple       # (warehouse type, size)
+    sql_spot_sizes: tuple  # (cloud, region, plan, warehouse type, size) whose worker instance's spot price changed
+    s3_classes: tuple      # storage class
+
+    @property
+    def changed(self):
+        return any(self)
+
+
+def sources_in(directory):
+    """The rate card files of RATE_SOURCES under another directory, e.g. a copy of the previous card."""
+    return {name: os.path.join(directory, os.path.basename(path)) for name, path in RATE_SOURCES.items()}
+
+
+def _changed_keys(old, new, keys, values):
+    """Index of the `keys` whose `values` differ between two frames (first row of each key), or that only one has."""
+    old = old.drop_duplicates(keys).set_index(keys)[values]
+    new = new.drop_duplicates(keys).set_index(keys)[values]
+    old, new = old.align(new, join='outer')
+    same = ((old == new) | (old.isna() & new.isna())).all(axis=1)
+    return old.index[~same.to_numpy()]
+
+
+def _card_frames(sources):
+    frames = load_rate_sources(
+        usecols={'rates': SHARD_COLUMNS + ['Compute type', 'Instance'] + RATE_VALUE_COLUMNS + [SPOT_VALUE_COLUMN]}, sources=sources
+    )
+    rates = frames['rates']
+    rates = pd.concat([shard_keys(rates), rates.drop(columns=[c for c in SHARD_COLUMNS if c in rates])], axis=1)
+    rates['instance'] = rates['Instance'].astype(str).str.removesuffix(PHOTON_SUFFIX)
+    return rates, frames['sql'], frames['s3']
+
+
+def diff_rate_cards(old_sources, new_sources=RATE_SOURCES):
+    """Compares two sets of rate card files (see RATE_SOURCES) and returns a RateCardDiff."""
+    old_rates, old_sql, old_s3 = _card_frames(old_sources)
+    new_rates, new_sql, new_s3 = _card_frames(new_sources)
+
+    # Same first-row-wins order as RateIndex; the bare name is taken after the diff
+    changed = _changed_keys(old_rates, new_rates, SHARD_COLUMNS + ['Compute type', 'Instance'], RATE_VALUE_COLUMNS)
+    instances = {(*shard, compute_type, instance.removesuffix(PHOTON_SUFFIX)) for *shard, compute_type, instance in changed}
+
+    # Spot prices are per bare instance, first non-blank row wins (see InstancePriceIndex)
+    spot_keys = SHARD_COLUMNS + ['instance']
+    spot_instances = set(_changed_keys(
+        old_rates[old_rates[SPOT_VALUE_COLUMN].notna()], new_rates[new_rates[SPOT_VALUE_COLUMN].notna()], spot_keys, [SPOT_VALUE_COLUMN]
+    ))
+
+    sql_sizes = set(_changed_keys(old_sql, new_sql, ['Compute type', 'Instance'], SQL_VALUE_COLUMNS))
+    workers = pd.concat([old_sql, new_sql])[['Compute type', 'Instance', 'worker instance type']].drop_duplicates()
+    spot = pd.DataFrame(list(spot_instances), columns=spot_keys)
+    sql_spot_sizes = spot.merge(workers, left_on='instance', right_on='worker instance type')[SHARD_COLUMNS + ['Compute type', 'Instance']]
+
+    s3_classes = _changed_keys(old_s3, new_s3, ['S3_storage'], S3_VALUE_COLUMNS)
+    return RateCardDiff(
+        tuple(sorted(instances)), tuple(sorted(spot_instances)), tuple(sorted(sql_sizes)),
+        tuple(sorted(set(sql_spot_sizes.itertuples(index=False, name=None)))), tuple(sorted(s3_classes)),
+    )
+
+
+def _stage(conn, diff, scenario_ids=None):
+    """Loads the diff and the scenarios to reprice (all when `scenario_ids` is None) into temp tables."""
+    conn.executescript("""
+        CREATE TEMP TABLE IF NOT EXISTS changed_instances (cloud, region, plan, compute_type, instance);
+        CREATE TEMP TABLE IF NOT EXISTS changed_spot (cloud, region, plan, instance);
+        CREATE TEMP TABLE IF NOT EXISTS changed_sql (type, size, cloud, region, plan, spot_only);
+        CREATE TEMP TABLE IF NOT EXISTS changed_s3 (storage_class);
+        CREATE TEMP TABLE IF NOT EXISTS batch (scenario_id INTEGER PRIMARY KEY, cloud, region, plan, direct, enable_s3_stage);
+        DELETE FROM changed_instances; DELETE FROM changed_spot; DELETE FROM changed_sql; DELETE FROM changed_s3; DELETE FROM batch;
+    """)
+    conn.executemany("INSERT INTO changed_instances VALUES (?, ?, ?, ?, ?)", diff.instances)
+    conn.executemany("INSERT INTO changed_spot VALUES (?, ?, ?, ?)", diff.spot_instances)
+    conn.executemany("INSERT INTO changed_sql VALUES (?, ?, NULL, NULL, NULL, 0)", diff.sql_sizes)
+    conn.executemany("INSERT INTO changed_sql VALUES (?, ?, ?, ?, ?, 1)", ((t, s, c, r, p) for c, r, p, t, s in diff.sql_spot_sizes))
+    conn.executemany("INSERT INTO changed_s3 VALUES (?)", ((storage_class,) for storage_class in diff.s3_classes))
+
+    select = """
+        INSERT INTO batch SELECT id, COALESCE(cloud, ?), COALESCE(region, ?), COALESCE(plan, ?),
+                                 COALESCE(s3_calc_method, ?) = ?, COALESCE(enable_s3_stage, 1)
+        FROM scenarios
+    """
+    params = (*DEFAULT_SHARD, DIRECT_STORAGE, DIRECT_STORAGE)
+    if scenario_ids is None:
+        conn.execute(select, params)
+    else:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM batch_ids")
+        conn.executemany("INSERT INTO batch_ids VALUES (?)", ((int(i),) for i in scenario_ids))
+        conn.execute(select + " WHERE id IN (SELECT id FROM batch_ids)", params)
+
+
+# Every lookup starts from the (small) changed keys and reaches the stored rows
+# through an index; CROSS JOIN keeps SQLite from reordering the loops.
+_SHARD_MATCH = "b.cloud = c.cloud AND b.region = c.region AND b.plan = c.plan"
+
+
+def _instance_rowids(table, instance_columns, compute_type):
+    """Rowids of `table` rows on a changed (compute type, instance), or on a changed spot price with some spot share."""
+    selects = []
+    for column in instance_columns:
+        selects.append(
+            f"SELECT t.rowid FROM changed_instances c CROSS JOIN {table} t ON t.{column} = c.instance AND {compute_type} = c.compute_type "
+            f"JOIN batch b ON b.scenario_id = t.scenario_id AND {_SHARD_MATCH}"
+        )
+        selects.append(
+            f"SELECT t.rowid FROM changed_spot c CROSS JOIN {table} t ON t.{column} = c.instance "
+            f"JOIN batch b ON b.scenario_id = t.scenario_id AND {_SHARD_MATCH} WHERE t.spot_percent > 0"
+        )
+    return " UNION ".join(selects)
+
+
+_SQL_MATCH = "WHERE (c.cloud IS NULL OR (" + _SHARD_MATCH + ")) AND (NOT c.spot_only OR t.spot_percent > 0)"
+_AFFECTED_ROWIDS = {
+    "jobs": _instance_rowids("jobs", ["instance"], "t.compute_type"),
+    "dev_clusters": _instance_rowids("dev_clusters", ["driver_instance", "worker_instance"], f"'{DEV_COMPUTE_TYPE}'"),
+    # Sizes are stored as size names or legacy labels ("Small - 12 DBUs - $6.6/hr"); a label
+    # is matched by its "<size> - " prefix, as an index range ('!' sorts right after ' ')
+    "sql_warehouses": f"""
+        SELECT t.rowid FROM changed_sql c CROSS JOIN sql_warehouses t ON t.type = c.type AND t.size = c.size
+        JOIN batch b ON b.scenario_id = t.scenario_id {_SQL_MATCH}
+        UNION
+        SELECT t.rowid FROM changed_sql c CROSS JOIN sql_warehouses t ON t.type = c.type AND t.size >= c.size || ' - ' AND t.size < c.size || ' -!'
+        JOIN batch b ON b.scenario_id = t.scenario_id {_SQL_MATCH}
+    """,
+    "s3_zones": """
+        SELECT t.rowid FROM changed_s3 c CROSS JOIN s3_zones t ON t.storage_class = c.storage_class
+        JOIN batch b ON b.scenario_id = t.scenario_id WHERE b.direct
+    """,
+}
+_AFFECTED_COLUMNS = {
+    "jobs": list(scenario_store.JOB_FIELDS),
+    "dev_clusters": list(scenario_store.DEV_FIELDS),
+    "sql_warehouses": list(scenario_store.WAREHOUSE_FIELDS),
+    "s3_zones": ["zone", "storage_class", "amount", "unit", "monthly_growth_percent"],
+}
+
+
+def affected_scenarios(conn, diff):
+    """Ids of the stored scenarios with at least one row on a changed key."""
+    _stage(conn, diff)
+    union = " UNION ".join(f"SELECT scenario_id FROM {table} WHERE rowid IN ({rowids})" for table, rowids in _AFFECTED_ROWIDS.items())
+    return [row[0] for row in conn.execute(f"SELECT scenario_id FROM ({union}) ORDER BY scenario_id")]
+
+
+def affected_rows(conn, diff, scenario_ids):
+    """({table: affected rows with scenario_id}, scenarios (scenario_id, shard, direct, enable_s3_stage)) for some scenarios."""
+    _stage(conn, diff, scenario_ids)
+    rows = {
+        table: pd.read_sql_query(
+            f"SELECT scenario_id, {', '.join(_AFFECTED_COLUMNS[table])} FROM {table} WHERE rowid IN ({rowids}) ORDER BY scenario_id",
+            conn,
+        )
+        for table, rowids in _AFFECTED_ROWIDS.items()
+    }
+    scenarios = pd.read_sql_query("SELECT * FROM batch", conn)
+    return rows, scenarios
+
+
+def _rate_names(labels):
+    """Rate card name of each dropdown label or name ("m4.large | 0.4 DBUs | 0.26/hr" -> "m4.large")."""
+    return pd.Series(labels, dtype=object).str.split(' | ', n=1, regex=False).str[0].str.strip()
+
+
+@functools.lru_cache(maxsize=2 * RATE_SHARD_CACHE_SIZE)
+def card_global_data(sources, shard):
+    """Lookups of one shard of the rate card files `sources` ((name, path) pairs), kept per worker process; None if the card lacks the shard."""
+    try:
+        return build_global_data(shard=shard, sources=dict(sources))
+    except ValueError:
+        return None
+
+
+def _numeric(values, default):
+    return pd.to_numeric(values, errors='coerce').fillna(default).to_numpy(dtype=float)
+
+
+def price_rows(rows, global_data):
+    """Monthly cost of each affected row, {table: array}, with one card; NaN for every row when `global_data` is None."""
+    if global_data is None:
+        return {table: np.full(len(df), np.nan) for table, df in rows.items()}
+    costs = {}
+
+    jobs = rows["jobs"].rename(columns=scenario_store.JOB_FIELDS)
+    jobs = jobs.assign(**{
+        "Instance Type": _rate_names(jobs["Instance Type"]).to_numpy(), "Nodes": _numeric(jobs["Nodes"], 1),
+        "Runtime (hrs)": _numeric(jobs["Runtime (hrs)"], 0), "Runs/Month": _numeric(jobs["Runs/Month"], 0),
+    })
+    priced, _, _, _ = price_databricks_tier(jobs, global_data)
+    costs["jobs"] = (priced["DBX"] + priced["EC2"]).to_numpy(dtype=float) if len(jobs) else np.zeros(0)
+
+    dev = rows["dev_clusters"].rename(columns=scenario_store.DEV_FIELDS)
+    dev = dev.assign(**{"Driver type": _rate_names(dev["Driver type"]).to_numpy(), "Worker Type": _rate_names(dev["Worker Type"]).to_numpy()})
+    costs["dev_clusters"] = price_dev_costs(dev, global_data)[2]["Total"].to_numpy(dtype=float) if len(dev) else np.zeros(0)
+
+    warehouses = rows["sql_warehouses"].rename(columns=scenario_store.WAREHOUSE_FIELDS)
+    warehouses["size"] = warehouses["size"].astype(object).str.split(' - ', n=1, regex=False).str[0]
+    dbu_cost, ec2_cost, _ = sql_warehouse_costs(warehouses.to_dict(orient='records'), global_data)
+    costs["sql_warehouses"] = dbu_cost + ec2_cost
+
+    zones = rows["s3_zones"]
+    configs = {
+        i: {"class": storage_class, "amount": amount or 0, "unit": unit, "monthly_growth_percent": growth or 0.0}
+        for i, (storage_class, amount, unit, growth) in enumerate(zones[["storage_class", "amount", "unit", "monthly_growth_percent"]].itertuples(index=False))
+    }
+    storage_gb, growth_percent, tier_rates = s3_direct_arrays(configs, list(configs), global_data['S3_PRICING'])
+    costs["s3_zones"] = tiered_s3_cost(project_s3_volumes(storage_gb, growth_percent, 1), tier_rates)[:, 0]
+    return costs
+
+
+def reprice_scenarios(store_path, diff, old_sources, new_sources, scenario_ids):
+    """
+    Report rows (by scenario_id, without project and name) for some
+    scenarios: the number of affected rows of each section and their monthly
+    cost under both cards. Opens its own connection, so chunks of scenarios
+    can be repriced in separate processes.
+    """
+    with scenario_store.open_store(store_path) as conn:
+        rows, scenarios = affected_rows(conn, diff, scenario_ids)
+
+    # Zones the app does not price (Stage with the stage zone off) cost nothing on either card
+    stage = rows["s3_zones"]["scenario_id"].map(scenarios.set_index("scenario_id")["enable_s3_stage"])
+    priced = [zone in s3_direct_zones(bool(enable_stage)) for zone, enable_stage in zip(rows["s3_zones"]["zone"], stage)]
+    rows["s3_zones"] = rows["s3_zones"][np.asarray(priced, dtype=bool)].reset_index(drop=True)
+
+    report = scenarios.set_index("scenario_id")[["cloud", "region", "plan"]].copy()
+    for section in SECTIONS:
+        report[COUNT_COLUMNS[section]] = 0
+        report[f"{section}_before"] = report[f"{section}_after"] = 0.0
+
+    shards = report[["cloud", "region", "plan"]].apply(tuple, axis=1)
+    for shard, ids in shards.groupby(shards, sort=False).groups.items():
+        shard_rows = {table: df[df["scenario_id"].isin(ids)].reset_index(drop=True) for table, df in rows.items()}
+        before = price_rows(shard_rows, card_global_data(tuple(old_sources.items()), shard))
+        after = price_rows(shard_rows, card_global_data(tuple(new_sources.items()), shard))
+        for section in SECTIONS:
+            table = SECTION_TABLES[section]
+            scenario_id = shard_rows[table]["scenario_id"].to_numpy()
+            if not len(scenario_id):
+                continue
+            counts = pd.Series(scenario_id).value_counts()
+            report.loc[counts.index, COUNT_COLUMNS[section]] = counts.to_numpy()
+            for when, costs in (("before", before), ("after", after)):
+                totals = pd.Series(costs[table]).groupby(scenario_id).sum(min_count=1)
+                report.loc[totals.index, f"{section}_{when}"] = totals.to_numpy()
+    return report.reset_index()
+
+
+def reprice_store(store_path, old_sources, new_sources=RATE_SOURCES, workers=None):
+    """
+    Reprices every stored scenario affected by the change from the
+    `old_sources` to the `new_sources` rate card and returns the delta
+    report (REPORT_COLUMNS), largest change first. Chunks of affected
+    scenarios are priced in a process pool; `workers=1` prices inline.
+    The <section>_before/_after and repriced_before/_after columns hold the
+    monthly cost of the repriced rows only, not the scenario's total; the
+    delta is the change of the scenario's total.
+    """
+    diff = diff_rate_cards(old_sources, new_sources)
+    if not diff.changed:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    with scenario_store.open_store(store_path) as conn:
+        scenario_ids = affected_scenarios(conn, diff)
+        names = pd.read_sql_query("SELECT id AS scenario_id, project, name FROM scenarios", conn)
+    if not scenario_ids:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    task = functools.partial(reprice_scenarios, store_path, diff, old_sources, new_sources)
+    if workers == 1:
+        parts = [task(scenario_ids)]
+    else:
+        n_chunks = min(len(scenario_ids), 4 * (workers or os.cpu_count() or 1))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(task, np.array_split(np.asarray(scenario_ids), n_chunks)))
+
+    report = pd.concat(parts, ignore_index=True).merge(names, on="scenario_id")
+    report["repriced_before"] = report[[f"{section}_before" for section in SECTIONS]].sum(axis=1, min_count=1)
+    report["repriced_after"] = report[[f"{section}_after" for section in SECTIONS]].sum(axis=1, min_count=1)
+    report["delta"] = report["repriced_after"] - report["repriced_before"]
+    report = report.iloc[np.argsort(-report["delta"].abs().fillna(np.inf).to_numpy(), kind='stable')]
+    return report[REPORT_COLUMNS].reset_index(drop=True)
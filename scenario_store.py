@@ -0,0 +1,299 @@
+# scenario_store.py
+"""
+Local SQLite store for saved estimates.
+
+An estimate is stored across normalized tables: one `scenarios` row per
+(project, name) with its settings, and one row per job, S3 zone, S3 table,
+SQL warehouse and development cluster. Jobs and clusters also keep the bare
+instance name of their dropdown label (Photon suffix dropped), indexed, so
+questions such as "which scenarios use i3.8xlarge" are answered by SQL
+without loading any scenario.
+
+Estimates use the same sections as the app's session state and the batch
+CLI's scenario files; job, table and cluster lists are DataFrames.
+"""
+import contextlib
+import sqlite3
+import time
+import pandas as pd
+from rate_index import PHOTON_SUFFIX
+from cost_engine import SPOT_COLUMN
+
+DEFAULT_STORE = 'scenarios.db'
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    name TEXT NOT NULL,
+    cloud TEXT, region TEXT, plan TEXT,
+    s3_calc_method TEXT,
+    enable_s3_stage INTEGER,
+    saved_at REAL NOT NULL,
+    UNIQUE (project, name)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    tier TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    job_name TEXT,
+    runtime_hours REAL,
+    runs_per_month REAL,
+    compute_type TEXT,
+    instance_type TEXT,
+    instance TEXT,
+    nodes REAL,
+    spot_percent REAL
+);
+CREATE TABLE IF NOT EXISTS s3_zones (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    zone TEXT NOT NULL,
+    storage_class TEXT,
+    amount NUMERIC,
+    unit TEXT,
+    monthly_growth_percent REAL
+);
+CREATE TABLE IF NOT EXISTS s3_tables (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    zone TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    table_name TEXT,
+    records REAL,
+    columns REAL,
+    tables REAL,
+    avg_column_length REAL
+);
+CREATE TABLE IF NOT EXISTS sql_warehouses (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    warehouse_id TEXT,
+    name TEXT,
+    type TEXT,
+    size TEXT,
+    nodes INTEGER,
+    hours_per_day REAL,
+    days_per_month INTEGER,
+    spot_percent REAL,
+    auto_suspend INTEGER,
+    suspend_after INTEGER
+);
+CREATE TABLE IF NOT EXISTS dev_clusters (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    compute_type TEXT,
+    driver_type TEXT,
+    worker_type TEXT,
+    driver_instance TEXT,
+    worker_instance TEXT,
+    nodes REAL,
+    hr_per_month REAL,
+    no_of_month REAL,
+    spot_percent REAL
+);
+CREATE INDEX IF NOT EXISTS scenarios_project ON scenarios (project);
+CREATE INDEX IF NOT EXISTS jobs_scenario_tier ON jobs (scenario_id, tier, position);
+CREATE INDEX IF NOT EXISTS jobs_instance ON jobs (instance);
+CREATE INDEX IF NOT EXISTS s3_zones_scenario ON s3_zones (scenario_id);
+CREATE INDEX IF NOT EXISTS s3_zones_class ON s3_zones (storage_class);
+CREATE INDEX IF NOT EXISTS s3_tables_scenario ON s3_tables (scenario_id, zone, position);
+CREATE INDEX IF NOT EXISTS sql_warehouses_scenario ON sql_warehouses (scenario_id, position);
+CREATE INDEX IF NOT EXISTS sql_warehouses_size ON sql_warehouses (type, size);
+CREATE INDEX IF NOT EXISTS dev_clusters_scenario ON dev_clusters (scenario_id, position);
+CREATE INDEX IF NOT EXISTS dev_clusters_driver ON dev_clusters (driver_instance);
+CREATE INDEX IF NOT EXISTS dev_clusters_worker ON dev_clusters (worker_instance);
+"""
+
+# Stored column -> estimate column, per table
+JOB_FIELDS = {
+    "job_name": "Job Name", "runtime_hours": "Runtime (hrs)", "runs_per_month": "Runs/Month",
+    "compute_type": "Compute type", "instance_type": "Instance Type", "nodes": "Nodes", "spot_percent": SPOT_COLUMN,
+}
+S3_TABLE_FIELDS = {
+    "table_name": "Table Name", "records": "Records", "columns": "Columns", "tables": "Table", "avg_column_length": "Avg_Column_length",
+}
+DEV_FIELDS = {
+    "compute_type": "Compute_type", "driver_type": "Driver type", "worker_type": "Worker Type", "nodes": "Nodes",
+    "hr_per_month": "hr_per_month", "no_of_month": "no_of_Month", "spot_percent": SPOT_COLUMN,
+}
+WAREHOUSE_FIELDS = {
+    "warehouse_id": "id", "name": "name", "type": "type", "size": "size", "nodes": "SQL_nodes", "hours_per_day": "hours_per_day",
+    "days_per_month": "days_per_month", "spot_percent": "spot_percent", "auto_suspend": "auto_suspend", "suspend_after": "suspend_after",
+}
+
+
+def connect(path=DEFAULT_STORE, check_same_thread=True):
+    """Opens (creating if needed) a scenario store."""
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+@contextlib.contextmanager
+def open_store(path=DEFAULT_STORE):
+    """connect() as a context manager that closes the connection on exit."""
+    conn = connect(path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def bare_instances(labels):
+    """Bare instance name of each dropdown label or name ("c6id.xlarge (Photon) | 4 CPUs | 8GB" -> "c6id.xlarge")."""
+    names = pd.Series(labels, dtype=object).str.split(' | ', n=1, regex=False).str[0].str.strip()
+    return names.str.removesuffix(PHOTON_SUFFIX)
+
+
+def _records(df, fields):
+    """Rows of the estimate columns of `fields`, in stored column order, with NaN as NULL."""
+    df = pd.DataFrame(df).reindex(columns=list(fields.values())).astype(object)
+    return df.where(df.notna(), None)
+
+
+def save_scenario(conn, project, name, estimate):
+    """
+    Saves an estimate under (project, name), replacing any earlier save of
+    it, in one transaction. Returns the scenario id.
+    """
+    with conn:
+        conn.execute("DELETE FROM scenarios WHERE project = ? AND name = ?", (project, name))
+        scenario_id = conn.execute(
+            "INSERT INTO scenarios (project, name, cloud, region, plan, s3_calc_method, enable_s3_stage, saved_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (project, name, estimate.get("cloud"), estimate.get("region"), estimate.get("plan"),
+             estimate.get("s3_calc_method"), int(bool(estimate.get("enable_s3_stage", True))), time.time()),
+        ).lastrowid
+
+        for tier, jobs_df in (estimate.get("dbx_jobs") or {}).items():
+            jobs = _records(jobs_df, JOB_FIELDS)
+            jobs.insert(0, "position", range(len(jobs)))
+            jobs.insert(6, "instance", bare_instances(jobs["Instance Type"]).where(jobs["Instance Type"].notna().to_numpy(), None).to_numpy())
+            conn.executemany(
+                "INSERT INTO jobs (scenario_id, tier, position, job_name, runtime_hours, runs_per_month, compute_type, instance_type, instance, nodes, spot_percent) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((scenario_id, tier, *row) for row in jobs.itertuples(index=False, name=None)),
+            )
+
+        conn.executemany(
+            "INSERT INTO s3_zones (scenario_id, zone, storage_class, amount, unit, monthly_growth_percent) VALUES (?, ?, ?, ?, ?, ?)",
+            ((scenario_id, zone, config.get("class"), config.get("amount"), config.get("unit"), config.get("monthly_growth_percent"))
+             for zone, config in (estimate.get("s3_direct") or {}).items()),
+        )
+        for zone, tables_df in (estimate.get("s3_table_based") or {}).items():
+            tables = _records(tables_df, S3_TABLE_FIELDS)
+            conn.executemany(
+                "INSERT INTO s3_tables (scenario_id, zone, position, table_name, records, columns, tables, avg_column_length) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((scenario_id, zone, position, *row) for position, row in enumerate(tables.itertuples(index=False, name=None))),
+            )
+
+        conn.executemany(
+            "INSERT INTO sql_warehouses (scenario_id, position, warehouse_id, name, type, size, nodes, hours_per_day, days_per_month, spot_percent, auto_suspend, suspend_after) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((scenario_id, position, *(warehouse.get(key) for key in WAREHOUSE_FIELDS.values()))
+             for position, warehouse in enumerate(estimate.get("sql_warehouses") or [])),
+        )
+
+        dev = estimate.get("dev_costs")
+        if dev is not None and len(dev):
+            clusters = _records(dev, DEV_FIELDS)
+            instances = zip(bare_instances(clusters["Driver type"]), bare_instances(clusters["Worker Type"]))
+            conn.executemany(
+                "INSERT INTO dev_clusters (scenario_id, position, compute_type, driver_type, worker_type, driver_instance, worker_instance, nodes, hr_per_month, no_of_month, spot_percent) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((scenario_id, position, ct, driver, worker, driver_instance, worker_instance, *rest)
+                 for position, ((ct, driver, worker, *rest), (driver_instance, worker_instance))
+                 in enumerate(zip(clusters.itertuples(index=False, name=None), instances))),
+            )
+    return scenario_id
+
+
+def _scenario_id(conn, project, name):
+    row = conn.execute("SELECT id FROM scenarios WHERE project = ? AND name = ?", (project, name)).fetchone()
+    if row is None:
+        raise KeyError(f"No saved scenario '{name}' in project '{project}'.")
+    return row[0]
+
+
+def load_scenario(conn, project, name):
+    """Loads a saved estimate; raises KeyError if there is none under (project, name)."""
+    scenario_id = _scenario_id(conn, project, name)
+    cloud, region, plan, s3_calc_method, enable_s3_stage = conn.execute(
+        "SELECT cloud, region, plan, s3_calc_method, enable_s3_stage FROM scenarios WHERE id = ?", (scenario_id,)
+    ).fetchone()
+
+    jobs = pd.read_sql_query(
+        f"SELECT tier, {', '.join(JOB_FIELDS)} FROM jobs WHERE scenario_id = ? ORDER BY tier, position", conn, params=(scenario_id,)
+    ).rename(columns=JOB_FIELDS)
+    tables = pd.read_sql_query(
+        f"SELECT zone, {', '.join(S3_TABLE_FIELDS)} FROM s3_tables WHERE scenario_id = ? ORDER BY zone, position", conn, params=(scenario_id,)
+    ).rename(columns=S3_TABLE_FIELDS)
+    dev = pd.read_sql_query(
+        f"SELECT {', '.join(DEV_FIELDS)} FROM dev_clusters WHERE scenario_id = ? ORDER BY position", conn, params=(scenario_id,)
+    ).rename(columns=DEV_FIELDS)
+    zones = conn.execute(
+        "SELECT zone, storage_class, amount, unit, monthly_growth_percent FROM s3_zones WHERE scenario_id = ?", (scenario_id,)
+    ).fetchall()
+    warehouses = conn.execute(
+        f"SELECT {', '.join(WAREHOUSE_FIELDS)} FROM sql_warehouses WHERE scenario_id = ? ORDER BY position", (scenario_id,)
+    ).fetchall()
+
+    return {
+        "name": name,
+        "cloud": cloud, "region": region, "plan": plan,
+        "s3_calc_method": s3_calc_method,
+        "enable_s3_stage": bool(enable_s3_stage),
+        "dbx_jobs": {tier: rows.drop(columns="tier").reset_index(drop=True) for tier, rows in jobs.groupby("tier", sort=False)},
+        "s3_direct": {zone: {"class": storage_class, "amount": amount, "unit": unit, "monthly_growth_percent": growth}
+                      for zone, storage_class, amount, unit, growth in zones},
+        "s3_table_based": {zone: rows.drop(columns="zone").reset_index(drop=True) for zone, rows in tables.groupby("zone", sort=False)},
+        "sql_warehouses": [
+            {key: (bool(value) if key == "auto_suspend" and value is not None else value) for key, value in zip(WAREHOUSE_FIELDS.values(), row)}
+            for row in warehouses
+        ],
+        "dev_costs": dev,
+    }
+
+
+def list_scenarios(conn, project=None):
+    """Saved scenarios (project, name, region, saved_at, jobs), optionally of one project, newest first."""
+    query = """
+        SELECT s.project, s.name, s.region, datetime(s.saved_at, 'unixepoch') AS saved_at,
+               (SELECT COUNT(*) FROM jobs j WHERE j.scenario_id = s.id) AS jobs
+        FROM scenarios s
+    """
+    params = ()
+    if project is not None:
+        query += " WHERE s.project = ?"
+        params = (project,)
+    return pd.read_sql_query(query + " ORDER BY s.saved_at DESC", conn, params=params)
+
+
+def scenarios_using_instance(conn, instance):
+    """
+    Scenarios with a job or development cluster on `instance` (a bare name
+    or label), with the number of jobs and clusters using it; a cluster
+    whose driver and workers both use it counts once.
+    """
+    instance = bare_instances([instance]).iloc[0]
+    return pd.read_sql_query("""
+        SELECT s.project, s.name, COALESCE(j.jobs, 0) AS jobs, COALESCE(d.clusters, 0) AS dev_clusters
+        FROM scenarios s
+        LEFT JOIN (SELECT scenario_id, COUNT(*) AS jobs FROM jobs WHERE instance = ? GROUP BY scenario_id) j ON j.scenario_id = s.id
+        LEFT JOIN (
+            SELECT scenario_id, COUNT(*) AS clusters FROM (
+                SELECT rowid, scenario_id FROM dev_clusters WHERE driver_instance = ?
+                UNION
+                SELECT rowid, scenario_id FROM dev_clusters WHERE worker_instance = ?
+            ) GROUP BY scenario_id
+        ) d ON d.scenario_id = s.id
+        WHERE j.jobs IS NOT NULL OR d.clusters IS NOT NULL
+        ORDER BY s.project, s.name
+    """, conn, params=(instance, instance, instance))
+
+
+def delete_scenario(conn, project, name):
+    with conn:
+        conn.execute("DELETE FROM scenarios WHERE project = ? AND name = ?", (project, name))
@@ -0,0 +1,169 @@
+# simulation.py
+"""
+Monte Carlo cost ranges for a whole estimate.
+
+Each uncertain input is drawn from a symmetric triangular distribution
+around its point value, x * (1 ± spread), independently per job, zone,
+warehouse and cluster. All calculators are evaluated over every sample
+with NumPy array operations; every calculator processes the samples in
+chunks so that a large estimate never materializes more than `chunk_cells`
+values per input (for S3, per zone and projected month).
+"""
+import numpy as np
+import pandas as pd
+from cost_engine import (
+    job_hourly_rates, sql_warehouse_costs, price_dev_costs, size_s3_tables,
+    s3_direct_zones, s3_direct_arrays, project_s3_volumes, tiered_s3_cost,
+)
+
+# Uncertain inputs and their default spread (fraction of the point value)
+SIMULATION_INPUTS = {
+    "runtime": "Job Runtime (hrs)",
+    "runs": "Job Runs/Month",
+    "nodes": "Job Nodes",
+    "s3_amount": "S3 Storage Amount",
+    "s3_growth": "S3 Monthly Growth %",
+    "sql_hours": "SQL Hours/Day",
+    "dev_hours": "Dev Hours/Month",
+}
+DEFAULT_SPREADS = {"runtime": 0.2, "runs": 0.2, "nodes": 0.0, "s3_amount": 0.2, "s3_growth": 0.5, "sql_hours": 0.2, "dev_hours": 0.2}
+PERCENTILES = (10, 50, 90)
+
+
+def triangular_factors(rng, shape, spread):
+    """
+    float32 multipliers 1 + spread * T, with T symmetric triangular on [-1, 1],
+    drawn by inverse CDF: T = sign(d) * (1 - sqrt(1 - |d|)) for d uniform on [-1, 1].
+    """
+    if not spread:
+        return np.ones(shape, dtype=np.float32)
+    d = rng.random(shape, dtype=np.float32)
+    d *= 2
+    d -= 1
+    t = np.abs(d)
+    np.subtract(1, t, out=t)
+    np.sqrt(t, out=t)
+    np.subtract(1, t, out=t)
+    np.copysign(t, d, out=t)
+    t *= np.float32(spread)
+    t += 1
+    return t
+
+
+def sample_chunks(n_samples, width, chunk_cells):
+    """(start, size) of consecutive sample ranges holding at most `chunk_cells` values of `width` per sample."""
+    chunk = max(1, chunk_cells // max(width, 1))
+    for start in range(0, n_samples, chunk):
+        yield start, min(chunk, n_samples - start)
+
+
+def simulate_databricks(jobs_df, global_data, spreads, n_samples, rng, chunk_cells=2**22):
+    """Monthly DBX + EC2 cost of all jobs for each sample."""
+    totals = np.zeros(n_samples)
+    if jobs_df.empty:
+        return totals
+    _, rate_per_hour, ec2_per_hour = job_hourly_rates(jobs_df, global_data)
+    nodes = jobs_df["Nodes"].to_numpy(dtype=float)
+    # Cost per unit of runtime and runs factor: runtime x runs x hourly DBX + EC2 rate
+    job_cost = jobs_df["Runtime (hrs)"].to_numpy(dtype=float) * jobs_df["Runs/Month"].to_numpy(dtype=float) * (rate_per_hour + ec2_per_hour)
+    nodes_spread = spreads.get("nodes", 0)
+    if not nodes_spread:
+        job_cost = job_cost * (nodes + 1)
+    job_cost = job_cost.astype(np.float32)
+
+    for start, size in sample_chunks(n_samples, len(jobs_df), chunk_cells):
+        shape = (size, len(jobs_df))
+        factors = triangular_factors(rng, shape, spreads.get("runtime", 0))
+        factors *= triangular_factors(rng, shape, spreads.get("runs", 0))
+        if nodes_spread:
+            # Sampled node counts are whole workers, plus the driver
+            sampled_nodes = triangular_factors(rng, shape, nodes_spread)
+            sampled_nodes *= nodes.astype(np.float32)
+            np.rint(sampled_nodes, out=sampled_nodes)
+            np.maximum(sampled_nodes, 0, out=sampled_nodes)
+            sampled_nodes += 1
+            factors *= sampled_nodes
+        totals[start:start + shape[0]] = factors @ job_cost
+    return totals
+
+
+def simulate_s3(s3_calc_method, s3_direct, s3_table_based, global_data, spreads, n_samples, rng, enable_s3_stage=True, chunk_cells=2**20):
+    """
+    (monthly cost, 12-month projected cost) of S3 storage for each sample.
+    The tiered projection holds several float64 temporaries per cell, hence
+    the smaller default chunk.
+    """
+    if s3_calc_method != "Direct Storage[Recommended]":
+        table_cost = size_s3_tables(s3_table_based).sum() * 0.023
+        return np.full(n_samples, table_cost), np.full(n_samples, table_cost * 12)
+
+    zones = s3_direct_zones(enable_s3_stage)
+    storage_gb, growth_percent, tier_rates = s3_direct_arrays(s3_direct, zones, global_data.get('S3_PRICING', {}))
+    monthly, yearly = np.zeros(n_samples), np.zeros(n_samples)
+    # Each sample projects every zone over 12 months
+    for start, size in sample_chunks(n_samples, len(zones) * 12, chunk_cells):
+        shape = (size, len(zones))
+        sampled_gb = storage_gb * triangular_factors(rng, shape, spreads.get("s3_amount", 0))
+        sampled_growth = growth_percent * triangular_factors(rng, shape, spreads.get("s3_growth", 0))
+        monthly_costs = tiered_s3_cost(project_s3_volumes(sampled_gb, sampled_growth, 12), tier_rates)
+        monthly[start:start + size] = monthly_costs[:, :, 0].sum(axis=1)
+        yearly[start:start + size] = monthly_costs.sum(axis=(1, 2))
+    return monthly, yearly
+
+
+def simulate_sql(sql_warehouses, global_data, spreads, n_samples, rng, chunk_cells=2**22):
+    """Monthly DBU + EC2 cost of all SQL warehouses for each sample."""
+    totals = np.zeros(n_samples)
+    if not sql_warehouses:
+        return totals
+    # DBU and EC2 costs both scale with hours per day
+    dbu_costs, ec2_costs, _ = sql_warehouse_costs(sql_warehouses, global_data)
+    warehouse_costs = dbu_costs + ec2_costs
+    for start, size in sample_chunks(n_samples, len(sql_warehouses), chunk_cells):
+        factors = triangular_factors(rng, (size, len(sql_warehouses)), spreads.get("sql_hours", 0))
+        totals[start:start + size] = factors @ warehouse_costs
+    return totals
+
+
+def simulate_dev(dev_df, global_data, spreads, n_samples, rng, chunk_cells=2**22):
+    """Monthly development cluster cost for each sample; cost scales with hours per month."""
+    totals = np.zeros(n_samples)
+    _, _, priced = price_dev_costs(dev_df, global_data)
+    if priced.empty:
+        return totals
+    cluster_costs = priced["Total"].to_numpy(dtype=float)
+    for start, size in sample_chunks(n_samples, len(priced), chunk_cells):
+        factors = triangular_factors(rng, (size, len(priced)), spreads.get("dev_hours", 0))
+        totals[start:start + size] = factors @ cluster_costs
+    return totals
+
+
+def simulate_estimate(jobs_df, s3_calc_method, s3_direct, s3_table_based, sql_warehouses, dev_df, global_data,
+                      spreads=None, n_samples=100_000, enable_s3_stage=True, seed=0):
+    """
+    Returns P10/P50/P90 and mean monthly cost per section and in total, plus
+    the S3 12-month projection, as a DataFrame indexed by section.
+    `jobs_df` holds the jobs of every active tier; `spreads` maps the keys of
+    SIMULATION_INPUTS to fractions (0.2 = ±20%).
+    """
+    spreads = {**DEFAULT_SPREADS, **(spreads or {})}
+    rng = np.random.default_rng(seed)
+
+    databricks = simulate_databricks(jobs_df, global_data, spreads, n_samples, rng)
+    s3_monthly, s3_yearly = simulate_s3(s3_calc_method, s3_direct, s3_table_based, global_data, spreads, n_samples, rng, enable_s3_stage)
+    sql = simulate_sql(sql_warehouses, global_data, spreads, n_samples, rng)
+    dev = simulate_dev(dev_df, global_data, spreads, n_samples, rng)
+
+    samples = {
+        "Databricks & Compute": databricks,
+        "S3 Storage": s3_monthly,
+        "SQL Warehouses": sql,
+        "Development Cost": dev,
+        "Total": databricks + s3_monthly + sql + dev,
+        "S3 Storage (12 months)": s3_yearly,
+    }
+    sections = list(samples)
+    values = np.stack([samples[section] for section in sections])
+    result = pd.DataFrame(np.percentile(values, PERCENTILES, axis=1).T, index=sections, columns=[f"P{p}" for p in PERCENTILES])
+    result["Mean"] = values.mean(axis=1)
+    return result
@@ -1,178 +1,147 @@
 # state.py
+import contextlib
+import threading
 import streamlit as st
 import pandas as pd
+import scenario_store
+from rate_card_store import DEFAULT_SHARD
+from rate_card_watcher import RateCardWatcher
+from cost_engine import s3_table_frame, SPOT_COLUMN
+from simulation import DEFAULT_SPREADS
+from calc_graph import CalcGraph
 
 TIERS = ["Stage", "L0 / Raw", "L1 / Curated", "L2 / Data Product"]
+JOB_COLUMNS = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes", SPOT_COLUMN]
 
 
-@st.cache_data
-def load_rate_card_data():
-    """Loads the Databricks rate card from a specific Excel file."""
+RATE_CARD_NOT_FOUND = "Rate card file not found. Please ensure 'final_out.csv', 'SQL_warehouse - Sheet1.csv' and 'S3_Storage_cost.xlsx' are in the same directory."
+
+
+@st.cache_resource
+def rate_card_watcher():
+    """
+    The process-wide rate card watcher (see rate_card_watcher), started on
+    first use. It rebuilds the lookups in the background when a rate card
+    file changes, so a pricing update needs no restart.
+    """
+    return RateCardWatcher().start()
+
+
+@st.cache_resource
+def _scenario_store_connection():
+    """(connection, lock) of the local scenario store, opened once per process."""
+    return scenario_store.connect(check_same_thread=False), threading.Lock()
+
+
+@contextlib.contextmanager
+def open_scenario_store():
+    """
+    The process-wide scenario store connection, opened (and so created) on
+    first use. Every session's script thread shares it, one at a time.
+    """
+    conn, lock = _scenario_store_connection()
+    with lock:
+        yield conn
+
+
+def get_global_data(shard=DEFAULT_SHARD):
+    """
+    Returns the lookup structures of one (cloud, region, plan) shard shared by
+    every session, or None if the rate cards failed to load.
+    Each shard is built on first use and kept by the watcher, which swaps in a
+    rebuilt copy when a rate card file changes; sessions pick it up on their next run.
+    """
     try:
-        data = pd.read_csv(
-            'final_out.csv',
-            usecols=['Compute type', 'Instance', 'vCPU', 'Memory (GB)', 'DBU/hour', 'Rate/hour', 'onDemandLinuxHr']
-        ) 
-        s3_data = pd.read_excel(
-            'S3_Storage_cost.xlsx'
-        )
-        sql_data = pd.read_csv(
-            'SQL_warehouse - Sheet1.csv'
-        )
-        
-        # data for Databricks Jobs/Pipelines
-        df = data[data['Compute type'].isin([ 'DLT Advanced Compute Photon', 'Jobs Compute', 'Jobs Compute Photon', 'DLT Advanced Compute'])] # Filter for Photon and All-Purpose compute types
-        # data for SQL Warehouses
-        df_sql = sql_data[sql_data['Compute type'].isin(['SQL Pro Compute', 'SQL Compute'])]
-       # data for develoment cost
-        df_dev = data[data['Compute type'].isin(['All-Purpose Compute'])]
-        # s3 df
-        s3_df = s3_data.copy()
-        if df.empty or df_sql.empty or df_dev.empty or s3_df.empty:
-            st.error("The data is empty or invalid.")
-            return None, None, None, None
-        return df,df_sql, df_dev, s3_df
+        return rate_card_watcher().global_data(shard)
     except FileNotFoundError:
-        st.error("Rate card file not found. Please ensure 'enterprise_plan.xlsx' is in the same directory.")
-        return None, None, None, None
+        st.error(RATE_CARD_NOT_FOUND)
+    except ValueError as e:
+        st.error(str(e))
     except Exception as e:
         st.error(f"An error occurred while loading the rate card: {e}")
-        return None,None, None, None
-    
+    return None
 
 
-def populate_global_data(df, df_sql, df_dev, s3_df):
+def get_rate_shards():
+    """Returns {(cloud, region, plan): display name} for every shard of the rate card."""
+    try:
+        return dict(rate_card_watcher().snapshot.rate_shards)
+    except Exception:
+        return {DEFAULT_SHARD: DEFAULT_SHARD[1]}
+
+def tier_job_options(tier, global_data):
+    """Returns (compute type options, {compute type: {instance label: instance}}) for a tier."""
+    if tier in ["L0 / Raw", "Stage"]:
+        return global_data['COMPUTE_TYPES_L0_Stage'], global_data['INSTANCE_PRICES_L0_Stage']
+    elif tier in ["L2 / Data Product","L1 / Curated"]:
+        return global_data['COMPUTE_TYPES_L2_L1'], global_data['INSTANCE_PRICES_L2_L1']
+    return [], {}
+
+
+def fill_job_defaults(jobs_df, tier, global_data):
     """
-    Populates global dictionaries and lists from the loaded DataFrame.
-    This includes grouping instances by their compute type.
+    Returns a copy of a tier's jobs with blank cells filled with defaults,
+    a column at a time: numeric inputs default to 0 runtime/runs/spot % and 1 node,
+    names to "<tier> Job <n>", and any instance that is not offered for the
+    row's compute type is replaced by the first instance of that type.
     """
-    global FLAT_RATE_CARD, FLAT_INSTANCE_LIST, INSTANCE_PRICES, COMPUTE_TYPE_LIST, SQL_WAREHOUSE_SIZES_BY_TYPE, SQL_WAREHOUSE_TYPES_FROM_DATA
+    compute_options, instance_prices_for_tier = tier_job_options(tier, global_data)
+    df = jobs_df.reindex(columns=JOB_COLUMNS).reset_index(drop=True)
 
-    FLAT_RATE_CARD = {
-        row['Instance']: row for _, row in df.iterrows()
-    }
-    FLAT_INSTANCE_LIST = {
-        f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance']
-        for _, row in df.iterrows()
-    }
+    df['Runtime (hrs)'] = pd.to_numeric(df['Runtime (hrs)'], errors='coerce').fillna(0.0).astype(float)
+    df['Runs/Month'] = pd.to_numeric(df['Runs/Month'], errors='coerce').fillna(0.0).astype(float)
+    nodes = pd.to_numeric(df['Nodes'], errors='coerce').fillna(1)
+    df['Nodes'] = nodes.astype(int) if (nodes % 1 == 0).all() else nodes
+    df[SPOT_COLUMN] = pd.to_numeric(df[SPOT_COLUMN], errors='coerce').fillna(0.0).clip(0, 100).astype(float)
 
-    COMPUTE_TYPE_LIST = df['Compute type'].unique().tolist()
-    
-    INSTANCE_PRICES = {}
-    for compute_type, group in df.groupby('Compute type'):
-        INSTANCE_PRICES[compute_type] = {
-            f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance']
-            for _, row in group.iterrows()
-        }
-    # Create a mapping 
-    type_name_map = {
-        'SQL Compute': 'SQL Compute',
-        'SQL Pro Compute': 'SQL Pro Compute'
-    }
-    
-    seen_types = set()
-    SQL_WAREHOUSE_TYPES_FROM_DATA = []
-    
-    for t in df_sql['Compute type'].unique().tolist():
-        new_name = type_name_map.get(t, t)
-        if new_name not in seen_types:
-            SQL_WAREHOUSE_TYPES_FROM_DATA.append(new_name)
-            seen_types.add(new_name)
-    
-    SQL_RATES_BY_TYPE_AND_INSTANCE = {}
-    SQL_WAREHOUSE_SIZES_BY_TYPE = {}
-    SQL_FLAT_INSTANCE_LIST = {}
-
-    # New dictionary to map driver instance to max worker nodes
-    SQL_WORKER_COUNTS_BY_DRIVER = {
-        '2X-Small': 1, 'X-Small': 2, 'Small': 4, 'Medium': 8, 'Large': 16,
-        'X-Large': 32, '2X-Large': 64, '3X-Large': 128, '4X-Large': 128
-    }
- 
-    for _, row in df_sql.iterrows():
-        compute_type_mapped = type_name_map.get(row['Compute type'], row['Compute type'])
-        instance_name = row['Instance']
-        formatted_size_string = f"{instance_name} - {row['DBU/hour']} DBUs - ${row['Rate/hour']}/hr"
-        if compute_type_mapped not in SQL_RATES_BY_TYPE_AND_INSTANCE:
-            SQL_RATES_BY_TYPE_AND_INSTANCE[compute_type_mapped] = {}
-            SQL_WAREHOUSE_SIZES_BY_TYPE[compute_type_mapped] = {}
-        SQL_RATES_BY_TYPE_AND_INSTANCE[compute_type_mapped][instance_name] = row.to_dict()
-        SQL_WAREHOUSE_SIZES_BY_TYPE[compute_type_mapped][formatted_size_string] = instance_name
-        SQL_FLAT_INSTANCE_LIST[formatted_size_string] = instance_name
-
-        #==> Deveplopment Cost Data
-    FLAT_RATE_CARD_DEV = {
-        row['Instance']: row for _, row in df_dev.iterrows()
-    }
-    FLAT_INSTANCE_LIST_DEV= {
-        f"{row['Instance']} | {row['DBU/hour']} DBUs | {row['Rate/hour']}/hr": row['Instance']
-        for _, row in df_dev.iterrows()
-    }
-    
-    s3_pricing = {}
-    for _, row in s3_df.iterrows():
-        s3_pricing[row['S3_storage']] = {
-            'Rate/GB_50TB': row['Rate/GB_50TB'],
-            'Rate/GB_500TB': row['Rate/GB_500TB'],
-            'Rate/GB_over500TB': row['Rate/GB_over500TB']
-        }
+    default_names = pd.Series([f"{tier.replace('/', ' ')} Job {j + 1}" for j in range(len(df))], dtype=object)
+    blank_names = df['Job Name'].isna() | (df['Job Name'].astype(object) == "")
+    df['Job Name'] = df['Job Name'].astype(object).where(~blank_names, default_names)
+
+    df['Compute type'] = df['Compute type'].astype(object)
+    if compute_options:
+        df['Compute type'] = df['Compute type'].fillna(compute_options[0])
+
+    valid_pairs = pd.MultiIndex.from_tuples(
+        [(ct, label) for ct, prices in instance_prices_for_tier.items() for label in prices],
+        names=['Compute type', 'Instance Type']
+    )
+    is_valid = pd.MultiIndex.from_arrays([df['Compute type'], df['Instance Type']]).isin(valid_pairs)
+    first_instance = {ct: next(iter(prices), None) for ct, prices in instance_prices_for_tier.items()}
+    df['Instance Type'] = df['Instance Type'].astype(object).where(is_valid, df['Compute type'].map(first_instance))
+    return df
 
-    return {
-        'FLAT_RATE_CARD': FLAT_RATE_CARD,
-        'FLAT_INSTANCE_LIST': FLAT_INSTANCE_LIST,
-        'INSTANCE_PRICES': INSTANCE_PRICES,
-        'COMPUTE_TYPE_LIST': COMPUTE_TYPE_LIST,
-        
-        # Store the new tier-specific data for Jobs/Pipelines
-        'COMPUTE_TYPES_L0_Stage': df[df['Compute type'].isin(['DLT Advanced Compute Photon', 'DLT Advanced Compute'])]['Compute type'].unique().tolist(),
-        'INSTANCE_PRICES_L0_Stage': {ct: {f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance'] for _, row in group.iterrows()} for ct, group in df[df['Compute type'].isin(['DLT Advanced Compute Photon', 'DLT Advanced Compute'])].groupby('Compute type')},
-        'COMPUTE_TYPES_L2_L1': df[df['Compute type'].isin(['Jobs Compute', 'Jobs Compute Photon'])]['Compute type'].unique().tolist(),
-        'INSTANCE_PRICES_L2_L1': {ct: {f"{row['Instance']} | {row['vCPU']} CPUs | {row['Memory (GB)']}GB": row['Instance'] for _, row in group.iterrows()} for ct, group in df[df['Compute type'].isin(['Jobs Compute', 'Jobs Compute Photon'])].groupby('Compute type')},
-
-
-        # sql values ...
-        'SQL_RATES_BY_TYPE_AND_INSTANCE': SQL_RATES_BY_TYPE_AND_INSTANCE,
-        'SQL_FLAT_INSTANCE_LIST': SQL_FLAT_INSTANCE_LIST,
-        'SQL_WAREHOUSE_TYPES_FROM_DATA': SQL_WAREHOUSE_TYPES_FROM_DATA,
-        'SQL_WAREHOUSE_SIZES_BY_TYPE': SQL_WAREHOUSE_SIZES_BY_TYPE,
-        'SQL_WORKER_COUNTS_BY_DRIVER': SQL_WORKER_COUNTS_BY_DRIVER
-
-        # DEVELOPMENT COST DATA
-        ,'FLAT_RATE_CARD_DEV': FLAT_RATE_CARD_DEV,
-        'FLAT_INSTANCE_LIST_DEV': FLAT_INSTANCE_LIST_DEV,
-
-        #S3 data
-        'S3_PRICING': s3_pricing
-    }
 
 def initialize_state():
     
-    # Load and populate global data first
-    if 'global_data_populated' not in st.session_state or not st.session_state.global_data_populated:
-        df, df_sql,df_dev, s3_df = load_rate_card_data()
-        if df is None or df_sql.empty:
+    # Pricing region of this estimate, switched by the region selector
+    if 'rate_shard' not in st.session_state:
+        st.session_state.rate_shard = DEFAULT_SHARD
+
+    # Point the session at the process-wide lookup data; this is a reference, not a copy
+    global_data = get_global_data(st.session_state.rate_shard)
+    if global_data is None:
         # Handle the error gracefully
-            st.error("The jobs or SQL dataframes are empty. Please check your data source.")
-            return
-            
-        # Populate the global data dictionary in session state
-        st.session_state.global_data = populate_global_data(df, df_sql, df_dev, s3_df)
-        st.session_state.global_data_populated = True
+        st.error("The jobs or SQL dataframes are empty. Please check your data source.")
+        return
+    previous = st.session_state.get('global_data')
+    if previous is not None and previous['VERSION'][0] != global_data['VERSION'][0]:
+        st.toast("The rate card was updated; costs now use the new rates.")
+    st.session_state.global_data = global_data
+    if rate_card_watcher().last_error:
+        st.warning(f"The updated rate card could not be loaded ({rate_card_watcher().last_error}); prices still use the previous version.")
+
+    # Memoized calculation results for this session
+    if 'calc_graph' not in st.session_state:
+        st.session_state.calc_graph = CalcGraph()
 
     if 'dbx_jobs' not in st.session_state:
         st.session_state.dbx_jobs = {}
         global_data = st.session_state.global_data
 
         for tier in TIERS:
-            if tier in ["L0 / Raw", "Stage"]:
-                default_compute_type = global_data['COMPUTE_TYPES_L0_Stage'][0] if global_data['COMPUTE_TYPES_L0_Stage'] else None
-                instance_prices_for_tier = global_data['INSTANCE_PRICES_L0_Stage']
-            elif tier in ["L2 / Data Product","L1 / Curated"]:
-                default_compute_type = global_data['COMPUTE_TYPES_L2_L1'][0] if global_data['COMPUTE_TYPES_L2_L1'] else None
-                instance_prices_for_tier = global_data['INSTANCE_PRICES_L2_L1']
-            else:
-                default_compute_type = None
-                instance_prices_for_tier = {}
+            compute_options, instance_prices_for_tier = tier_job_options(tier, global_data)
+            default_compute_type = compute_options[0] if compute_options else None
             
             default_instance_list = list(instance_prices_for_tier.get(default_compute_type, {}).keys())
             default_instance = default_instance_list[0] if default_instance_list else None
@@ -185,6 +154,7 @@ def initialize_state():
                 "Compute type": default_compute_type,
                 "Instance Type": default_instance,
                 "Nodes": 1,
+                SPOT_COLUMN: 0.0,
             }])
             
     # S3 state
@@ -208,49 +178,53 @@ def initialize_state():
             "L2 / Data Product": {"class": default_s3_class, "amount": 0, "unit": "GB",  "monthly_growth_percent": 0.0},
         }
     
+    # Monte Carlo cost ranges: off by default, spreads in percent per uncertain input
+    if 'simulate_costs' not in st.session_state:
+        st.session_state.simulate_costs = False
+    for name, spread in DEFAULT_SPREADS.items():
+        if f"sim_spread_{name}" not in st.session_state:
+            st.session_state[f"sim_spread_{name}"] = int(spread * 100)
+
+    # Months shown in the S3 month-by-month projection. Its input is only drawn
+    # for Direct Storage, so the value is written back every run; otherwise
+    # Streamlit drops it while Table-Based mode is shown.
+    st.session_state.s3_projection_months = st.session_state.get('s3_projection_months', 12)
+
     # Ensure existing s3_direct entries have 'monthly_growth_percent'
     for zone, config in st.session_state.s3_direct.items():
 
         if 'monthly_growth_percent' not in config:
             config['monthly_growth_percent'] = 0.0
 
+    # Table-based storage is held as one DataFrame of tables per zone
     if 's3_table_based' not in st.session_state:
         st.session_state.s3_table_based = {
-            "Source System Table": [{"Table Name": "Source_system_Table_1", "Records": 0, "Columns": 0, "Table" : 0, "Avg_Column_length" : 0}], 
-            "L0 / Raw":  [{"Table Name": "Bronze_Table_1", "Records": 0, "Columns": 0, "Table" : 0, "Avg_Column_length" : 0 }], 
-            "L1 / Curated":  [{"Table Name": "Silver_Table_1", "Records": 0, "Columns": 0, "Table" : 0, "Avg_Column_length" : 0}], 
-            "L2 / Data Product":    [{"Table Name": "Gold_Table_1", "Records": 0, "Columns": 0,"Table" : 0, "Avg_Column_length" : 0}], 
+            "Source System Table": s3_table_frame([{"Table Name": "Source_system_Table_1"}]),
+            "L0 / Raw": s3_table_frame([{"Table Name": "Bronze_Table_1"}]),
+            "L1 / Curated": s3_table_frame([{"Table Name": "Silver_Table_1"}]),
+            "L2 / Data Product": s3_table_frame([{"Table Name": "Gold_Table_1"}]),
         }
-    else: # Ensure existing entries also get 'Columns' if they are old format        
+    else: # Convert entries in older formats (lists of dicts, or a single 'records' dict)
         for zone_name, table_configs in st.session_state.s3_table_based.items():
+            if isinstance(table_configs, pd.DataFrame):
+                continue
             if isinstance(table_configs, dict) and "records" in table_configs:
-                st.session_state.s3_table_based[zone_name] = [{
+                table_configs = [{
                     "Table Name": f"{zone_name.replace(' / ', '_')} Table 1",
                     "Records": table_configs.get("records", 0),
-                    "Columns": 0 ,# Default new column count,
-                    "Table" : 0, 
-                    "Avg_Column_length" : 0
                 }]
-            elif isinstance(table_configs, list):
-                # Ensure each item in the list has 'Columns' AND 'Table'
-                for i, table_config in enumerate(table_configs):
-                    if 'Columns' not in table_config:
-                        st.session_state.s3_table_based[zone_name][i]['Columns'] = 0
-                    if 'Table' not in table_config: # New check for the 'Table' column
-                        st.session_state.s3_table_based[zone_name][i]['Table'] = 0
-                    if 'Avg_Column_length' not in table_config: # New check for the 'Table' column
-                        st.session_state.s3_table_based[zone_name][i]['Avg_Column_length'] = 0
+            st.session_state.s3_table_based[zone_name] = s3_table_frame(table_configs)
 
 #------------------------------------------------------------------------------------------------------------------
     # SQL Warehouse state
     global_data = st.session_state.get('global_data', {})
     sql_warehouse_types = global_data.get('SQL_WAREHOUSE_TYPES_FROM_DATA', [])
-    sql_warehouse_sizes_by_type = global_data.get('SQL_WAREHOUSE_SIZES_BY_TYPE', {})
+    sql_size_catalog = global_data['SQL_SIZE_CATALOG']
 
     if 'sql_warehouses' not in st.session_state:
             # FIX: Access the dictionaries correctly
         default_type = sql_warehouse_types[0] if sql_warehouse_types else None
-        default_size = next(iter(sql_warehouse_sizes_by_type.get(default_type, {})), None)
+        default_size = next(iter(sql_size_catalog.sizes_for(default_type)), None)
     
         st.session_state.sql_warehouses = [{
             "id": "warehouse_0", 
@@ -260,10 +234,15 @@ def initialize_state():
             'SQL_nodes': 1,
             "hours_per_day": 0, 
             "days_per_month": 0, 
+            "spot_percent": 0,
             "auto_suspend": True, 
             "suspend_after": 10
         }]
 
+    # Query history loaded for auto-suspend uptime (a query_logs.QueryLog), None when not loaded
+    if 'sql_query_log' not in st.session_state:
+        st.session_state.sql_query_log = None
+
 # --------------------------------------------------
     # Development Cost state
     global_data = st.session_state.get('global_data', {})
@@ -279,13 +258,17 @@ def initialize_state():
             "Nodes": 1,
             "hr_per_month": 0, 
             "no_of_Month": 0,
-            "DBX": 0.0,
+            SPOT_COLUMN: 0.0,
         }])
     #---------------------------------------------------------------
     #Ensure existing SQL warehouses have 'type'
+    # and refer to their size by name rather than by a dropdown label
+    size_names = set(sql_size_catalog.sizes)
     for warehouse in st.session_state.sql_warehouses:
         if 'type' not in warehouse:
             warehouse['type'] = sql_warehouse_types[0]
+        if warehouse.get('size') not in size_names:
+            warehouse['size'] = sql_size_catalog.size_name(warehouse['type'], warehouse.get('size')) or warehouse.get('size')
 
     # Monthly Growth Rate for Databricks (used in overall projection, but no longer an input in summary)
     if 'monthly_growth_percent' not in st.session_state:
@@ -293,4 +276,61 @@ def initialize_state():
 
     # Theme state
     if 'theme' not in st.session_state:
-        st.session_state.theme = 'Dark' if st.session_state.get('dark_mode', False) else 'Light'
\ No newline at end of file
+        st.session_state.theme = 'Dark' if st.session_state.get('dark_mode', False) else 'Light'
+
+# --- Saved estimates ---
+S3_DIRECT_INPUTS = ("class", "amount", "unit", "monthly_growth_percent")
+# Widgets that hold a copy of the estimate; their state is dropped when an estimate is loaded
+ESTIMATE_WIDGET_PREFIXES = (
+    "data_editor_", "job_filter_", "job_page_", "dev_cost_editor", "s3_class_", "s3_amount_", "s3_unit_", "s3_growth_",
+    "s3_table_editor_", "sql_name_", "sql_type_", "sql_size_", "sql_nodes_", "sql_hours_", "sql_days_", "sql_spot_",
+    "sql_auto_suspend_", "sql_suspend_after_",
+)
+
+
+def session_estimate():
+    """The session's estimate in the scenario format (see scenario_store and cli)."""
+    cloud, region, plan = st.session_state.rate_shard
+    return {
+        "cloud": cloud, "region": region, "plan": plan,
+        "s3_calc_method": st.session_state.s3_calc_method,
+        "enable_s3_stage": st.session_state.get('enable_s3_stage', True),
+        "dbx_jobs": st.session_state.dbx_jobs,
+        "s3_direct": {zone: {k: config.get(k) for k in S3_DIRECT_INPUTS} for zone, config in st.session_state.s3_direct.items()},
+        "s3_table_based": st.session_state.s3_table_based,
+        "sql_warehouses": st.session_state.sql_warehouses,
+        "dev_costs": st.session_state.get('dev_costs', pd.DataFrame()),
+    }
+
+
+def apply_estimate(estimate):
+    """
+    Replaces the session's estimate with a saved one. Its rate card shard is
+    selected when this rate card has it; jobs get their defaults filled
+    against that shard. Call from a widget callback (it sets widget keys).
+    Returns False, leaving the session unchanged, if the rate card failed to load.
+    """
+    shard = tuple(estimate.get(key) or default for key, default in zip(("cloud", "region", "plan"), DEFAULT_SHARD))
+    if shard not in get_rate_shards():
+        shard = st.session_state.rate_shard
+    global_data = get_global_data(shard)
+    if global_data is None:
+        st.error("The saved scenario was not loaded because the rate card is unavailable.")
+        return False
+    st.session_state.rate_shard = shard
+    for key in [key for key in st.session_state if str(key).startswith(ESTIMATE_WIDGET_PREFIXES)]:
+        del st.session_state[key]
+
+    jobs = estimate.get("dbx_jobs") or {}
+    st.session_state.dbx_jobs = {
+        tier: fill_job_defaults(jobs.get(tier, pd.DataFrame(columns=JOB_COLUMNS)), tier, global_data) for tier in TIERS
+    }
+    if estimate.get("s3_calc_method"):
+        st.session_state.s3_calc_method = estimate["s3_calc_method"]
+    st.session_state.enable_s3_stage = estimate.get("enable_s3_stage", True)
+    for zone, config in (estimate.get("s3_direct") or {}).items():
+        st.session_state.s3_direct.setdefault(zone, {}).update({k: v for k, v in config.items() if v is not None})
+    st.session_state.s3_table_based.update({zone: s3_table_frame(tables) for zone, tables in (estimate.get("s3_table_based") or {}).items()})
+    st.session_state.sql_warehouses = list(estimate.get("sql_warehouses") or [])
+    st.session_state.dev_costs = pd.DataFrame(estimate.get("dev_costs")).reset_index(drop=True)
+    return True
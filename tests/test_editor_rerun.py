@@ -0,0 +1,83 @@
+# tests/test_editor_rerun.py
+"""
+One cell edit in a 500-job tier must cost one script run, one tier
+calculation and stay within EDIT_LATENCY_BUDGET: the editor's on_change
+callback applies the edit before the rerun, and the memo graph reprices
+only the edited tier.
+
+AppTest has no public way to send a data editor change, so each edit is
+applied to the session with apply_editor_changes, the helper the editor
+callbacks use, and the rerun that follows is measured.
+"""
+import os
+import time
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+import state as s
+import calculations
+from ui_components import apply_editor_changes
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+TIER = "L1 / Curated"
+N_JOBS = 500
+EDIT_LATENCY_BUDGET = 1.0  # seconds, best of three edits
+
+
+@pytest.fixture
+def counts(monkeypatch):
+    counts = {'runs': 0, 'tier_calcs': 0}
+    initialize_state, calculate = s.initialize_state, calculations.calculate_databricks_costs_for_tier
+
+    def counting_initialize_state():
+        counts['runs'] += 1
+        return initialize_state()
+
+    def counting_calculate(*args, **kwargs):
+        counts['tier_calcs'] += 1
+        return calculate(*args, **kwargs)
+
+    monkeypatch.setattr(s, 'initialize_state', counting_initialize_state)
+    monkeypatch.setattr(calculations, 'calculate_databricks_costs_for_tier', counting_calculate)
+    return counts
+
+
+def make_jobs(global_data, n_jobs):
+    """A tier of `n_jobs` jobs cycling through the Jobs Compute instance lists."""
+    choices = [
+        (compute_type, label)
+        for compute_type, labels in global_data['INSTANCE_PRICES_L2_L1'].items()
+        for label in labels
+    ]
+    picks = [choices[i % len(choices)] for i in range(n_jobs)]
+    return pd.DataFrame({
+        "Job Name": [f"Job {i + 1}" for i in range(n_jobs)],
+        "Runtime (hrs)": 1.0,
+        "Runs/Month": 30.0,
+        "Compute type": [compute_type for compute_type, _ in picks],
+        "Instance Type": [label for _, label in picks],
+        "Nodes": 2,
+    })
+
+
+def test_cell_edit_runs_script_once_and_reprices_one_tier(counts):
+    at = AppTest.from_file(MAIN, default_timeout=300).run()
+    global_data = at.session_state.global_data
+    at.session_state.dbx_jobs[TIER] = s.fill_job_defaults(make_jobs(global_data, N_JOBS), TIER, global_data)
+    at.run()
+    assert not at.exception
+
+    timings = []
+    for runtime in (5.0, 6.0, 7.0):
+        changes = {"edited_rows": {"0": {"Runtime (hrs)": runtime}}, "added_rows": [], "deleted_rows": []}
+        jobs_df = apply_editor_changes(at.session_state.dbx_jobs[TIER], changes, s.JOB_COLUMNS)
+        at.session_state.dbx_jobs[TIER] = s.fill_job_defaults(jobs_df, TIER, global_data)
+        counts.update(runs=0, tier_calcs=0)
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+
+        assert not at.exception
+        assert at.session_state.dbx_jobs[TIER].at[0, "Runtime (hrs)"] == runtime
+        assert counts == {'runs': 1, 'tier_calcs': 1}
+    assert min(timings) < EDIT_LATENCY_BUDGET, timings
@@ -1,12 +1,29 @@
 # ui_components.py
+import os
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import state as s
-from file_exportor import generate_consolidated_excel_export
-from calculations import calculate_databricks_costs_for_tier, calculate_dev_costs
+from file_exportor import assemble_export_sheets, EXPORT_FORMATS
+from calculations import cached_tier_costs, cached_dev_costs, cached_right_sizing, cached_tier_sweep, billed_sql_warehouses, DEV_INPUT_COLUMNS
+from cost_engine import sweep_candidates, PHOTON_SUFFIX, s3_table_frame, S3_TABLE_COLUMNS, S3_TABLE_NUMERIC_COLUMNS, SPOT_COLUMN
+from simulation import SIMULATION_INPUTS
+from query_logs import load_query_log, MIN_SUSPEND_MINUTES
+from job_import import import_jobs, import_format, merge_imported_jobs
+import scenario_store
 
-def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projected_s3_cost_12_months, quarterly_total_cost, half_yearly_total_cost, yearly_total_cost, dev_cost, total_table_cost):
+# Rows per page of a tier's job editor; tiers up to the smallest size are shown whole
+JOB_PAGE_SIZES = [50, 100, 250, 1000, "All"]
+DEFAULT_JOB_PAGE_SIZE = 100
+ALL_COMPUTE_TYPES = "All compute types"
+SPOT_PERCENT_HELP = "Share of EC2 hours on spot instances; the rest is on demand."
+
+def spot_percent_column():
+    """data_editor column config of a job or cluster's spot share."""
+    return st.column_config.NumberColumn("Spot %", min_value=0, max_value=100, help=SPOT_PERCENT_HELP)
+
+def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projected_s3_cost_12_months, quarterly_total_cost, half_yearly_total_cost, yearly_total_cost, dev_cost, total_table_cost, cost_ranges=None):
     """Renders the right-hand summary column with the donut chart."""
     st.markdown("<h3 style='text-align: center;'>Total Cost</h3>", unsafe_allow_html=True)
     c1, c2 = st.columns(2)
@@ -25,6 +42,8 @@ def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projec
     with c2:
         with st.container(border=True):
             st.metric("Yearly Total Cloud Cost", f"${yearly_total_cost:,.2f}")
+
+    render_cost_ranges(cost_ranges)
     st.divider()
 
     # Calculate 12-month projected cost (still uses st.session_state.monthly_growth_percent for Databricks)
@@ -81,6 +100,95 @@ def render_summary_column(total_cost, databricks_cost, s3_cost, sql_cost, projec
     """)
 
 
+def render_cost_ranges(cost_ranges):
+    """Simulation toggle, input spreads and the P10/P50/P90 bands of the simulated estimate."""
+    st.toggle("Simulate Cost Ranges", key="simulate_costs", help="Monte Carlo over 100,000 samples of the uncertain inputs")
+    if not st.session_state.simulate_costs:
+        return
+    with st.expander("Input Uncertainty (± %)"):
+        for name, label in SIMULATION_INPUTS.items():
+            st.slider(label, min_value=0, max_value=100, step=5, key=f"sim_spread_{name}")
+    if cost_ranges is None:
+        return
+
+    total = cost_ranges.loc["Total"]
+    c1, c2 = st.columns(2)
+    with c1:
+        with st.container(border=True):
+            st.metric("Monthly P50", f"${total['P50']:,.2f}")
+    with c2:
+        with st.container(border=True):
+            st.metric("Monthly P90", f"${total['P90']:,.2f}")
+    st.dataframe(
+        cost_ranges[["P10", "P50", "P90"]],
+        column_config={p: st.column_config.NumberColumn(p, format="dollar") for p in ("P10", "P50", "P90")},
+        use_container_width=True
+    )
+
+
+def render_region_selector():
+    """Pricing region (rate card shard) of this estimate; the session's lookups follow it from the next run."""
+    shards = s.get_rate_shards()
+    st.selectbox(
+        "Pricing Region", list(shards), key="rate_shard", disabled=len(shards) < 2,
+        format_func=lambda shard: f"{shards.get(shard, shard[1])} ({shard[1]}) | {shard[0]} {shard[2]}"
+    )
+
+def render_scenario_store():
+    """Expander for saving the estimate to, and loading it from, the local scenario store."""
+    with st.expander("Saved Scenarios"):
+        c1, c2, c3 = st.columns([2, 2, 1])
+        with c1:
+            st.text_input("Project", key="scenario_project")
+        with c2:
+            st.text_input("Scenario", key="scenario_name")
+        with c3:
+            st.button("Save", key="save_scenario", on_click=save_session_scenario,
+                      disabled=not (st.session_state.get("scenario_project") and st.session_state.get("scenario_name")))
+
+        # Only open (and so create) the store once something has been saved
+        saved = pd.DataFrame()
+        if os.path.exists(scenario_store.DEFAULT_STORE):
+            with s.open_scenario_store() as conn:
+                saved = scenario_store.list_scenarios(conn)
+        if not saved.empty:
+            c1, c2 = st.columns([4, 1])
+            with c1:
+                choice = st.selectbox(
+                    "Saved scenario", list(saved[["project", "name"]].itertuples(index=False, name=None)), key="scenario_choice",
+                    format_func=lambda key: f"{key[0]} / {key[1]}"
+                )
+            with c2:
+                st.button("Load", key="load_scenario", on_click=load_session_scenario, args=(choice,))
+            st.dataframe(saved, hide_index=True, use_container_width=True)
+
+        instance = st.text_input("Find scenarios using instance", key="scenario_instance_search", placeholder="i3.8xlarge")
+        if instance and os.path.exists(scenario_store.DEFAULT_STORE):
+            with s.open_scenario_store() as conn:
+                using = scenario_store.scenarios_using_instance(conn, instance)
+            st.dataframe(using, hide_index=True, use_container_width=True)
+
+        if st.session_state.get("scenario_store_message"):
+            st.caption(st.session_state.scenario_store_message)
+
+def save_session_scenario():
+    """on_click callback: saves the session's estimate under the entered project and scenario name."""
+    project, name = st.session_state.scenario_project, st.session_state.scenario_name
+    with s.open_scenario_store() as conn:
+        scenario_store.save_scenario(conn, project, name, s.session_estimate())
+    st.session_state.scenario_store_message = f"Saved {project} / {name}."
+
+def load_session_scenario(key):
+    """on_click callback: replaces the session's estimate with a saved scenario."""
+    project, name = key
+    with s.open_scenario_store() as conn:
+        estimate = scenario_store.load_scenario(conn, project, name)
+    if not s.apply_estimate(estimate):
+        st.session_state.scenario_store_message = f"Could not load {project} / {name}."
+        return
+    st.session_state.scenario_project, st.session_state.scenario_name = project, name
+    st.session_state.scenario_store_message = f"Loaded {project} / {name}."
+
 # --- UI Rendering Component ---
 #def render_databricks_tab(FLAT_RATE_CARD, FLAT_INSTANCE_LIST, INSTANCE_PRICES, COMPUTE_TYPE_LIST):
 def render_databricks_tab():
@@ -110,7 +218,7 @@ def render_databricks_tab():
             
         jobs_df = jobs_data             
         
-        _, tier_dbx_cost, tier_ec2_cost, tier_dbu_used = calculate_databricks_costs_for_tier(jobs_df)
+        _, tier_dbx_cost, tier_ec2_cost, tier_dbu_used = cached_tier_costs(tier, jobs_df)
         grand_total_dbx_cost += tier_dbx_cost
         grand_total_ec2_cost += tier_ec2_cost
         grand_total_dbu += tier_dbu_used
@@ -126,57 +234,28 @@ def render_databricks_tab():
 
     # Replaced st.checkbox with st.toggle and moved its position
     st.toggle("Enable Stage", value=True, key='enable_Stage')
+
+    render_job_import()
+    render_right_sizing(active_tiers)
+    render_tier_sweep(active_tiers)
         
     for tier in active_tiers:
         with st.container(border=True):
             st.subheader(f"{tier}")
             jobs_df = st.session_state.dbx_jobs.get(tier, pd.DataFrame())
 
-            # This is the original dataframe used to check for changes
-            original_jobs_df = jobs_df.copy()
-
             # Dynamically select the correct compute and instance lists ---
             global_data = st.session_state.global_data
-            if tier in ["L0 / Raw", "Stage"]:
-                compute_options = global_data['COMPUTE_TYPES_L0_Stage']
-                all_instances_for_tier = list(global_data['FLAT_INSTANCE_LIST'].keys())
-                instance_prices_for_tier = global_data['INSTANCE_PRICES_L0_Stage']
-            elif tier in ["L2 / Data Product","L1 / Curated"]:
-                compute_options = global_data['COMPUTE_TYPES_L2_L1']
-                instance_prices_for_tier = global_data['INSTANCE_PRICES_L2_L1']
-                all_instances_for_tier = list(global_data['FLAT_INSTANCE_LIST'].keys())
-            else:
-                compute_options = []
-                instance_prices_for_tier = {}
-                all_instances_for_tier = []
-
-            # Logic to fill in all columns with default values for new rows ---
-            for j, row in jobs_df.iterrows():
-                # Assign default values for empty numeric columns
-                if pd.isna(row['Runtime (hrs)']):
-                    jobs_df.at[j, 'Runtime (hrs)'] = 0.0
-                if pd.isna(row['Runs/Month']):
-                    jobs_df.at[j, 'Runs/Month'] = 0.0
-                if pd.isna(row['Nodes']):
-                    jobs_df.at[j, 'Nodes'] = 1
-                if pd.isna(row['Job Name']) or row['Job Name'] == "":
-                    jobs_df.at[j, 'Job Name'] = f"{tier.replace('/', ' ')} Job {j + 1}"
-                if pd.isna(row['Compute type']) and compute_options:
-                    jobs_df.at[j, 'Compute type'] = compute_options[0]
-                selected_compute_type = jobs_df.at[j, 'Compute type']
-                selected_instance_type = jobs_df.at[j, 'Instance Type']
-                available_instances = list(instance_prices_for_tier.get(selected_compute_type, {}).keys())
+            compute_options, _ = s.tier_job_options(tier, global_data)
 
-                
-                if pd.isna(selected_instance_type) or selected_instance_type not in available_instances:
-                    new_instance_type = available_instances[0] if available_instances else None
-                    jobs_df.at[j, 'Instance Type'] = new_instance_type             
-            
-            # Get the full DataFrame with calculated costs
-            calculated_df, _, _,_ = calculate_databricks_costs_for_tier(jobs_df)
+            # Totals come from the full tier; only the visible page is sent to the editor
+            calculated_df, _, _,_ = cached_tier_costs(tier, jobs_df)
+            compute_type, page_rows = render_job_pager(tier, calculated_df, compute_options)
+            page_df = calculated_df.iloc[page_rows].reset_index(drop=True)
             
             # ADDED: Auto-incrementing Job_Number column on the display DataFrame only.
-            calculated_df.insert(1, 'Job_Number', range(1, len(calculated_df) + 1))
+            page_df.insert(1, 'Job_Number', page_rows + 1)
+            instances_for_page = tier_instance_options(tier, global_data, compute_type)
 
             # --- st.data_editor for Job Input and Output ---
             column_config = {
@@ -185,30 +264,262 @@ def render_databricks_tab():
                 "Runtime (hrs)": st.column_config.NumberColumn("Runtime (hrs)"),
                 "Runs/Month": st.column_config.NumberColumn("Runs/Month"),
                 "Compute type": st.column_config.SelectboxColumn("Compute type", options=compute_options, disabled=False),
-                "Instance Type": st.column_config.SelectboxColumn("Instance Type", options=all_instances_for_tier, required=True),
+                "Instance Type": st.column_config.SelectboxColumn("Instance Type", options=instances_for_page, required=True),
                 "Nodes": st.column_config.NumberColumn("Worker_Nodes"),
+                SPOT_COLUMN: spot_percent_column(),
                 "DBU": st.column_config.NumberColumn("DBU", disabled=True, format="%.2f"),
                 "DBX": st.column_config.NumberColumn("DBX", disabled=True, format="$%.2f"),
                 "EC2": st.column_config.NumberColumn("EC2", disabled=True, format="$%.2f"),
             }
 
-            edited_df = st.data_editor(
-                calculated_df,
+            # Edits are applied by the on_change callback before the rerun,
+            # so the script runs once per edit and never needs st.rerun().
+            st.data_editor(
+                page_df,
                 column_config=column_config,
                 hide_index=True,
                 key=f"data_editor_{tier}",
+                on_change=apply_job_edits,
+                args=(tier, page_rows, compute_type),
                 use_container_width=True,
                 num_rows="dynamic" ,   
                 column_order=[
                     "Job Name", "Job_Number", "Runtime (hrs)", "Runs/Month", "Compute type", 
-                    "Instance Type", "Nodes","DBU", "DBX", "EC2"])
+                    "Instance Type", "Nodes", SPOT_COLUMN, "DBU", "DBX", "EC2"])
+
+def tier_instance_options(tier, global_data, compute_type=None):
+    """Instance labels offered in a tier: those of one compute type, or of all the tier's compute types."""
+    _, instance_prices_for_tier = s.tier_job_options(tier, global_data)
+    if compute_type is not None:
+        return list(instance_prices_for_tier.get(compute_type, {}))
+    return list(dict.fromkeys(label for prices in instance_prices_for_tier.values() for label in prices))
+
+def job_page(jobs_df, compute_type=None, search="", page=1, page_size=DEFAULT_JOB_PAGE_SIZE):
+    """
+    Row positions of one page of a tier's jobs, after filtering on compute
+    type and a case-insensitive job name substring. Returns (positions, matching rows).
+    """
+    matches = np.ones(len(jobs_df), dtype=bool)
+    if compute_type is not None:
+        matches &= (jobs_df["Compute type"] == compute_type).to_numpy()
+    if search:
+        matches &= jobs_df["Job Name"].astype(str).str.contains(search, case=False, regex=False).to_numpy()
+    rows = np.flatnonzero(matches)
+    if page_size == "All":
+        return rows, len(rows)
+    start = (page - 1) * page_size
+    return rows[start:start + page_size], len(rows)
+
+def render_job_pager(tier, jobs_df, compute_options):
+    """
+    Filter and page controls of a tier's job editor, shown once the tier has
+    more jobs than the smallest page. Returns (compute type filter or None, row positions of the page).
+    """
+    if len(jobs_df) <= JOB_PAGE_SIZES[0]:
+        return None, np.arange(len(jobs_df))
+    c1, c2, c3, c4 = st.columns([2, 2, 1, 1])
+    with c1:
+        compute_type = st.selectbox("Compute type", [ALL_COMPUTE_TYPES] + list(compute_options), key=f"job_filter_type_{tier}")
+    with c2:
+        search = st.text_input("Job name contains", key=f"job_filter_name_{tier}")
+    with c3:
+        page_size = st.selectbox("Rows per page", JOB_PAGE_SIZES, index=JOB_PAGE_SIZES.index(DEFAULT_JOB_PAGE_SIZE), key=f"job_page_size_{tier}")
+    compute_type = None if compute_type == ALL_COMPUTE_TYPES else compute_type
+    _, matching = job_page(jobs_df, compute_type, search, 1, page_size)
+    n_pages = 1 if page_size == "All" else max(1, -(-matching // page_size))
+    with c4:
+        page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=min(st.session_state.get(f"job_page_{tier}", 1), n_pages), key=f"job_page_{tier}")
+    rows, matching = job_page(jobs_df, compute_type, search, page, page_size)
+    first = (page - 1) * (page_size if page_size != "All" else 0)
+    st.caption(f"Showing {first + 1 if len(rows) else 0:,}–{first + len(rows):,} of {matching:,} matching jobs ({len(jobs_df):,} in the tier)")
+    return compute_type, rows
 
-            editable_cols = ["Job Name", "Runtime (hrs)", "Runs/Month", "Compute type", "Instance Type", "Nodes"]
-            if not edited_df[editable_cols].equals(original_jobs_df[editable_cols]):
-                 st.session_state.dbx_jobs[tier] = edited_df[editable_cols]
-                 st.rerun()
+def render_job_import():
+    """Expander for importing a CSV/JSON/Parquet job inventory into the tiers."""
+    with st.expander("Import Jobs"):
+        st.caption("Columns are matched by name: Tier, Job Name, Runtime (hrs), Runs/Month, Compute type, Instance Type, Nodes and Spot % "
+                   "(or aliases such as name, runtime_hours, runs_per_month, node_type_id and num_workers). "
+                   "Instances may be bare names such as m5d.xlarge.")
+        st.file_uploader("Job inventory", type=["csv", "json", "jsonl", "ndjson", "parquet"], key="job_import_file")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.selectbox("Tier for rows without one", s.TIERS, index=len(s.TIERS) - 1, key="job_import_default_tier")
+        with c2:
+            st.radio("Existing jobs", ["Append", "Replace"], horizontal=True, key="job_import_mode")
+        st.button("Import", key="import_jobs", on_click=import_job_inventory, disabled=st.session_state.get("job_import_file") is None)
+
+        if st.session_state.get("job_import_error"):
+            st.error(st.session_state.job_import_error)
+        report = st.session_state.get("job_import_report")
+        if report is not None:
+            st.success(f"Imported {sum(report.imported.values()):,} of {report.rows:,} rows in {report.seconds:.2f} s "
+                       f"({report.rows_per_second:,.0f} rows/s); {report.rejected:,} rejected.")
+            st.caption(" • ".join(f"{tier}: {count:,}" for tier, count in report.imported.items()))
+            if report.unknown_tiers:
+                st.warning(f"Rows with an unknown tier were rejected: {', '.join(report.unknown_tiers)}")
+
+def import_job_inventory():
+    """on_click callback: imports the uploaded job inventory into st.session_state.dbx_jobs."""
+    uploaded = st.session_state.get("job_import_file")
+    if uploaded is None:
+        return
+    global_data = st.session_state.global_data
+    try:
+        imported, report = import_jobs(uploaded, import_format(uploaded.name), global_data, st.session_state.job_import_default_tier)
+    except (ValueError, KeyError) as e:
+        st.session_state.job_import_error = f"Could not import {uploaded.name}: {e}"
+        st.session_state.job_import_report = None
+        return
+    st.session_state.dbx_jobs = merge_imported_jobs(
+        st.session_state.dbx_jobs, imported, global_data, replace=st.session_state.job_import_mode == "Replace"
+    )
+    st.session_state.job_import_error = None
+    st.session_state.job_import_report = report
+
+def render_right_sizing(active_tiers):
+    """Cheapest instance with at least the current vCPU and memory, for every job in the active tiers."""
+    tiers = [tier for tier in active_tiers if not st.session_state.dbx_jobs.get(tier, pd.DataFrame()).empty]
+    if not tiers:
+        return
+    suggestions = pd.concat(
+        {tier: cached_right_sizing(tier, st.session_state.dbx_jobs[tier]) for tier in tiers}, names=["Tier", None]
+    ).reset_index(level=0)
+    savings = suggestions[suggestions["Savings"] > 0]
+
+    with st.expander(f"Right-size Instances: save ${savings['Savings'].sum():,.2f}/month on {len(savings)} jobs"):
+        if savings.empty:
+            st.write("Every job already runs on the cheapest instance that meets its vCPU and memory.")
+            return
+        st.dataframe(
+            savings,
+            column_config={c: st.column_config.NumberColumn(c, format="dollar") for c in ("Current Cost", "Suggested Cost", "Savings")},
+            hide_index=True,
+            use_container_width=True
+        )
+        st.button("Apply Suggestions", key="apply_right_sizing", on_click=apply_right_sizing, args=(tiers,))
+
+def render_tier_sweep(active_tiers):
+    """What-if heatmap of a tier's monthly cost if every job ran on n workers of one instance and compute type."""
+    tiers = [tier for tier in active_tiers if not st.session_state.dbx_jobs.get(tier, pd.DataFrame()).empty]
+    if not tiers:
+        return
+    global_data = st.session_state.global_data
+
+    with st.expander("What-if Sweep: Nodes x Instance x Compute Type"):
+        tier = st.selectbox("Tier", tiers, key="sweep_tier")
+        jobs_df = st.session_state.dbx_jobs[tier]
+        compute_options, _ = s.tier_job_options(tier, global_data)
+        candidates = sweep_candidates(global_data, compute_options)
+        current = (
+            jobs_df["Instance Type"].map(global_data['FLAT_INSTANCE_LIST']).fillna(jobs_df["Instance Type"])
+            .astype(str).str.removesuffix(PHOTON_SUFFIX)
+        )
+        current = [instance for instance in dict.fromkeys(current) if instance in candidates]
+
+        col1, col2 = st.columns(2)
+        compute_types = col1.multiselect("Compute types", compute_options, default=compute_options, key=f"sweep_compute_types_{tier}")
+        min_nodes, max_nodes = col2.slider("Worker nodes", 1, 50, (1, 16), key="sweep_nodes")
+        instances = st.multiselect(
+            "Candidate instances", candidates, default=current, key=f"sweep_instances_{tier}",
+            help="Photon compute types use the (Photon) variant of each instance."
+        )
+        if not compute_types or not instances:
+            st.info("Select at least one compute type and one instance.")
+            return
+
+        node_counts = list(range(min_nodes, max_nodes + 1))
+        costs = cached_tier_sweep(tier, jobs_df, node_counts, compute_types, instances)
+        if np.isnan(costs).all():
+            st.info("None of the selected instances is offered for the selected compute types.")
+            return
+
+        _, tier_dbx_cost, tier_ec2_cost, _ = cached_tier_costs(tier, jobs_df)
+        c, n, i = np.unravel_index(np.nanargmin(costs), costs.shape)
+        col1, col2 = st.columns(2)
+        col1.metric("Current Monthly Cost", f"${tier_dbx_cost + tier_ec2_cost:,.2f}")
+        col2.metric(
+            f"Cheapest: {node_counts[n]} x {instances[i]} on {compute_types[c]}", f"${costs[c, n, i]:,.2f}",
+            delta=f"${costs[c, n, i] - tier_dbx_cost - tier_ec2_cost:,.2f}", delta_color="inverse"
+        )
+
+        for tab, compute_type, matrix in zip(st.tabs(compute_types), compute_types, costs):
+            with tab:
+                cost_matrix = pd.DataFrame(matrix, index=pd.Index(node_counts, name="Worker Nodes"), columns=instances)
+                fig = go.Figure(go.Heatmap(
+                    z=cost_matrix.to_numpy(), x=instances, y=node_counts, colorscale="Viridis",
+                    colorbar=dict(title="$/month"),
+                    hovertemplate="%{y} x %{x}<br>$%{z:,.2f}/month<extra></extra>"
+                ))
+                fig.update_layout(xaxis_title="Instance", yaxis_title="Worker Nodes", height=450, margin=dict(t=20))
+                st.plotly_chart(fig, use_container_width=True, key=f"sweep_heatmap_{compute_type}")
+                st.dataframe(cost_matrix, column_config={instance: st.column_config.NumberColumn(instance, format="dollar") for instance in instances}, use_container_width=True)
+
+def apply_right_sizing(tiers):
+    """on_click callback: moves every job with a cheaper suggestion to its suggested instance."""
+    global_data = st.session_state.global_data
+    for tier in tiers:
+        jobs_df = st.session_state.dbx_jobs[tier]
+        suggestions = cached_right_sizing(tier, jobs_df)
+        cheaper = suggestions["Savings"] > 0
+        if cheaper.any():
+            jobs_df = jobs_df.copy()
+            jobs_df.loc[cheaper, "Instance Type"] = suggestions.loc[cheaper, "Suggested Instance"]
+            st.session_state.dbx_jobs[tier] = s.fill_job_defaults(jobs_df, tier, global_data)
+
+def apply_editor_changes(df, changes, columns, row_of=None, added_defaults=None):
+    """
+    Applies a data editor's edited/deleted/added rows to `df` and returns
+    the result with `columns` as object columns. `row_of` maps an editor
+    row to a row of `df` (the same row when None); `added_defaults`
+    ({column: value}) fills cells the added rows leave empty.
+    """
+    df = df.reindex(columns=columns).reset_index(drop=True).astype(object)
+    row_of = row_of or int
+
+    for row, values in changes.get("edited_rows", {}).items():
+        for column, value in values.items():
+            if column in columns:
+                df.at[row_of(row), column] = value
+    if changes.get("deleted_rows"):
+        df = df.drop(index=[row_of(row) for row in changes["deleted_rows"]])
+    if changes.get("added_rows"):
+        added = pd.DataFrame(changes["added_rows"]).reindex(columns=columns).astype(object)
+        for column, value in (added_defaults or {}).items():
+            added[column] = added[column].fillna(value)
+        df = pd.concat([df, added], ignore_index=True)
+    return df
+
+def apply_job_edits(tier, page_rows=None, compute_type=None):
+    """
+    on_change callback for a tier's data editor. Applies the editor's
+    edited/deleted/added rows to st.session_state.dbx_jobs[tier] and fills
+    defaults for new or blanked cells. `page_rows` maps the editor's rows
+    to rows of the tier when it shows one page; rows added while filtered
+    on a compute type get that type.
+    """
+    jobs_df = apply_editor_changes(
+        st.session_state.dbx_jobs.get(tier, pd.DataFrame(columns=s.JOB_COLUMNS)),
+        st.session_state.get(f"data_editor_{tier}", {}),
+        s.JOB_COLUMNS,
+        row_of=None if page_rows is None else (lambda row: int(page_rows[int(row)])),
+        added_defaults=None if compute_type is None else {"Compute type": compute_type},
+    )
+    st.session_state.dbx_jobs[tier] = s.fill_job_defaults(jobs_df, tier, st.session_state.global_data)
             
-def render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_yearly_cost, projected_s3_cost_12_months, total_table_cost):
+def apply_s3_table_edits(zone_name):
+    """
+    on_change callback for a zone's table editor. Applies the editor's
+    edited/deleted/added rows to st.session_state.s3_table_based[zone_name],
+    coerces the counts to integers and drops rows left completely empty.
+    """
+    tables_df = apply_editor_changes(
+        st.session_state.s3_table_based[zone_name], st.session_state.get(f"s3_table_editor_{zone_name}", {}), S3_TABLE_COLUMNS
+    )
+    tables_df = s3_table_frame(tables_df)
+    is_empty = (tables_df["Table Name"] == "") & (tables_df[S3_TABLE_NUMERIC_COLUMNS] == 0).all(axis=1)
+    st.session_state.s3_table_based[zone_name] = tables_df[~is_empty].reset_index(drop=True)
+
+def render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_yearly_cost, projected_s3_cost_12_months, total_table_cost, s3_projection=None):
     """Renders the S3 Storage tab UI with a vertical layout and summary."""
     st.header("AWS S3 Storage Costs")
     st.radio("Calculation Method", ["Direct Storage[Recommended]", "Table-Based"], key="s3_calc_method", horizontal=True)
@@ -216,7 +527,7 @@ def render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_y
     S3_STORAGE_CLASSES = list(st.session_state.global_data.get('S3_PRICING', {}).keys())
 
     if st.session_state.s3_calc_method == "Direct Storage[Recommended]":
-        st.write('**Monthly Storage Cost** determined by Total Storage in GB multiplied Tiered Rate')
+        st.write('**Monthly Storage Cost** prices each month\'s projected storage in GB by tier: the first 50 TB at the first tier\'s rate, the next 450 TB at the second and the rest at the third')
 
         st.divider()
     
@@ -229,6 +540,26 @@ def render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_y
             col3.metric("Total Half-Yearly", f"${total_half_yearly_cost:,.2f}")
             col4.metric("Total Yearly", f"${projected_s3_cost_12_months:,.2f}")
 
+        # Month-by-month cost of every zone, with tiered rates applied to each month's volume
+        with st.container(border=True):
+            st.subheader("Month-by-Month Projection")
+            horizon_months = st.number_input("Projection Horizon (months)", min_value=12, max_value=120, step=12, key="s3_projection_months")
+            if s3_projection is not None and not s3_projection.empty:
+                months = list(range(1, s3_projection.shape[1] + 1))
+                col1, col2 = st.columns(2)
+                col1.metric(f"Total over {horizon_months} Months", f"${s3_projection.to_numpy().sum():,.2f}")
+                col2.metric(f"Month {horizon_months} Cost", f"${s3_projection.iloc[:, -1].sum():,.2f}")
+                fig = go.Figure([
+                    go.Scatter(x=months, y=s3_projection.loc[zone], name=zone, stackgroup="zones", mode="lines")
+                    for zone in s3_projection.index
+                ])
+                fig.update_layout(
+                    xaxis_title="Month", yaxis_title="Monthly Cost ($)",
+                    legend=dict(orientation="h", yanchor="bottom", y=-0.4, xanchor="center", x=0.5),
+                    margin=dict(t=10, b=0, l=0, r=0), height=300
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
         st.divider()
 
         # Create a toggle for the Stage tier
@@ -302,12 +633,10 @@ def render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_y
                 zone_cost = s3_costs_per_zone.get(zone_name, 0)
                 c2.markdown(f"<h3 style='text-align: right;'>${zone_cost:,.2f}</h3>", unsafe_allow_html=True)    
                 
-                # Use a single, clean approach to get the DataFrame
-                display_df = pd.DataFrame(st.session_state.s3_table_based[zone_name])
-                
-                # Render the data editor
-                edited_df_zone = st.data_editor(
-                    display_df,
+                # Render the data editor straight from the zone's stored DataFrame;
+                # edits are applied in the on_change callback
+                st.data_editor(
+                    zone_config,
                     column_config={
                         "Table Name": st.column_config.TextColumn("Table Name", required=True),
                         "Records": st.column_config.NumberColumn("Records", min_value=0, format="%d"),
@@ -318,28 +647,10 @@ def render_s3_tab(s3_costs_per_zone, s3_cost, total_quarterly_cost, total_half_y
                     hide_index=True,
                     num_rows="dynamic",
                     key=f"s3_table_editor_{zone_name}",
+                    on_change=apply_s3_table_edits,
+                    args=(zone_name,),
                     use_container_width=True
                 )
-
-                if not edited_df_zone.equals(display_df):
-                    # Sanitize the edited DataFrame before storing it
-                    edited_df_zone["Records"] = pd.to_numeric(edited_df_zone["Records"], errors='coerce').fillna(0).astype(int)
-                    edited_df_zone["Columns"] = pd.to_numeric(edited_df_zone["Columns"], errors='coerce').fillna(0).astype(int)
-                    edited_df_zone["Table"] = pd.to_numeric(edited_df_zone["Table"], errors='coerce').fillna(0).astype(int)
-                    edited_df_zone["Avg_Column_length"] = pd.to_numeric(edited_df_zone["Avg_Column_length"], errors='coerce').fillna(0).astype(int)
-                    edited_df_zone["Table Name"] = edited_df_zone["Table Name"].fillna('')
-                    
-                    # Filter out empty rows
-                    sanitized_df = edited_df_zone[
-                        (edited_df_zone["Table Name"] != "") |
-                        (edited_df_zone["Records"] != 0) |
-                        (edited_df_zone["Columns"] != 0) |
-                        (edited_df_zone["Table"] != 0) |
-                        (edited_df_zone["Avg_Column_length"] != 0)
-                    ].reset_index(drop=True)
-
-                    st.session_state.s3_table_based[zone_name] = sanitized_df.to_dict(orient='records')
-                    st.rerun()
         st.divider()
 
         with st.container(border=True):
@@ -353,8 +664,7 @@ def render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, total_DBUs):
     
     global_data = st.session_state.get('global_data', {})
     sql_warehouse_types = global_data.get('SQL_WAREHOUSE_TYPES_FROM_DATA', [])
-    sql_warehouse_sizes_by_type = global_data.get('SQL_WAREHOUSE_SIZES_BY_TYPE', {})
-    sql_worker_counts_by_driver = global_data.get('SQL_WORKER_COUNTS_BY_DRIVER', {})
+    catalog = global_data['SQL_SIZE_CATALOG']
 
     with st.container(border=True):
         c1, c2, c3 = st.columns(3)
@@ -381,13 +691,17 @@ def render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, total_DBUs):
                 "id": new_id,
                 "name": "New Warehouse",
                 "type": sql_warehouse_types[0] if sql_warehouse_types else None,
-                "size": next(iter(sql_warehouse_sizes_by_type.get(sql_warehouse_types[0], {})), None),
+                "size": next(iter(catalog.sizes_for(sql_warehouse_types[0])), None) if sql_warehouse_types else None,
                 'SQL_nodes': 1,
                 "hours_per_day": 0,
-                "days_per_month": 0
+                "days_per_month": 0,
+                "spot_percent": 0,
+                "auto_suspend": True,
+                "suspend_after": 10
             })
             st.rerun()
 
+    render_query_log_loader()
     st.markdown("---")
 
     if not st.session_state.sql_warehouses:
@@ -395,28 +709,26 @@ def render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, total_DBUs):
         st.divider()
         return
 
-    for i, warehouse in enumerate(st.session_state.sql_warehouses):
+    billed_warehouses = billed_sql_warehouses()
+    for i, (warehouse, billed) in enumerate(zip(st.session_state.sql_warehouses, billed_warehouses)):
         with st.container(border=True):
             sql_details_col, actions_col = st.columns([4, 1])
 
             with sql_details_col:
                 st.subheader(warehouse["name"])
                 
-                selected_size_str = warehouse.get("size")
-                if selected_size_str is None:
+                size_pos = catalog.position(warehouse.get("type"), warehouse.get("size"))
+                if size_pos < 0:
                     st.warning("No size selected for this warehouse.")
                     dbt_per_hr = 0
                     rate_per_hr = 0
                 else:
-                    try:
-                        parts = selected_size_str.split(" - ")
-                        dbt_per_hr = float(parts[1].split(" ")[0]) if len(parts) > 1 else 0
-                        rate_per_hr = float(parts[2].split("$")[1].split("/")[0]) if len(parts) > 2 else 0
-                    except (IndexError, ValueError):
-                        dbt_per_hr = 0
-                        rate_per_hr = 0
+                    dbt_per_hr = catalog.dbu_per_hour[size_pos]
+                    rate_per_hr = catalog.rate_per_hour[size_pos]
 
                 st.caption(f"{dbt_per_hr} DBUs • ${rate_per_hr}/hr • {warehouse['hours_per_day']}h/day • {warehouse['days_per_month']} days/month")
+                if billed is not warehouse:
+                    st.caption(f"Billed from query history: {billed['hours_per_day']:.2f}h/day with a {warehouse.get('suspend_after')} min auto-suspend (replaces {warehouse['hours_per_day']}h/day)")
             
             with actions_col:
                 if st.button("🗑️ Delete", key=f"delete_sql_warehouse_{i}"):
@@ -425,7 +737,7 @@ def render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, total_DBUs):
             
             st.markdown("---")
 
-            c1, c2, c3, c4, c5, c6 = st.columns(6)
+            c1, c2, c3, c4, c5, c6, c7 = st.columns(7)
 
             with c1:
                 new_name = st.text_input("Name", value=warehouse.get("name", "New Warehouse"), key=f"sql_name_{i}")
@@ -436,15 +748,18 @@ def render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, total_DBUs):
                 new_type = st.selectbox("Compute Type", sql_warehouse_types, index=type_index, key=f"sql_type_{i}")
 
             with c3:
-                available_sizes = list(sql_warehouse_sizes_by_type.get(new_type, {}).keys())
+                available_sizes = catalog.sizes_for(new_type)
                 current_size = warehouse.get("size")
                 
                 size_index = available_sizes.index(current_size) if current_size in available_sizes else 0
                 
-                new_size = st.selectbox("Instance", available_sizes, index=size_index, key=f"sql_size_{i}")
-                
-            instance_name_from_size = sql_warehouse_sizes_by_type.get(new_type, {}).get(new_size, None)
-            max_nodes = sql_worker_counts_by_driver.get(instance_name_from_size, 1)
+                new_size = st.selectbox(
+                    "Instance", available_sizes, index=size_index, key=f"sql_size_{i}",
+                    format_func=lambda size, warehouse_type=new_type: catalog.label(warehouse_type, size)
+                )
+
+            new_size_pos = catalog.position(new_type, new_size)
+            max_nodes = int(catalog.max_workers[new_size_pos]) if new_size_pos >= 0 else 1
 
             with c4:
                 new_nodes = st.number_input(
@@ -461,13 +776,31 @@ def render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, total_DBUs):
                 new_hours_per_day = st.number_input("Hours/Day", min_value=0.0, max_value=24.0, value=float(warehouse.get('hours_per_day', 0.0)), step=0.5, format="%.1f", key=f"sql_hours_{i}")
             with c6:
                 new_days_per_month = st.number_input("Days/Month", min_value=0, max_value=31, value=warehouse.get("days_per_month", 0), key=f"sql_days_{i}")
+            with c7:
+                new_spot_percent = st.number_input(
+                    "Spot %", min_value=0, max_value=100, value=int(warehouse.get("spot_percent", 0)), key=f"sql_spot_{i}",
+                    help=SPOT_PERCENT_HELP
+                )
+
+            c1, c2, _ = st.columns([1, 1, 5])
+            with c1:
+                new_auto_suspend = st.toggle("Auto-suspend", value=bool(warehouse.get("auto_suspend", False)), key=f"sql_auto_suspend_{i}")
+            with c2:
+                new_suspend_after = st.number_input(
+                    "Suspend after (min)", min_value=MIN_SUSPEND_MINUTES, max_value=1440, value=int(warehouse.get("suspend_after") or 10),
+                    key=f"sql_suspend_after_{i}", disabled=not new_auto_suspend,
+                    help="Idle minutes before the warehouse stops. With a query history loaded, hours/day is taken from the history."
+                )
             
             if (new_name != warehouse.get("name") or
                 new_type != warehouse.get("type") or
                 new_size != warehouse.get("size") or
                 new_nodes != warehouse.get("SQL_nodes") or
                 new_hours_per_day != warehouse.get("hours_per_day") or
-                new_days_per_month != warehouse.get("days_per_month")):
+                new_days_per_month != warehouse.get("days_per_month") or
+                new_spot_percent != warehouse.get("spot_percent", 0) or
+                new_auto_suspend != warehouse.get("auto_suspend", False) or
+                new_suspend_after != warehouse.get("suspend_after")):
                 
                 warehouse["name"] = new_name
                 warehouse["type"] = new_type
@@ -475,9 +808,44 @@ def render_sql_warehouse_tab(sql_dbu_cost, sql_ec2_cost, total_DBUs):
                 warehouse["SQL_nodes"] = new_nodes
                 warehouse["hours_per_day"] = new_hours_per_day
                 warehouse["days_per_month"] = new_days_per_month
+                warehouse["spot_percent"] = new_spot_percent
+                warehouse["auto_suspend"] = new_auto_suspend
+                warehouse["suspend_after"] = new_suspend_after
                 
                 st.rerun()
 
+def load_sql_query_log():
+    """on_click callback: streams the query history at the entered path into st.session_state.sql_query_log."""
+    path = st.session_state.get("sql_query_log_path", "").strip()
+    try:
+        st.session_state.sql_query_log = load_query_log(path)
+        st.session_state.sql_query_log_error = None
+    except (OSError, ValueError) as e:
+        st.session_state.sql_query_log_error = f"Could not load the query history: {e}"
+
+def clear_sql_query_log():
+    """on_click callback: drops the loaded query history; warehouses go back to their flat hours/day."""
+    st.session_state.sql_query_log = None
+    st.session_state.sql_query_log_error = None
+
+def render_query_log_loader():
+    """Expander for loading a query history (CSV or Parquet) that drives auto-suspend uptime."""
+    query_log = st.session_state.get('sql_query_log')
+    with st.expander("Auto-suspend from Query History", expanded=query_log is not None):
+        st.caption("A CSV or Parquet file with one row per query: warehouse_id (or warehouse_name), start_time and end_time. "
+                   "Auto-suspending warehouses found in the history are billed for their actual uptime per active day instead of Hours/Day.")
+        c1, c2, c3 = st.columns([4, 1, 1])
+        with c1:
+            st.text_input("Query history file", key="sql_query_log_path", placeholder="/path/to/query_history.parquet", label_visibility="collapsed")
+        with c2:
+            st.button("Load", key="load_sql_query_log", on_click=load_sql_query_log)
+        with c3:
+            st.button("Clear", key="clear_sql_query_log", on_click=clear_sql_query_log, disabled=query_log is None)
+        if st.session_state.get('sql_query_log_error'):
+            st.error(st.session_state.sql_query_log_error)
+        if query_log is not None:
+            st.caption(f"{query_log.rows:,} queries on {len(query_log.warehouses)} warehouse(s) from {query_log.source[0]}")
+
 def render_devepoment_tools():
     st.header("Development & All-Purpose Compute")
     st.write("**Development Cost** is an estimate for All-Purpose Compute clusters. "
@@ -487,7 +855,7 @@ def render_devepoment_tools():
     global_data = st.session_state.global_data
     dev_instance_list = list(global_data.get('FLAT_INSTANCE_LIST_DEV', {}).keys())
     
-    total_dbx_cost, total_ec2_cost, dev_df = calculate_dev_costs()
+    total_dbx_cost, total_ec2_cost, dev_df = cached_dev_costs()
 
     column_config = {
         "Compute_type": st.column_config.TextColumn("Compute Type", disabled=True),
@@ -497,28 +865,40 @@ def render_devepoment_tools():
         "hr_per_month": st.column_config.NumberColumn("Hours per Month (hrs)", min_value=0.0),
         
         "no_of_Month": st.column_config.NumberColumn("Number of Months", min_value=0),
+        SPOT_COLUMN: spot_percent_column(),
         
         "DBX": st.column_config.NumberColumn("DBX Cost", disabled=True, format="$%.2f"),
         "EC2": st.column_config.NumberColumn("EC2 Cost", disabled=True, format="$%.2f"),
         "Total": st.column_config.NumberColumn("Total Cost", disabled=True, format="$%.2f")
     }
 
-    edited_df = st.data_editor(
+    # Edits are applied by the on_change callback before the rerun,
+    # so the priced frame shown here is never written back
+    st.data_editor(
         dev_df,
         column_config=column_config,
         hide_index=True,
         num_rows="dynamic",
         use_container_width=True,
         key="dev_cost_editor",
+        on_change=apply_dev_edits,
         column_order=[
             "Compute_type", "Driver type", "Worker Type", "Nodes", "hr_per_month", 
-            "no_of_Month", 
+            "no_of_Month", SPOT_COLUMN,
             "DBX", "EC2", "Total"
         ]
     )
-    if not edited_df.equals(dev_df):
-        st.session_state.dev_costs = edited_df
-        st.rerun()
+
+def apply_dev_edits():
+    """
+    on_change callback for the development cost editor. Applies the editor's
+    edited/deleted/added rows to the input columns of st.session_state.dev_costs.
+    """
+    dev_costs = apply_editor_changes(
+        st.session_state.dev_costs, st.session_state.get("dev_cost_editor", {}), DEV_INPUT_COLUMNS,
+        added_defaults={"Compute_type": "All-Purpose Compute"},
+    )
+    st.session_state.dev_costs = dev_costs.reset_index(drop=True)
            
 def render_configuration_guide():
     """Renders the configuration guide expander at the bottom of a tab."""
@@ -539,14 +919,15 @@ def render_configuration_guide():
             **Instance Families** Choose instance types based on workload: General Purpose (`m5`), Compute Optimized (`c5`), Memory Optimized (`r5`/`r5d`).
             """)
 
-def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, dev_costs_config,  s3_cost,sql_dbu_cost, sql_ec2_cost, databricks_total_cost, dev_cost, total_monthly_summarized_cost,total_quarterly_cost ,total_half_yearly_cost, total_yearly_cost_summarized):
+def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config, s3_table_based_config, sql_warehouses_config, dev_costs_config,  s3_cost,sql_dbu_cost, sql_ec2_cost, databricks_total_cost, dev_cost, total_monthly_summarized_cost,total_quarterly_cost ,total_half_yearly_cost, total_yearly_cost_summarized, s3_projection=None):
     """
-    Renders the Excel export button. This function is called from main.py.
-    It orchestrates the data collection from session state and passes it
-    to the excel_exporter for file generation.
+    Renders the export format picker and download button. This function is called from main.py.
+    The file is only generated when the button is clicked. All formats share one
+    assembled set of sheets, and each file is reused for repeated downloads while
+    the export inputs are unchanged.
     """
-    # Generate Excel file content
-    excel_file_bytes = generate_consolidated_excel_export(
+    graph = st.session_state.calc_graph
+    export_args = (
         calculated_dbx_data,
         s3_calc_method,
         s3_direct_config,
@@ -561,15 +942,24 @@ def render_export_button(calculated_dbx_data, s3_calc_method, s3_direct_config,
         total_monthly_summarized_cost,
         total_quarterly_cost,
         total_half_yearly_cost ,
-        total_yearly_cost_summarized
+        total_yearly_cost_summarized,
+        s3_projection
     )
 
+    export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key="export_format", label_visibility="collapsed")
+    writer, file_name, mime = EXPORT_FORMATS[export_format]
+
+    def build_export():
+        # Called by Streamlit on click, outside the script run
+        sheets = graph.node("export_sheets", assemble_export_sheets, *export_args)
+        return graph.node(f"export:{export_format}", writer, sheets, key=(export_format, graph.digest("export_sheets")))
+
     # Export Button (visible)
     st.download_button(
-        label="📊 Export Excel",
-        data=excel_file_bytes,
-        file_name="cloud_cost_report.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        label=f"📊 Export {export_format.split(' ')[0]}",
+        data=build_export,
+        file_name=file_name,
+        mime=mime,
         key="export_consolidated_excel_button"
     )
 
@@ -595,8 +985,14 @@ def render_calcu_explain():
 
     st.subheader("2. S3 Storage")
     st.info("""
-        **Direct Storage Cost** uses a tiered pricing model. The final cost is based on the total storage amount:
-        `Cost = (Storage Amount in GB) x (Tiered Rate)`
+        **Direct Storage Cost** uses marginal tiered pricing. Each zone's volume is projected month by month
+        with its monthly growth, and every month is priced on that month's volume, each GB at the rate of the tier it falls in:
+        `Monthly Cost = (GB up to 50 TB) x (Tier 1 Rate) + (GB from 50 TB to 500 TB) x (Tier 2 Rate) + (GB over 500 TB) x (Tier 3 Rate)`
+
+        `Volume in Month m = (Storage Amount in GB) x (1 + Monthly Growth %)^(m - 1)`
+
+        Quarterly, half-yearly and yearly costs are the sums of the first 3, 6 and 12 monthly costs;
+        the month-by-month projection runs over the chosen horizon (12 to 120 months).
         
         **Table-Based Cost** is an estimation using a default Standard rate.
         `Estimated GB = (Records x Columns x Length_of_str _per record x bytes per character x compression factor)  / (1024^2)`
@@ -616,7 +1012,10 @@ def render_calcu_explain():
         **Total SQL Warehouse Cost** is a sum of the DBU and EC2 costs for each warehouse.
         `DBU Cost = (DBU Rate per Hour) x (Nodes) x (Hours per Day) x (Days per Month)`
             
-        `EC2 Cost = Driver_instance_rate + ((On-Demand Rate per Hour for worker) x (Nodes))`
+        `EC2 Cost = (Driver_instance_rate + (On-Demand Rate per Hour for worker) x (Nodes)) x (Hours per Day) x (Days per Month)`
+
+        For auto-suspending warehouses billed from a query history, Hours per Day is the billed uptime,
+        so auto-suspend lowers both the DBU and the EC2 cost.
         
         **Reference:** [Databricks SQL Warehouse Pricing](https://docs.databricks.com/aws/en/compute/sql-warehouse/)
     """)